@@ -0,0 +1,241 @@
+import os
+import sys
+import math
+import argparse
+from statistics import NormalDist
+import pandas as pd
+from cache import cacheado
+from instrumentacion import medido
+import dimensiones
+import consultas
+
+# modo aproximado: estima algunas consultas desde una muestra aleatoria simple de libros en vez de
+# contar toda la coleccion. Cada valor viene con su intervalo de confianza (Wilson con correccion por
+# poblacion finita): la app lo muestra mientras espera el exacto (ver cargar_refinando en vistas.py).
+#
+# $sample va primera etapa. Si pide menos del 5% de una coleccion de mas de 100 documentos, mongod
+# usa un cursor aleatorio y lee solo esos (puede repetir alguno); si no, recorre la coleccion y la
+# ordena al azar (sin repetidos, pero ya no es mas barato que la consulta exacta).
+# El muestreo es uniforme sobre libros, sin estratos por genero/idioma: estratificar necesita el
+# tamaño de cada estrato, y con ese dato (el resumen de rollups.py) esos conteos ya salen exactos.
+
+MUESTRA_APROXIMADA = int(os.getenv("MUESTRA_APROXIMADA", "2000"))          # libros por muestra
+PRESUPUESTO_APROXIMADO = float(os.getenv("PRESUPUESTO_APROXIMADO", "0.5"))  # segundos antes de estimar
+CONFIANZA = 0.95
+
+# "ganador": el libro tiene al menos una nominacion ganadora (usa el indice ganador_libro)
+_GANADOR = [
+    {"$lookup": {"from": "nominaciones", "localField": "_id", "foreignField": "libro",
+                 "pipeline": [{"$match": {"ganador": True}}, {"$limit": 1}, {"$project": {"_id": 1}}],
+                 "as": "_ganador"}},
+    {"$addFields": {"ganador": {"$gt": [{"$size": "$_ganador"}, 0]}}},
+    {"$project": {"_ganador": 0}},
+]
+_COLUMNAS = ["_id", "genero", "idioma", "anio_publicacion", "ganador"]
+
+def _muestra(_db, tamanio, ganadores):
+    pipeline = [{"$sample": {"size": tamanio}}, {"$project": {"genero": 1, "idioma": 1, "anio_publicacion": 1}}]
+    if ganadores:
+        pipeline += _GANADOR
+    df = pd.DataFrame(list(_db["libros"].aggregate(pipeline)), columns=_COLUMNAS)
+    # con el cursor aleatorio puede haber repetidos. Sacandolos (y tomando el cursor como uniforme) los n
+    # distintos son un subconjunto al azar de la coleccion: muestra sin reposicion, lo que supone intervalo()
+    return df.drop_duplicates("_id").reset_index(drop=True)
+
+# intervalo para el total de la poblacion a partir de k de n libros distintos en la muestra (N en total)
+def intervalo(k, n, N, confianza=CONFIANZA):
+    if n >= N:
+        return k, k   # la muestra es toda la coleccion: exacto
+    if n == 0:
+        return 0, N
+    z = NormalDist().inv_cdf(0.5 + confianza / 2)
+    n_ef = n * (N - 1) / (N - n)   # n efectivo con la correccion por poblacion finita
+    p = k / n
+    centro = (p + z * z / (2 * n_ef)) / (1 + z * z / n_ef)
+    margen = z * math.sqrt(p * (1 - p) / n_ef + z * z / (4 * n_ef * n_ef)) / (1 + z * z / n_ef)
+    # en la coleccion hay al menos los k vistos y a lo sumo N menos los n - k que no cumplen
+    return max(k, math.floor(N * (centro - margen))), min(N - (n - k), math.ceil(N * (centro + margen)))
+
+def _estimados(df_k, columna, n, N, confianza):
+    # k por fila -> estimado e intervalo, con el nombre de columna que usa la consulta exacta
+    limites = [intervalo(int(k), n, N, confianza) for k in df_k["k"]]
+    return df_k.assign(**{columna: (df_k["k"] * N / n).round().astype(int) if n else 0,
+                          "inferior": [i for i, _ in limites], "superior": [s for _, s in limites]})
+
+def _por_dimension(_db, muestra, campo, coleccion_dim, col_nombre, col_total, n, N, confianza):
+    valores = muestra[campo]
+    valores = valores[valores.notna() & valores.map(bool)]
+    df_k = valores.value_counts().rename("k").rename_axis("_id").reset_index()
+    df_k = dimensiones.etiquetar(_db, coleccion_dim, df_k)
+    df = _estimados(df_k, col_total, n, N, confianza)
+    df = df.sort_values(by=[col_total, "_id"], ascending=[False, True])
+    return df[["nombre", col_total, "inferior", "superior"]].rename(columns={"nombre": col_nombre}) \
+        .reset_index(drop=True)
+
+def _por_anio(muestra, n, N, confianza, max_anios=None):
+    anios = muestra["anio_publicacion"]
+    anios = pd.to_numeric(anios[anios.notna() & anios.map(bool)], errors="coerce").dropna().astype(int)
+    df_k = anios.value_counts().rename("count").rename_axis("year").reset_index().sort_values("year")
+    df_k = consultas.intervalos_anios(df_k, max_anios)   # agrupa los k, no los estimados
+    ancho = df_k.attrs["ancho"]
+    df = _estimados(df_k.rename(columns={"count": "k"}), "count", n, N, confianza)
+    df = df[["year", "count", "inferior", "superior"]]
+    df.attrs["ancho"] = ancho
+    return df
+
+def _ganadores(muestra):
+    return muestra[muestra["ganador"].fillna(False).astype(bool)]
+
+def _misterio(_db, muestra, n, N, confianza):
+    ids = dimensiones.ids_de_nombres(_db, "generos", consultas.FILTRO_MISTERIO.generos)
+    k = int(muestra["genero"].isin(ids).sum())
+    inferior, superior = intervalo(k, n, N, confianza)
+    return pd.DataFrame({"total_libros_misterio": [round(k * N / n) if n else 0],
+                         "inferior": [inferior], "superior": [superior]})
+
+def _por_genero(col_total, ganadores=False):
+    return lambda _db, m, n, N, c: _por_dimension(_db, _ganadores(m) if ganadores else m, "genero", "generos",
+                                                  "nombre_genero", col_total, n, N, c)
+
+def _por_idioma(col_total, ganadores=False):
+    return lambda _db, m, n, N, c: _por_dimension(_db, _ganadores(m) if ganadores else m, "idioma", "idiomas",
+                                                  "nombre_idioma", col_total, n, N, c)
+
+# consulta -> (necesita saber si el libro gano, estimador(_db, muestra, n, N, confianza)). Los "mas
+# ganador" estiman todos los grupos; estimar() devuelve el primero, como la consulta exacta
+ESTIMADORES = {
+    "consulta_2_genero_mas_ganador": (True, _por_genero("total_premios", ganadores=True)),
+    "consulta_3_idioma_mas_ganador": (True, _por_idioma("total_premios", ganadores=True)),
+    "consulta_6_contar_misterio": (False, _misterio),
+    "libros_por_genero": (False, _por_genero("count")),
+    "libros_por_anio": (False, lambda _db, m, n, N, c: _por_anio(m, n, N, c)),
+    "distribuciones": (True, lambda _db, m, n, N, c: {
+        "libros_por_genero": _por_genero("count")(_db, m, n, N, c),
+        "libros_por_lenguaje": _por_idioma("count")(_db, m, n, N, c),
+        "libros_por_anio": _por_anio(m, n, N, c, consultas.MAX_ANIOS_GRAFICO),
+        "premios_ganados_por_genero": _por_genero("awards_won", ganadores=True)(_db, m, n, N, c),
+    }),
+}
+_PRIMERO = {"consulta_2_genero_mas_ganador", "consulta_3_idioma_mas_ganador"}
+
+def _estimar(_db, nombre, tamanio, confianza):
+    ganadores, estimador = ESTIMADORES[nombre]
+    N = _db["libros"].estimated_document_count()   # metadatos de la coleccion, sin recorrerla
+    muestra = _muestra(_db, tamanio, ganadores) if N else pd.DataFrame(columns=_COLUMNAS)
+    n = len(muestra)
+    N = max(N, n)
+    resultado = estimador(_db, muestra, n, N, confianza)
+    for df in resultado.values() if isinstance(resultado, dict) else [resultado]:
+        df.attrs.update(muestra=n, total=N, confianza=confianza)
+    return resultado
+
+# misma forma que la consulta exacta, con columnas inferior/superior; attrs: muestra, total, confianza
+@cacheado("libros", "nominaciones", "generos", "idiomas")
+@medido
+def estimar(_db, nombre, tamanio=MUESTRA_APROXIMADA, confianza=CONFIANZA):
+    resultado = _estimar(_db, nombre, tamanio, confianza)
+    if nombre in _PRIMERO:
+        primero = resultado.head(1)
+        primero.attrs = dict(resultado.attrs)
+        return primero
+    return resultado
+
+# --> VERIFICACION <--
+
+# consulta -> (columna de la clave, columna del total); None = un solo valor
+_CLAVES = {
+    "consulta_2_genero_mas_ganador": ("nombre_genero", "total_premios"),
+    "consulta_3_idioma_mas_ganador": ("nombre_idioma", "total_premios"),
+    "consulta_6_contar_misterio": (None, "total_libros_misterio"),
+    "libros_por_genero": ("nombre_genero", "count"),
+    "libros_por_anio": ("year", "count"),
+}
+
+def _tabla(df, clave, total):
+    if clave is None:
+        return {None: tuple(int(df[c].iloc[0]) for c in (total, "inferior", "superior"))}
+    return {fila[clave]: (fila[total], fila["inferior"], fila["superior"]) for _, fila in df.iterrows()}
+
+def _iguales(completo, exacta, clave, total):
+    if clave is not None and exacta.empty:
+        return completo.empty
+    if clave is None or len(exacta) == 1:   # los "mas ganador" traen solo el primero
+        completo = completo.head(1)
+    columnas = [c for c in (clave, total) if c is not None]
+    return completo[columnas].reset_index(drop=True).astype(str).equals(
+        exacta[columnas].reset_index(drop=True).astype(str))
+
+# corre `repeticiones` muestras y cuenta cuantas veces el intervalo de cada grupo contiene al valor
+# exacto: (dentro, casos, error relativo medio). `completo` es la misma estimacion sobre toda la coleccion
+def cobertura(_db, nombre, completo, repeticiones=50, tamanio=MUESTRA_APROXIMADA, confianza=CONFIANZA):
+    N = _db["libros"].estimated_document_count()
+    clave, total = _CLAVES[nombre]
+    verdad = _tabla(completo, clave, total)
+    dentro = casos = 0
+    errores = []
+    for _ in range(repeticiones):
+        df = _estimar(_db, nombre, tamanio, confianza)
+        n, tabla = df.attrs["muestra"], _tabla(df, clave, total)
+        for grupo, (exacto, _, _) in verdad.items():
+            # un grupo que no salio en la muestra tiene k = 0
+            estimado, inferior, superior = tabla.get(grupo) or (0, *intervalo(0, n, max(N, n), confianza))
+            dentro += inferior <= exacto <= superior
+            casos += 1
+            errores.append(abs(estimado - exacto) / max(exacto, 1))
+    return dentro, casos, sum(errores) / max(len(errores), 1)
+
+# cobertura de cada consulta, despues de comparar la estimacion sobre toda la coleccion (el "exacto")
+# contra la consulta de consultas.py
+def verificar(_db, repeticiones=50, tamanio=MUESTRA_APROXIMADA, confianza=CONFIANZA, modo=None):
+    N = _db["libros"].estimated_document_count()
+    fallas = 0
+    for nombre, (clave, total) in _CLAVES.items():
+        completo = _estimar(_db, nombre, N + 1, confianza)
+        if not _iguales(completo, getattr(consultas, nombre)(_db, modo=modo), clave, total):
+            print(f"[FALLA] {nombre}: la estimacion sobre toda la coleccion no coincide con la consulta exacta")
+            fallas += 1
+            continue
+
+        dentro, casos, error = cobertura(_db, nombre, completo, repeticiones, tamanio, confianza)
+        proporcion = dentro / casos if casos else 1.0
+        # margen para la variacion de la propia cobertura con pocas repeticiones
+        estado = "OK" if proporcion >= confianza - 0.05 else "FALLA"
+        fallas += estado == "FALLA"
+        print(f"[{estado}] {nombre}: cobertura {proporcion:.1%} ({dentro}/{casos}), error relativo medio {error:.1%}")
+    return fallas
+
+def main(argv=None):
+    from pymongo import MongoClient
+    from conexion import MONGO_URI, MONGO_DBNAME
+    parser = argparse.ArgumentParser(description="Modo aproximado: estimaciones por muestreo y sus intervalos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    est = sub.add_parser("estimar", help="muestra la estimacion de una consulta")
+    est.add_argument("consulta", choices=list(ESTIMADORES))
+    verif = sub.add_parser("verificar", help="mide la cobertura de los intervalos contra el valor exacto "
+                                             "(por ejemplo sobre datos de generador_datos.py)")
+    verif.add_argument("--repeticiones", type=int, default=50)
+    verif.add_argument("--modo", choices=consultas.MODOS)
+    for p in (est, verif):
+        p.add_argument("--muestra", type=int, default=MUESTRA_APROXIMADA)
+        p.add_argument("--confianza", type=float, default=CONFIANZA)
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.uri)
+    try:
+        db = client[args.db]
+        if args.comando == "estimar":
+            resultado = estimar(db, args.consulta, tamanio=args.muestra, confianza=args.confianza)
+            for nombre, df in (resultado.items() if isinstance(resultado, dict) else [(args.consulta, resultado)]):
+                print(f"{nombre} (muestra {df.attrs['muestra']} de {df.attrs['total']}, "
+                      f"IC {df.attrs['confianza']:.0%}):\n{df.to_string(index=False)}\n")
+            return 0
+        fallas = verificar(db, args.repeticiones, args.muestra, args.confianza, args.modo)
+    finally:
+        client.close()
+    print(f"{fallas} consulta(s) con intervalos que no cubren." if fallas else "Los intervalos cubren el valor exacto.")
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+import inspect
+import threading
+import functools
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import pymongo
+from pymongo import AsyncMongoClient
+import conexion
+from conexion import MONGO_URI
+import cache
+import instrumentacion
+import consultas
+
+# ejecutor async de las consultas: corre varias a la vez sobre un event loop propio
+# (en un hilo aparte, asi se puede llamar desde streamlit o cualquier codigo sincrono).
+#
+# Cada consulta usa el mismo plan que consultas.py (consultas.plan) y lo manda con el
+# driver async de pymongo; las que se calculan en python (modo pandas, graficos) van a un
+# pool de hilos compartido. Cada una tiene su timeout, se puede cancelar, y si falla
+# devuelve el error en su Resultado sin afectar a las demas.
+
+TIMEOUT_CONSULTA = float(os.getenv("TIMEOUT_CONSULTA", "30"))       # segundos por consulta
+CONCURRENCIA = int(os.getenv("CONCURRENCIA_CONSULTAS", "8"))         # consultas en vuelo
+
+Resultado = namedtuple("Resultado", "valor error segundos")
+
+_bucle = None
+_clientes = {}   # uri -> AsyncMongoClient (solo se usan desde el hilo del loop)
+_pool = ThreadPoolExecutor(max_workers=CONCURRENCIA, thread_name_prefix="consulta")
+_lock = threading.Lock()
+
+def _obtener_bucle():
+    global _bucle
+    with _lock:
+        if _bucle is None:
+            _bucle = asyncio.new_event_loop()
+            threading.Thread(target=_bucle.run_forever, name="consultas-async", daemon=True).start()
+        return _bucle
+
+def _cliente(uri):
+    cliente = _clientes.get(uri)
+    if cliente is None:
+        cliente = _clientes[uri] = AsyncMongoClient(uri, serverSelectionTimeoutMS=3000, maxPoolSize=CONCURRENCIA,
+                                                     event_listeners=instrumentacion.listeners())
+    return cliente
+
+# --> EJECUCION <--
+
+def _en_pool(fn, *args):
+    # el hilo del pool hereda el contexto de la tarea (la consulta que esta midiendo instrumentacion)
+    contexto = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_pool, functools.partial(contexto.run, fn, *args))
+
+async def _ejecutar_plan(adb, plan):
+    coleccion, metodo, args, armar = plan
+    if coleccion is None:
+        return armar([])
+    coll = adb[coleccion]
+    if metodo == "aggregate":
+        resultado = await (await coll.aggregate(*args)).to_list()
+    elif metodo == "find":
+        resultado = await coll.find(*args).to_list()
+    else:
+        resultado = await getattr(coll, metodo)(*args)
+    # armar puede etiquetar con dimensiones (la primera vez lee la coleccion): fuera del loop
+    return await _en_pool(armar, resultado)
+
+def _en_hilo(fn, _db, kwargs, timeout):
+    # pymongo.timeout corta tambien las operaciones en el servidor (el hilo no se puede cancelar)
+    with pymongo.timeout(timeout):
+        return fn(_db, **kwargs)
+
+async def _calcular(_db, uri, fn, kwargs, timeout):
+    clave, versiones, valor = fn.leer(_db, **kwargs)
+    if valor is not cache.FALTA:
+        return valor
+
+    # dentro de pymongo.timeout la seleccion de servidor espera todo el timeout de la consulta, no los
+    # 3s del cliente: sin mongod se falla con el ping de conexion.py (compartido) antes de mandar nada
+    if uri == MONGO_URI:
+        await asyncio.wrap_future(conexion.verificar_conexion())
+
+    with instrumentacion.consulta(fn.__name__):
+        plan = await _en_pool(functools.partial(consultas.plan, fn.__name__, _db, **kwargs))
+        if plan is None:
+            valor = await _en_pool(_en_hilo, fn.__wrapped__, _db, kwargs, timeout)
+        else:
+            with pymongo.timeout(timeout):
+                valor = await _ejecutar_plan(_cliente(uri)[_db.name], plan)
+    return fn.guardar(clave, versiones, valor)
+
+async def _correr_una(_db, uri, fn, kwargs, timeout, cupo):
+    async with cupo:
+        inicio = time.perf_counter()
+        try:
+            valor = await asyncio.wait_for(_calcular(_db, uri, fn, kwargs, timeout), timeout)
+            return Resultado(valor, None, time.perf_counter() - inicio)
+        except Exception as e:
+            return Resultado(None, e, time.perf_counter() - inicio)
+
+async def _correr_todas(_db, uri, funciones, timeout, kwargs):
+    cupo = asyncio.Semaphore(CONCURRENCIA)
+    tareas = []
+    for fn in funciones:
+        # cada consulta recibe solo los parametros que acepta (modo, contar, ...)
+        aceptados = inspect.signature(fn).parameters
+        propios = {k: v for k, v in kwargs.items() if k in aceptados}
+        tareas.append(_correr_una(_db, uri, fn, propios, timeout, cupo))
+    resultados = await asyncio.gather(*tareas)
+    return {fn.__name__: resultado for fn, resultado in zip(funciones, resultados)}
+
+# --> API SINCRONICA <--
+
+# arranca las consultas y devuelve un concurrent.futures.Future con {nombre: Resultado};
+# future.cancel() cancela las que sigan en curso
+def lanzar(_db, funciones, timeout=TIMEOUT_CONSULTA, uri=MONGO_URI, **kwargs):
+    return asyncio.run_coroutine_threadsafe(_correr_todas(_db, uri, list(funciones), timeout, kwargs),
+                                            _obtener_bucle())
+
+def correr(_db, funciones, timeout=TIMEOUT_CONSULTA, uri=MONGO_URI, **kwargs):
+    futuro = lanzar(_db, funciones, timeout, uri, **kwargs)
+    try:
+        return futuro.result()
+    except BaseException:
+        futuro.cancel()
+        raise
+
+# misma firma que la consulta original; levanta el error si falla
+def consulta(fn, _db, timeout=TIMEOUT_CONSULTA, uri=MONGO_URI, **kwargs):
+    resultado = correr(_db, [fn], timeout, uri, **kwargs)[fn.__name__]
+    if resultado.error is not None:
+        raise resultado.error
+    return resultado.valor
+
+def cerrar():
+    # cierra los clientes async (al terminar el proceso o en los tests)
+    if _bucle is None:
+        return
+    async def _cerrar():
+        for cliente in _clientes.values():
+            await cliente.close()
+        _clientes.clear()
+    asyncio.run_coroutine_threadsafe(_cerrar(), _bucle).result()
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import inspect
+import resource
+import threading
+import subprocess
+from datetime import datetime, timezone
+import bson
+import numpy as np
+import pandas as pd
+import pymongo
+from pymongo import MongoClient, monitoring
+from conexion import MONGO_URI, MONGO_DBNAME
+import consultas
+import dimensiones
+import columnar
+import semijoin
+
+# mide cada consulta de consultas.py contra la base configurada (o la que se pase por --uri/--db)
+# y deja los resultados en json para comparar versiones.
+
+# --> MEDICIONES <--
+
+class _Trafico(monitoring.CommandListener):
+    # bytes de comandos enviados y respuestas recibidas (tamaño bson, sin el framing del wire protocol)
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.enviados = 0
+        self.recibidos = 0
+        self.comandos = 0
+
+    def started(self, event):
+        self.comandos += 1
+        self.enviados += len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        self.recibidos += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_actual():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA
+    except OSError:
+        # sin /proc solo se conoce el maximo del proceso
+        escala = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala
+
+class _MuestreoRSS:
+    # muestrea el RSS en un hilo mientras corre la consulta y se queda con el pico
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+
+    def __enter__(self):
+        self.inicial = self.pico = rss_actual()
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _muestrear(self):
+        while not self._fin.wait(self.intervalo):
+            self.pico = max(self.pico, rss_actual())
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+        self.pico = max(self.pico, rss_actual())
+
+def percentiles(latencias):
+    valores = np.array(latencias)
+    return {f"p{p}": float(np.percentile(valores, p)) for p in (50, 90, 95, 99)} | {
+        "media": float(valores.mean()), "min": float(valores.min()), "max": float(valores.max())}
+
+def medir(fn, db, repeticiones, calentamiento, trafico, **kwargs):
+    original = getattr(fn, "__wrapped__", fn)   # sin el cache de resultados
+    return _medir(lambda: original(db, **kwargs), repeticiones, calentamiento, trafico)
+
+def _medir(llamada, repeticiones, calentamiento, trafico):
+    for _ in range(calentamiento):
+        llamada()
+
+    latencias, picos, deltas = [], [], []
+    trafico.reiniciar()
+    for _ in range(repeticiones):
+        with _MuestreoRSS() as rss:
+            inicio = time.perf_counter()
+            llamada()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        picos.append(rss.pico)
+        deltas.append(rss.pico - rss.inicial)
+
+    return {
+        "latencia_ms": percentiles(latencias),
+        "latencias_ms": latencias,
+        "rss_pico_mb": max(picos) / 2**20,
+        "rss_delta_mb": max(deltas) / 2**20,
+        "bytes_enviados": trafico.enviados // repeticiones,
+        "bytes_recibidos": trafico.recibidos // repeticiones,
+        "comandos": trafico.comandos // repeticiones,
+    }
+
+def _git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def metadatos(db, args):
+    return {
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "git": _git(),
+        "python": platform.python_version(),
+        "pymongo": pymongo.version,
+        "pandas": pd.__version__,
+        "servidor": db.client.server_info().get("version"),
+        "db": db.name,
+        "colecciones": {c: db[c].estimated_document_count() for c in ("libros", "nominaciones")},
+        "repeticiones": args.repeticiones,
+        "modo": args.modo or os.getenv("MODO_CONSULTAS", "pipeline"),
+    }
+
+# --> EXTRACCION DE CAMPOS <--
+
+# campos que leen los caminos pandas: (coleccion, campo, es numerico)
+EXTRACCIONES = (
+    ("nominaciones", "libro", False),
+    ("libros", "genero", False),
+    ("libros", "idioma", False),
+    ("libros", "anio_publicacion", True),
+)
+
+def _con_listas(coll, campo, numerico):
+    # como estaban escritas las consultas: lista de dicts -> lista -> DataFrame
+    valores = [doc.get(campo) for doc in coll.find({}, {campo: 1, "_id": 0}) if doc.get(campo)]
+    serie = pd.Series(valores)
+    return pd.to_numeric(serie, errors="coerce") if numerico else serie
+
+def _con_columnar(coll, campo, numerico):
+    if numerico:
+        return pd.Series(columnar.numeros(coll, {}, campo, vacios=True))
+    return pd.Series(columnar.ids(coll, {}, campo))
+
+def medir_extraccion(db, repeticiones, calentamiento, trafico):
+    resultados = {}
+    print(f"\n{'campo':<30}{'listas ms':>12}{'columnar ms':>14}{'listas MB':>12}{'columnar MB':>14}")
+    for coleccion, campo, numerico in EXTRACCIONES:
+        coll = db[coleccion]
+        res = {
+            nombre: _medir(lambda f=f: f(coll, campo, numerico), repeticiones, calentamiento, trafico)
+            for nombre, f in (("listas", _con_listas), ("columnar", _con_columnar))
+        }
+        resultados[f"{coleccion}.{campo}"] = res
+        print(f"{coleccion + '.' + campo:<30}{res['listas']['latencia_ms']['p50']:>12.2f}"
+              f"{res['columnar']['latencia_ms']['p50']:>14.2f}{res['listas']['rss_delta_mb']:>12.1f}"
+              f"{res['columnar']['rss_delta_mb']:>14.1f}")
+    return resultados
+
+# --> ESTRATEGIAS DE SEMIJOIN <--
+
+def _con_estrategia(fn, db, estrategia):
+    anterior, semijoin.SEMIJOIN = semijoin.SEMIJOIN, estrategia
+    try:
+        return fn.__wrapped__(db, modo="pandas")
+    finally:
+        semijoin.SEMIJOIN = anterior
+
+def medir_semijoin(db, repeticiones, calentamiento, trafico):
+    # caminos pandas de consulta_1/4 con cada estrategia de semijoin.py forzada
+    resultados = {}
+    print(f"\n{'consulta':<36}{'estrategia':>12}{'p50 ms':>10}{'rss MB':>10}{'recibidos KB':>14}")
+    for fn in (consultas.consulta_1_promedio_nominados, consultas.consulta_4_idioma_mas_nominado):
+        for estrategia in semijoin.ESTRATEGIAS:
+            semijoin.olvidar(db)
+            res = _medir(lambda: _con_estrategia(fn, db, estrategia), repeticiones, calentamiento, trafico)
+            resultados[f"{fn.__name__}:{estrategia}"] = res
+            print(f"{fn.__name__:<36}{estrategia:>12}{res['latencia_ms']['p50']:>10.2f}"
+                  f"{res['rss_delta_mb']:>10.1f}{res['bytes_recibidos'] / 1024:>14.1f}")
+    return resultados
+
+# --> COMPARACION <--
+
+def comparar(actual, base, umbral):
+    regresiones = []
+    print(f"\n{'consulta':<36}{'p50 base':>12}{'p50 actual':>12}{'x':>8}")
+    for nombre, res in actual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nombre)
+        if not anterior:
+            continue
+        p50_base = anterior["latencia_ms"]["p50"]
+        p50 = res["latencia_ms"]["p50"]
+        razon = p50 / p50_base if p50_base else float("inf")
+        marca = "  <-- regresion" if razon > umbral else ""
+        print(f"{nombre:<36}{p50_base:>12.2f}{p50:>12.2f}{razon:>8.2f}{marca}")
+        if marca:
+            regresiones.append(nombre)
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas")
+    parser.add_argument("consultas", nargs="*", help="consultas a medir (por defecto todas)")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--calentamiento", type=int, default=1)
+    parser.add_argument("--modo", choices=consultas.MODOS)
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="json de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=1.2, help="razon de p50 que cuenta como regresion")
+    parser.add_argument("--semijoin", action="store_true",
+                        help="mide los caminos pandas de consulta_1/4 con cada estrategia de semijoin")
+    parser.add_argument("--extraccion", action="store_true",
+                        help="compara tambien leer campos con listas de dicts contra columnar.py")
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    trafico = _Trafico()
+    client = MongoClient(args.uri, event_listeners=[trafico])
+    db = client[args.db]
+    for coleccion in dimensiones.DIMENSIONES:
+        dimensiones.nombres_por_id(db, coleccion)
+
+    nombres = args.consultas or list(consultas.CONSULTAS)
+    desconocidas = set(nombres) - set(consultas.CONSULTAS)
+    if desconocidas:
+        parser.error(f"consultas desconocidas: {', '.join(sorted(desconocidas))}")
+    resultado = {"meta": metadatos(db, args), "resultados": {}}
+    for nombre in nombres:
+        fn = consultas.CONSULTAS[nombre]
+        original = getattr(fn, "__wrapped__", fn)
+        kwargs = {"modo": args.modo} if args.modo and "modo" in inspect.signature(original).parameters else {}
+        res = medir(fn, db, args.repeticiones, args.calentamiento, trafico, **kwargs)
+        resultado["resultados"][nombre] = res
+        lat = res["latencia_ms"]
+        print(f"{nombre:<36} p50 {lat['p50']:9.2f} ms  p95 {lat['p95']:9.2f} ms  "
+              f"rss +{res['rss_delta_mb']:7.1f} MB  recibidos {res['bytes_recibidos'] / 1024:10.1f} KB")
+
+    if args.semijoin:
+        resultado["semijoin"] = medir_semijoin(db, args.repeticiones, args.calentamiento, trafico)
+    if args.extraccion:
+        resultado["extraccion"] = medir_extraccion(db, args.repeticiones, args.calentamiento, trafico)
+
+    with open(args.salida, "w") as f:
+        json.dump(resultado, f, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.umbral):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
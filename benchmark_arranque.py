@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+
+# arranque en frio de la app, cada medicion en un proceso nuevo:
+#   importacion     -> python -X importtime de lo que main.py importa antes de dibujar el menu
+#   vistas          -> lo mismo para vistas.py (lo que paga la primera vista)
+#   ttfb            -> desde que arranca `streamlit run main.py` hasta el primer byte de la pagina
+#   primera corrida -> la primera corrida completa del script (streamlit.testing AppTest)
+# Sale con 1 si algo pasa los umbrales o si el arranque vuelve a importar una libreria pesada.
+
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# lo que main.py importa antes de dibujar el encabezado y el menu
+ARRANQUE = ("streamlit", "conexion")
+# no deberian cargarse hasta que se dibuja una vista (salvo lo que ya importa streamlit)
+PESADOS = ("pandas", "numpy", "plotly", "pymongo", "pyarrow")
+
+# --> MEDICIONES <--
+
+def importacion(modulos):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modulos)}"],
+                          capture_output=True, text=True, cwd=_RAIZ)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    filas = []
+    propios, pendientes = set(), []   # paquetes que importa nuestro codigo (no streamlit)
+    for linea in proc.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        # la sangria del nombre es la profundidad; los de primer nivel tienen un solo espacio.
+        # Cada modulo aparece antes que el de primer nivel que lo importo
+        nivel = len(nombre) - len(nombre.lstrip()) - 1
+        nombre = nombre.strip()
+        filas.append((nombre, nivel, int(propio), int(acumulado)))
+        pendientes.append(nombre.split(".")[0])
+        if nivel == 0:
+            if pendientes[-1] != "streamlit":
+                propios.update(pendientes)
+            pendientes = []
+    total = sum(acumulado for _, nivel, _, acumulado in filas if nivel == 0)
+    return {
+        "total_ms": total / 1000,
+        "mas_lentos_ms": {nombre: propio / 1000 for nombre, _, propio, _ in
+                          sorted(filas, key=lambda f: f[2], reverse=True)[:10]},
+        "pesados": [p for p in PESADOS if p in propios],
+    }
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def ttfb(timeout=60):
+    puerto = _puerto_libre()
+    inicio = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "streamlit", "run", "main.py", "--server.headless", "true",
+                             "--server.port", str(puerto), "--browser.gatherUsageStats", "false"],
+                            cwd=_RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - inicio < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/", timeout=1) as respuesta:
+                    respuesta.read(1)
+                    return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"streamlit termino con codigo {proc.returncode}")
+                time.sleep(0.02)
+        raise TimeoutError(f"streamlit no respondio en {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+_PRIMERA_CORRIDA = """
+import time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("main.py", default_timeout={timeout}).run()
+print("primera_corrida_ms", (time.perf_counter() - inicio) * 1000, flush=True)
+"""
+
+def primera_corrida(timeout=60):
+    proc = subprocess.run([sys.executable, "-c", _PRIMERA_CORRIDA.format(timeout=timeout)],
+                          capture_output=True, text=True, cwd=_RAIZ)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    # la precarga de las otras vistas tambien escribe en stdout
+    return next(float(linea.split()[1]) for linea in proc.stdout.splitlines()
+                if linea.startswith("primera_corrida_ms "))
+
+# --> CLI <--
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frio de main.py")
+    parser.add_argument("--repeticiones", type=int, default=3, help="se informa la mediana")
+    parser.add_argument("--max-importacion-ms", type=float, default=800,
+                        help="umbral de la importacion previa al menu")
+    parser.add_argument("--max-ttfb-ms", type=float, default=5000, help="umbral del primer byte del servidor")
+    parser.add_argument("--max-primera-corrida-ms", type=float,
+                        help="umbral de la primera corrida del script (depende de la base, sin umbral por defecto)")
+    parser.add_argument("--sin-servidor", action="store_true", help="no mide ttfb ni la primera corrida")
+    parser.add_argument("--salida", default="arranque.json")
+    args = parser.parse_args(argv)
+
+    arranque = [importacion(ARRANQUE) for _ in range(args.repeticiones)]
+    vistas = [importacion(("vistas",)) for _ in range(args.repeticiones)]
+    resultado = {
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "importacion_ms": statistics.median(m["total_ms"] for m in arranque),
+        "importacion_mas_lentos_ms": arranque[-1]["mas_lentos_ms"],
+        "pesados_en_arranque": arranque[-1]["pesados"],
+        "vistas_ms": statistics.median(m["total_ms"] for m in vistas),
+    }
+    if not args.sin_servidor:
+        resultado["ttfb_ms"] = statistics.median(ttfb() for _ in range(args.repeticiones))
+        resultado["primera_corrida_ms"] = statistics.median(primera_corrida() for _ in range(args.repeticiones))
+
+    print(f"importacion antes del menu {resultado['importacion_ms']:8.1f} ms  "
+          f"(mas lentos: {', '.join(f'{n} {ms:.1f}' for n, ms in list(resultado['importacion_mas_lentos_ms'].items())[:3])})")
+    print(f"importacion de vistas.py   {resultado['vistas_ms']:8.1f} ms")
+    if not args.sin_servidor:
+        print(f"primer byte del servidor   {resultado['ttfb_ms']:8.1f} ms")
+        print(f"primera corrida del script {resultado['primera_corrida_ms']:8.1f} ms")
+
+    fallas = []
+    if resultado["pesados_en_arranque"]:
+        fallas.append(f"el arranque importa {', '.join(resultado['pesados_en_arranque'])}")
+    if resultado["importacion_ms"] > args.max_importacion_ms:
+        fallas.append(f"importacion {resultado['importacion_ms']:.1f} ms > {args.max_importacion_ms:.0f} ms")
+    if "ttfb_ms" in resultado and resultado["ttfb_ms"] > args.max_ttfb_ms:
+        fallas.append(f"primer byte {resultado['ttfb_ms']:.1f} ms > {args.max_ttfb_ms:.0f} ms")
+    if args.max_primera_corrida_ms and resultado.get("primera_corrida_ms", 0) > args.max_primera_corrida_ms:
+        fallas.append(f"primera corrida {resultado['primera_corrida_ms']:.1f} ms > {args.max_primera_corrida_ms:.0f} ms")
+    resultado["fallas"] = fallas
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    for falla in fallas:
+        print(f"[REGRESION] {falla}")
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
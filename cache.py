@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from pymongo.errors import OperationFailure, PyMongoError
+
+# cache de resultados de las consultas, compartido por todas las sesiones del proceso
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))        # segundos, 0 desactiva el cache
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "256"))  # entradas, se desaloja la menos usada
+CACHE_SONDEO = float(os.getenv("CACHE_SONDEO", "5"))    # segundos entre sondeos sin change streams
+
+# colecciones que invalidan resultados cuando cambian
+COLECCIONES = ("libros", "nominaciones", "generos", "idiomas", "premios", "formatos", "autores", "resumen_libros")
+
+# codigos de error de mongod cuando no hay change streams (standalone / sin replica set)
+_SIN_CHANGE_STREAMS = (40573, 40324, 20)
+
+_entradas = OrderedDict()   # clave -> (vence, versiones, valor)
+_calculando = {}            # clave -> lock, para no calcular lo mismo en paralelo
+_versiones = {}             # (db, coleccion) -> contador local
+_vigilantes = {}            # db -> hilo que detecta cambios
+_lock = threading.Lock()
+
+# pool chico para precalentar el cache sin competir con las consultas de la vista activa
+_precarga = ThreadPoolExecutor(max_workers=2, thread_name_prefix="precarga")
+_precargando = set()
+
+def version(db_name, coleccion):
+    return _versiones.get((db_name, coleccion), 0)
+
+# marca la coleccion como cambiada; las entradas que dependen de ella dejan de valer
+def invalidar(db_name, coleccion=None):
+    with _lock:
+        if coleccion is None:
+            claves = [k for k in _versiones if k[0] == db_name]
+            claves += [(db_name, c) for c in COLECCIONES]
+        else:
+            claves = [(db_name, coleccion)]
+        for k in set(claves):
+            _versiones[k] = _versiones.get(k, 0) + 1
+
+def limpiar():
+    with _lock:
+        _entradas.clear()
+
+def _copia(valor):
+    if type(valor) is dict:   # varias tablas en un solo resultado (ej. distribuciones)
+        return {k: _copia(v) for k, v in valor.items()}
+    copiar = getattr(valor, "copy", None)
+    return copiar() if callable(copiar) else valor
+
+# memoiza una consulta por (funcion, db, parametros). Un hit solo compara contadores
+# locales, no hace ningun round trip a la base.
+def cacheado(*colecciones):
+    def decorador(fn):
+        def clave_de(_db, args, kwargs):
+            return (fn.__module__, fn.__qualname__, _db.name, args, tuple(sorted(kwargs.items())))
+
+        def versiones_de(_db):
+            return tuple(version(_db.name, c) for c in colecciones)
+
+        @functools.wraps(fn)
+        def envoltura(_db, *args, **kwargs):
+            if _db is None or CACHE_TTL <= 0:
+                return fn(_db, *args, **kwargs)
+
+            clave = clave_de(_db, args, kwargs)
+            with _lock:
+                calculo = _calculando.setdefault(clave, threading.Lock())
+
+            with calculo:
+                versiones = versiones_de(_db)
+                valor = _buscar(clave, versiones)
+                if valor is not FALTA:
+                    return valor
+                valor = fn(_db, *args, **kwargs)
+                _guardar(clave, versiones, valor)
+            return _copia(valor)
+
+        # para ejecutores que calculan por su cuenta (asincrono.py): (clave, versiones, valor o FALTA).
+        # Las versiones son las de antes de calcular, asi un cambio en el medio no deja un valor viejo.
+        def leer(_db, *args, **kwargs):
+            if _db is None or CACHE_TTL <= 0:
+                return None, None, FALTA
+            clave, versiones = clave_de(_db, args, kwargs), versiones_de(_db)
+            return clave, versiones, _buscar(clave, versiones)
+
+        def guardar(clave, versiones, valor):
+            if clave is not None:
+                _guardar(clave, versiones, valor)
+            return _copia(valor)
+
+        envoltura.colecciones = colecciones
+        envoltura.leer = leer
+        envoltura.guardar = guardar
+        return envoltura
+    return decorador
+
+FALTA = object()
+
+def _buscar(clave, versiones):
+    with _lock:
+        entrada = _entradas.get(clave)
+        if entrada and entrada[0] > time.monotonic() and entrada[1] == versiones:
+            _entradas.move_to_end(clave)
+            return _copia(entrada[2])
+    return FALTA
+
+def _guardar(clave, versiones, valor):
+    with _lock:
+        _entradas[clave] = (time.monotonic() + CACHE_TTL, versiones, valor)
+        _entradas.move_to_end(clave)
+        while len(_entradas) > CACHE_MAXSIZE:
+            viejo, _ = _entradas.popitem(last=False)
+            _calculando.pop(viejo, None)
+
+# corre las consultas en segundo plano para que queden en cache; no repite las que ya estan en curso
+def precargar(_db, funciones):
+    if CACHE_TTL <= 0:
+        return   # sin cache el resultado se tiraria
+    for fn in funciones:
+        clave = (fn.__module__, fn.__qualname__, _db.name)
+        with _lock:
+            if clave in _precargando:
+                continue
+            _precargando.add(clave)
+        _precarga.submit(_precargar_una, fn, _db, clave)
+
+def _precargar_una(fn, _db, clave):
+    try:
+        fn(_db)
+    except Exception as e:
+        print(f"No se pudo precargar {fn.__name__}: {e}")
+    finally:
+        with _lock:
+            _precargando.discard(clave)
+
+# arranca (una vez por proceso y db) el hilo que sube las versiones cuando cambian los datos
+def vigilar(_db, colecciones=COLECCIONES):
+    with _lock:
+        hilo = _vigilantes.get(_db.name)
+        if hilo is not None and hilo.is_alive():
+            return
+        hilo = threading.Thread(target=_vigilar, args=(_db, tuple(colecciones)),
+                                name=f"cache-{_db.name}", daemon=True)
+        _vigilantes[_db.name] = hilo
+    hilo.start()
+
+def _vigilar(_db, colecciones):
+    filtro = [{"$match": {"ns.coll": {"$in": list(colecciones)}}}]
+    while True:
+        try:
+            with _db.watch(filtro) as stream:
+                for cambio in stream:
+                    invalidar(_db.name, cambio.get("ns", {}).get("coll"))
+        except OperationFailure as e:
+            if e.code in _SIN_CHANGE_STREAMS:
+                _sondear(_db, colecciones)
+                return
+            time.sleep(CACHE_SONDEO)
+        except PyMongoError:
+            time.sleep(CACHE_SONDEO)
+        # el stream se cerro (drop/rename o se cayo la conexion): lo que haya en cache ya no es confiable
+        invalidar(_db.name)
+
+# sin change streams: sello barato por coleccion (cantidad y tamaño segun metadata).
+# Un update que no cambia el tamaño no se detecta; ese caso lo acota el TTL.
+def _sello(_db, coleccion):
+    try:
+        stats = next(_db[coleccion].aggregate([{"$collStats": {"count": {}, "storageStats": {}}}]), {})
+    except OperationFailure:
+        return None   # la coleccion no existe
+    return (stats.get("count"), stats.get("storageStats", {}).get("size"))
+
+def _sondear(_db, colecciones):
+    sellos = {}
+    while True:
+        for coleccion in colecciones:
+            try:
+                sello = _sello(_db, coleccion)
+            except PyMongoError:
+                continue
+            if coleccion in sellos and sellos[coleccion] != sello:
+                invalidar(_db.name, coleccion)
+            sellos[coleccion] = sello
+        time.sleep(CACHE_SONDEO)
@@ -0,0 +1,172 @@
+from itertools import islice
+import numpy as np
+import pandas as pd
+import bson
+from instrumentacion import etapa
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pymongoarrow.api import Schema, find_arrow_all
+except ImportError:   # opcional: sin pymongoarrow se leen los lotes de bson crudo
+    find_arrow_all = None
+
+# lectura columnar de un campo: en vez de armar una lista de dicts y despues un DataFrame,
+# cada lote del cursor se pasa a un arreglo numpy tipado y solo se guardan los arreglos.
+# Con pymongoarrow instalado el driver decodifica el bson directo a columnas arrow.
+# Sin pymongoarrow se piden los lotes en bson crudo (find_raw_batches): si todos los documentos
+# del lote tienen la misma forma (mismos campos numericos, del mismo tipo) los valores se leen
+# con numpy directo de los bytes, sin armar un dict por documento.
+
+TAM_LOTE = 10_000
+
+# tipo bson -> (bytes del valor, dtype) de los que se leen directo
+_FIJOS = {0x01: (8, "<f8"), 0x10: (4, "<i4"), 0x12: (8, "<i8")}
+
+# forma del primer documento del lote: [(campo, inicio del valor, tamaño, dtype)], o None si
+# algun campo no es de tamaño fijo
+def _forma(buf):
+    largo = int.from_bytes(buf[:4].tobytes(), "little")
+    forma, pos = [], 4
+    while pos < largo - 1:
+        tipo = buf[pos]
+        fin = pos + 1 + buf[pos + 1:largo].tobytes().index(b"\0")
+        if tipo not in _FIJOS:
+            return None
+        tam, dtype = _FIJOS[tipo]
+        forma.append((buf[pos + 1:fin].tobytes().decode(), fin + 1, tam, dtype))
+        pos = fin + 1 + tam
+    return largo, forma
+
+# {campo: arreglo} de un lote crudo en que todos los documentos son iguales salvo los valores;
+# None si no lo son (se decodifica normal)
+def _columnas_fijas(lote, campos):
+    buf = np.frombuffer(lote, dtype=np.uint8)
+    forma = _forma(buf) if len(buf) else None
+    if forma is None:
+        return None
+    largo, forma = forma
+    if len(buf) % largo or {c for c, *_ in forma} != set(campos):
+        return None
+    filas = buf.reshape(-1, largo)
+    # fuera de los valores (largo, tipos, nombres) todas las filas tienen que coincidir byte a byte
+    estructura = np.ones(largo, dtype=bool)
+    for _, inicio, tam, _ in forma:
+        estructura[inicio:inicio + tam] = False
+    if not (filas[:, estructura] == filas[0, estructura]).all():
+        return None
+    return {campo: np.ascontiguousarray(filas[:, inicio:inicio + tam]).view(dtype)[:, 0]
+            for campo, inicio, tam, dtype in forma}
+
+# lotes del cursor como {campo: valores}: arreglo numpy si el lote se leyo directo de los bytes,
+# lista de python si no
+def _lotes(coll, filtro, campos, tam=TAM_LOTE):
+    proyeccion = dict.fromkeys(campos, 1) | {"_id": 0}
+    try:
+        cursor = coll.find_raw_batches(filtro, proyeccion, batch_size=tam)
+    except NotImplementedError:   # ej. mongomock: documento por documento
+        cursor = None
+    if cursor is None:
+        cursor = coll.find(filtro, proyeccion, batch_size=tam)
+        lotes = iter(lambda: list(islice(cursor, tam)), [])
+    else:
+        lotes = (_columnas_fijas(lote, campos) or bson.decode_all(lote, coll.codec_options) for lote in cursor)
+    try:
+        for lote in lotes:
+            if isinstance(lote, dict):
+                yield lote
+            elif lote:
+                yield {campo: [doc.get(campo) for doc in lote] for campo in campos}
+    finally:
+        cursor.close()
+
+def _arreglo(valores):
+    # enteros -> int64; cualquier otra cosa (ObjectId, strings, floats mezclados) queda como object
+    try:
+        arr = np.array(valores)
+    except (ValueError, OverflowError):
+        arr = None
+    if arr is None or arr.ndim != 1 or arr.dtype.kind not in "iu":
+        arr = np.empty(len(valores), dtype=object)
+        arr[:] = valores
+    return arr
+
+def _unir(partes, dtype):
+    return np.concatenate(partes) if partes else np.empty(0, dtype=dtype)
+
+# pymongoarrow decodifica a un tipo fijo y con allow_invalid=False levanta TypeError si algun valor
+# es de otro tipo (ObjectId, strings): None y se lee en python, que los conserva o los convierte
+def _arrow(coll, filtro, campo, tipo):
+    if find_arrow_all is None:
+        return None
+    try:
+        return find_arrow_all(coll, filtro, schema=Schema({campo: getattr(pa, tipo)()}),
+                              projection={campo: 1, "_id": 0}, allow_invalid=False)[campo]
+    except TypeError:
+        return None
+
+# valores "truthy" del campo (como el `if x.get(campo)` de antes), en el orden del cursor
+def ids(coll, filtro, campo):
+    columna = _arrow(coll, filtro, campo, "int64")
+    if columna is not None:
+        columna = columna.filter(pc.and_(pc.is_valid(columna), pc.not_equal(columna, 0)))
+        return columna.to_numpy(zero_copy_only=False)
+
+    partes = []
+    for lote in _lotes(coll, filtro, [campo]):
+        valores = lote[campo]
+        if isinstance(valores, np.ndarray):
+            if valores.dtype.kind == "i":
+                partes.append(valores[valores != 0].astype(np.int64))
+                continue
+            valores = valores.tolist()   # doubles: quedan como object, igual que decodificados
+        partes.append(_arreglo([v for v in valores if v]))
+    return _unir(partes, np.int64)
+
+# campo numerico como float64, NaN donde no es un numero (pd.to_numeric errors='coerce').
+# Con vacios=True ademas se descartan los valores "falsy" antes de convertir.
+def numeros(coll, filtro, campo, vacios=False):
+    columna = _arrow(coll, filtro, campo, "float64")
+    if columna is not None:
+        if vacios:
+            columna = columna.filter(pc.and_(pc.is_valid(columna), pc.not_equal(columna, 0)))
+        return columna.to_numpy(zero_copy_only=False)
+
+    partes = []
+    for lote in _lotes(coll, filtro, [campo]):
+        valores = lote[campo]
+        if isinstance(valores, np.ndarray):
+            valores = valores.astype(np.float64)
+            partes.append(valores[valores != 0] if vacios else valores)
+            continue
+        if vacios:
+            valores = [v for v in valores if v]
+        with etapa("to_numeric"):
+            partes.append(pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype=np.float64))
+    return _unir(partes, np.float64)
+
+# varios campos en una sola pasada del cursor: {campo: arreglo} (int64 si son enteros, si no object)
+def columnas(coll, filtro, campos, tam=TAM_LOTE):
+    partes = {campo: [] for campo in campos}
+    for lote in _lotes(coll, filtro, campos, tam):
+        for campo in campos:
+            valores = lote[campo]
+            if isinstance(valores, np.ndarray):
+                partes[campo].append(valores.astype(np.int64 if valores.dtype.kind == "i" else object))
+            else:
+                partes[campo].append(_arreglo(valores))
+    return {campo: _unir(p, object) for campo, p in partes.items()}
+
+# valores "truthy" de un arreglo de columnas(), con el mismo tipo que devuelve ids()
+def verdaderos(arr):
+    return _arreglo([v for v in arr if v])
+
+# ids sin repetir, como lista de python para mandar en un $in
+def distintos(arr):
+    return pd.unique(arr).tolist()
+
+# conteo por valor con el formato que esperan las consultas (_id, columna)
+def contar(arr, columna):
+    with etapa("value_counts"):
+        conteo = pd.Series(arr, dtype=arr.dtype).value_counts()
+    return pd.DataFrame({"_id": conteo.index, columna: conteo.to_numpy()})
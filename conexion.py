@@ -0,0 +1,49 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# recupero los datos entorno/.env
+load_dotenv()
+
+MONGO_HOST = os.getenv("MONGO_HOST")
+MONGO_PORT = os.getenv("MONGO_PORT")
+MONGO_DBNAME = os.getenv("MONGO_DBNAME")
+MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/"
+CONN_INFO = f"{MONGO_HOST}:{MONGO_PORT} (Sin autenticar)"
+
+_cliente = None
+_ping = None   # Future del ultimo chequeo de salud
+_lock = threading.Lock()
+_chequeos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ping")
+
+# cliente unico por proceso: MongoClient es thread-safe y tiene su propio pool,
+# asi cada rerun/sesion de streamlit reutiliza las conexiones en vez de abrir otra vez.
+# connect=False: no abre nada hasta la primera operacion (pymongo se importa recien aca)
+def obtener_cliente():
+    global _cliente
+    with _lock:
+        if _cliente is None:
+            from pymongo import MongoClient
+            import instrumentacion
+            _cliente = MongoClient(MONGO_URI, serverSelectionTimeoutMS=3000, connect=False,
+                                   event_listeners=instrumentacion.listeners())
+        return _cliente
+
+# chequeo de salud sin bloquear: el ping corre en segundo plano y se devuelve su Future.
+# Si el ultimo fallo se vuelve a intentar.
+def verificar_conexion():
+    global _ping
+    cliente = obtener_cliente()
+    with _lock:
+        if _ping is None or (_ping.done() and _ping.exception() is not None):
+            _ping = _chequeos.submit(cliente.admin.command, "ping")
+        return _ping
+
+def cerrar_cliente():
+    global _cliente, _ping
+    with _lock:
+        if _cliente is not None:
+            _cliente.close()
+            _cliente = None
+        _ping = None
@@ -0,0 +1,547 @@
+import os
+import pandas as pd
+from cache import cacheado
+from instrumentacion import medido, etapa
+import dimensiones
+import columnar
+import semijoin
+import filtros
+from rollups import RESUMEN
+
+# modo de ejecucion de las consultas:
+#   "pipeline" -> el join nominaciones->libros->dimension se resuelve en MongoDB ($lookup/$group)
+#   "pandas"   -> camino original, trae los ids a python y cruza con pandas
+#   "rollup"   -> lee la coleccion resumen que mantiene rollups.py (O(grupos))
+MODOS = ("pipeline", "pandas", "rollup")
+
+# puntos como maximo en el grafico de años de distribuciones() (si hay mas se agrupan)
+MAX_ANIOS_GRAFICO = int(os.getenv("MAX_ANIOS_GRAFICO", "100"))
+
+# valores que el camino pandas descarta con el `if x.get(...)`
+_VACIOS = [None, 0, False, ""]
+
+def _modo(modo):
+    modo = modo or os.getenv("MODO_CONSULTAS", "pipeline")
+    if modo not in MODOS:
+        raise ValueError(f"Modo de consulta desconocido: {modo} (opciones: {', '.join(MODOS)})")
+    return modo
+
+def _a_numero(campo):
+    # equivalente a pd.to_numeric(errors='coerce'); los numeros (el caso comun) no pasan por $convert
+    convertido = {"$convert": {"input": campo, "to": "double", "onError": None, "onNull": None}}
+    return {"$cond": [{"$isNumber": campo}, {"$multiply": [campo, 1.0]}, convertido]}
+
+# pipeline base: nominaciones (filtradas) -> libros nominados, un libro por documento.
+# El $sort antes del $group deja que mongod lo resuelva con DISTINCT_SCAN sobre el indice de libro.
+# Con contar="nominacion" cada libro trae ademas cuantas nominaciones tiene (ya no es DISTINCT_SCAN)
+def _pipeline_libros_nominados(filtro, contar="libro"):
+    grupo = {"_id": "$libro"}
+    if contar == "nominacion":
+        grupo["nominaciones"] = {"$sum": 1}
+    return [
+        {"$match": filtro},
+        {"$sort": {"libro": 1}},
+        {"$group": grupo},
+        {"$match": {"_id": {"$nin": _VACIOS}}},
+        {"$lookup": {"from": "libros", "localField": "_id", "foreignField": "_id", "as": "libro"}},
+        {"$unwind": "$libro"},
+    ]
+
+# cuenta libros nominados por genero/idioma; solo quedan los ids que existen en la dimension
+# (como el merge inner), el nombre se pone despues con el indice en memoria
+def _pipeline_por_dimension(filtro, campo, ids_validos, col_total, limite=None, contar="libro"):
+    pipeline = _pipeline_libros_nominados(filtro, contar) + [
+        {"$match": {f"libro.{campo}": {"$nin": _VACIOS}}},
+        {"$group": {"_id": f"$libro.{campo}", col_total: {"$sum": 1 if contar == "libro" else "$nominaciones"}}},
+        {"$match": {"_id": {"$in": ids_validos}}},
+        {"$sort": {col_total: -1, "_id": 1}},
+    ]
+    if limite:
+        pipeline.append({"$limit": limite})
+    return pipeline
+
+# lo mismo sobre el resumen: cada grupo (genero, idioma, anio) ya trae la metrica sumada
+def _pipeline_rollup_por_dimension(metrica, campo, ids_validos, col_total, limite=None):
+    pipeline = [
+        {"$match": {f"_id.{campo}": {"$nin": _VACIOS}, metrica: {"$gt": 0}}},
+        {"$group": {"_id": f"$_id.{campo}", col_total: {"$sum": f"${metrica}"}}},
+        {"$match": {"_id": {"$in": ids_validos}}},
+        {"$sort": {col_total: -1, "_id": 1}},
+    ]
+    if limite:
+        pipeline.append({"$limit": limite})
+    return pipeline
+
+# --> PLANES <--
+# en modo pipeline/rollup cada consulta es un solo comando a la base:
+#   (coleccion, metodo, argumentos, armar)    metodo: "aggregate", "find" o "count_documents"
+# armar recibe los documentos (o el conteo) y devuelve el DataFrame. Aca se corre con pymongo
+# (_ejecutar); asincrono.py corre el mismo plan con el driver async.
+# Con coleccion None no hace falta ir a la base (ej. un nombre que no esta en la dimension).
+
+def _ejecutar(_db, plan):
+    coleccion, metodo, args, armar = plan
+    if coleccion is None:
+        return armar([])
+    resultado = getattr(_db[coleccion], metodo)(*args)
+    return armar(resultado if metodo == "count_documents" else list(resultado))
+
+# filtro: nominaciones a considerar en modo pipeline; metrica: el contador equivalente del resumen
+def _plan_por_dimension(_db, modo, filtro, metrica, campo, coleccion_dim, col_nombre, col_total, limite=None, contar="libro"):
+    nombres = dimensiones.nombres_por_id(_db, coleccion_dim)
+    if modo == "rollup":
+        coleccion = RESUMEN
+        pipeline = _pipeline_rollup_por_dimension(metrica, campo, list(nombres), col_total, limite)
+    else:
+        coleccion = "nominaciones"
+        pipeline = _pipeline_por_dimension(filtro, campo, list(nombres), col_total, limite, contar)
+
+    def armar(docs):
+        return pd.DataFrame({
+            col_nombre: [nombres[doc["_id"]] for doc in docs],
+            col_total: [doc[col_total] for doc in docs],
+        }, columns=[col_nombre, col_total])
+    return coleccion, "aggregate", (pipeline,), armar
+
+# suma de metricas del resumen para los grupos que cumplen el filtro; armar recibe los totales
+def _plan_sumar_rollup(filtro, metricas, armar):
+    pipeline = [
+        {"$match": filtro},
+        {"$group": {"_id": None} | {m: {"$sum": f"${m}"} for m in metricas}},
+    ]
+    return RESUMEN, "aggregate", (pipeline,), lambda docs: armar(docs[0] if docs else dict.fromkeys(metricas, 0))
+
+def _plan_promedio_rollup(filtro, suma, cantidad):
+    def armar(totales):
+        promedio = totales[suma] / totales[cantidad] if totales[cantidad] else float('nan')
+        return pd.DataFrame({'promedio_anio': [promedio]})
+    return _plan_sumar_rollup(filtro, (suma, cantidad), armar)
+
+# conteo de libros por genero/idioma desde el resumen, con el mismo formato que los graficos
+def _plan_conteo_rollup(_db, campo, coleccion_dim, col_nombre):
+    pipeline = [
+        {"$match": {f"_id.{campo}": {"$nin": _VACIOS}}},
+        {"$group": {"_id": f"$_id.{campo}", "count": {"$sum": "$libros"}}},
+        {"$match": {"count": {"$gt": 0}}},
+    ]
+    def armar(docs):
+        df_counts = pd.DataFrame(docs, columns=['_id', 'count'])
+        df_merged = dimensiones.etiquetar(_db, coleccion_dim, df_counts)
+        df_merged = df_merged.sort_values(by=['count', '_id'], ascending=[False, True])
+        return df_merged[['nombre', 'count']].rename(columns={'nombre': col_nombre}).reset_index(drop=True)
+    return RESUMEN, "aggregate", (pipeline,), armar
+
+# camino pandas: libros nominados (semijoin.py) contados por genero/idioma, con el formato de value_counts
+def _contar_nominados(_db, filtro, campo, col_total, contar="libro"):
+    df_libros = semijoin.libros_nominados(_db, filtro, [campo])
+    df_libros = df_libros[df_libros[campo].notna() & df_libros[campo].map(bool)]
+    df_libros = df_libros.assign(**{col_total: semijoin.pesos(df_libros, contar)})
+    with etapa("groupby"):
+        return df_libros.groupby(campo, as_index=False)[col_total].sum().rename(columns={campo: '_id'})
+
+# --> CONSULTAS <--
+
+# contar="libro": cada libro nominado pesa uno; contar="nominacion": pesa por cada nominacion que tiene
+@cacheado("nominaciones", "libros", RESUMEN)
+@medido
+def consulta_1_promedio_nominados(_db, modo=None, contar="libro"):
+    contar = semijoin.validar_contar(contar)
+    plan = _plan_consulta_1(_db, _modo(modo), contar)
+    if plan is None:
+        return _consulta_1_pandas(_db, contar)
+    return _ejecutar(_db, plan)
+
+def _plan_consulta_1(_db, modo, contar="libro"):
+    if modo == "pandas":
+        return None
+    if modo == "rollup":
+        if contar == "nominacion":
+            return _plan_promedio_rollup({}, "suma_anios_x_nominacion", "n_anios_x_nominacion")
+        return _plan_promedio_rollup({}, "suma_anios_nominados", "n_anios_nominados")
+
+    if contar == "nominacion":
+        anio = _a_numero("$libro.anio_publicacion")
+        grupo = {"_id": None,
+                 "suma": {"$sum": {"$multiply": [anio, "$nominaciones"]}},
+                 "n": {"$sum": {"$cond": [{"$eq": [anio, None]}, 0, "$nominaciones"]}}}
+    else:
+        grupo = {"_id": None, "promedio_anio": {"$avg": _a_numero("$libro.anio_publicacion")}}
+
+    def armar(docs):
+        if docs and contar == "nominacion":
+            promedio = docs[0]["suma"] / docs[0]["n"] if docs[0]["n"] else None
+        else:
+            promedio = docs[0]["promedio_anio"] if docs else None
+        return pd.DataFrame({'promedio_anio': [float('nan') if promedio is None else float(promedio)]})
+    return "nominaciones", "aggregate", (_pipeline_libros_nominados({}, contar) + [{"$group": grupo}],), armar
+
+def _consulta_1_pandas(_db, contar="libro"):
+
+    df_libros = semijoin.libros_nominados(_db, {}, ["anio_publicacion"])
+    with etapa("to_numeric"):
+        anios = pd.to_numeric(df_libros['anio_publicacion'], errors='coerce')
+    pesos = semijoin.pesos(df_libros, contar)[anios.notna()]
+    promedio = (anios[anios.notna()] * pesos).sum() / pesos.sum() if pesos.sum() else float('nan')
+
+    return pd.DataFrame({'promedio_anio': [promedio]})
+
+# encuentra el género que más premios ganó.
+@cacheado("nominaciones", "libros", "generos", RESUMEN)
+@medido
+def consulta_2_genero_mas_ganador(_db, modo=None):
+    plan = _plan_consulta_2(_db, _modo(modo))
+    if plan is None:
+        return _consulta_2_pandas(_db)
+    return _ejecutar(_db, plan)
+
+def _plan_consulta_2(_db, modo):
+    if modo == "pandas":
+        return None
+    return _plan_por_dimension(_db, modo, {"ganador": True}, "libros_ganadores", "genero", "generos", "nombre_genero", "total_premios", limite=1)
+
+def _consulta_2_pandas(_db):
+
+    df_counts = _contar_nominados(_db, {"ganador": True}, "genero", 'total_premios')
+
+    df_merged = dimensiones.etiquetar(_db, "generos", df_counts)
+
+    df_result = df_merged.sort_values(by=['total_premios', '_id'], ascending=[False, True]).head(1)
+    df_final = df_result[['nombre', 'total_premios']].rename(columns={'nombre': 'nombre_genero'})
+
+    return df_final.reset_index(drop=True)
+
+# encuentra el idioma que más premios ganó.
+@cacheado("nominaciones", "libros", "idiomas", RESUMEN)
+@medido
+def consulta_3_idioma_mas_ganador(_db, modo=None):
+    plan = _plan_consulta_3(_db, _modo(modo))
+    if plan is None:
+        return _consulta_3_pandas(_db)
+    return _ejecutar(_db, plan)
+
+def _plan_consulta_3(_db, modo):
+    if modo == "pandas":
+        return None
+    return _plan_por_dimension(_db, modo, {"ganador": True}, "libros_ganadores", "idioma", "idiomas", "nombre_idioma", "total_premios", limite=1)
+
+def _consulta_3_pandas(_db):
+
+    df_counts = _contar_nominados(_db, {"ganador": True}, "idioma", 'total_premios')
+
+    df_merged = dimensiones.etiquetar(_db, "idiomas", df_counts)
+    df_result = df_merged.sort_values(by=['total_premios', '_id'], ascending=[False, True]).head(1)
+    df_final = df_result[['nombre', 'total_premios']].rename(columns={'nombre': 'nombre_idioma'})
+
+    return df_final.reset_index(drop=True)
+
+# encuentra el idioma con más nominaciones.
+# contar="libro": libros nominados por idioma; contar="nominacion": nominaciones por idioma
+@cacheado("nominaciones", "libros", "idiomas", RESUMEN)
+@medido
+def consulta_4_idioma_mas_nominado(_db, modo=None, contar="libro"):
+    contar = semijoin.validar_contar(contar)
+    plan = _plan_consulta_4(_db, _modo(modo), contar)
+    if plan is None:
+        return _consulta_4_pandas(_db, contar)
+    return _ejecutar(_db, plan)
+
+def _plan_consulta_4(_db, modo, contar="libro"):
+    if modo == "pandas":
+        return None
+    metrica = "nominaciones" if contar == "nominacion" else "libros_nominados"
+    return _plan_por_dimension(_db, modo, {}, metrica, "idioma", "idiomas", "nombre_idioma", "total_nominaciones", limite=1, contar=contar)
+
+def _consulta_4_pandas(_db, contar="libro"):
+
+    df_counts = _contar_nominados(_db, {}, "idioma", 'total_nominaciones', contar)
+
+    df_merged = dimensiones.etiquetar(_db, "idiomas", df_counts)
+    df_result = df_merged.sort_values(by=['total_nominaciones', '_id'], ascending=[False, True]).head(1)
+    df_final = df_result[['nombre', 'total_nominaciones']].rename(columns={'nombre': 'nombre_idioma'})
+
+    return df_final.reset_index(drop=True)
+
+# consultas 5, 6 y 7: casos fijos del motor de filtros (filtros.py)
+FILTRO_DISTOPIA_ES = filtros.Filtro(generos=("Distopía",), idiomas=("Español",))
+FILTRO_MISTERIO = filtros.Filtro(generos=("Misterio",))
+
+# calcula promedio de año de libros de Distopía en Español.
+@cacheado("libros", "generos", "idiomas", RESUMEN)
+@medido
+def consulta_5_promedio_cf_es(_db, modo=None):
+    plan = _plan_consulta_5(_db, _modo(modo))
+    if plan is None:
+        return _formato_5(filtros.evaluar_pandas(_db, FILTRO_DISTOPIA_ES, ("promedio_anio",)))
+    return _ejecutar(_db, plan)
+
+def _formato_5(resumen):
+    return pd.DataFrame({'promedio_anio': [resumen["promedio_anio"]]})
+
+def _plan_consulta_5(_db, modo):
+    return filtros.plan(_db, FILTRO_DISTOPIA_ES, modo, ("promedio_anio",), formato=_formato_5)
+
+# cuenta libros del género misterio.
+@cacheado("libros", "generos", RESUMEN)
+@medido
+def consulta_6_contar_misterio(_db, modo=None):
+    return _ejecutar(_db, _plan_consulta_6(_db, _modo(modo)))
+
+def _plan_consulta_6(_db, modo):
+    return filtros.plan(_db, FILTRO_MISTERIO, modo, ("cantidad",),
+                        formato=lambda resumen: pd.DataFrame({'total_libros_misterio': [resumen["cantidad"]]}))
+
+#Cuenta libros de Distopia en Español.
+@cacheado("libros", "generos", "idiomas", RESUMEN)
+@medido
+def consulta_7_contar_Distopia_es(_db, modo=None):
+    return _ejecutar(_db, _plan_consulta_7(_db, _modo(modo)))
+
+def _plan_consulta_7(_db, modo):
+    return filtros.plan(_db, FILTRO_DISTOPIA_ES, modo, ("cantidad",),
+                        formato=lambda resumen: pd.DataFrame({'total_libros_Distopia_espanol': [resumen["cantidad"]]}))
+
+# filtro arbitrario sobre libros (filtros.Filtro): metricas y desgloses en una sola agregacion
+@cacheado("libros", "nominaciones", *dimensiones.DIMENSIONES, RESUMEN)
+@medido
+def resumen_filtro(_db, filtro, modo=None, desgloses=("genero", "idioma", "anio")):
+    plan = _plan_resumen_filtro(_db, _modo(modo), filtro, desgloses)
+    if plan is None:
+        return filtros.evaluar_pandas(_db, filtro, desgloses=desgloses)
+    return _ejecutar(_db, plan)
+
+def _plan_resumen_filtro(_db, modo, filtro, desgloses=("genero", "idioma", "anio")):
+    return filtros.plan(_db, filtro, modo, desgloses=desgloses)
+
+# consultas para los graficos
+@cacheado("libros", "generos", RESUMEN)
+@medido
+def libros_por_genero(_db, modo=None):
+    if _db is None: return pd.DataFrame({'nombre_genero': [], 'count': []})
+    plan = _plan_libros_por_genero(_db, _modo(modo))
+    if plan is not None:
+        return _ejecutar(_db, plan)
+    genero_ids = columnar.ids(_db["libros"], {}, "genero")
+    return _conteo_por_dimension(_db, genero_ids, "generos", "nombre_genero")
+
+# ids contados y etiquetados con la dimension, de mayor a menor (desempata el id)
+def _conteo_por_dimension(_db, ids, coleccion_dim, col_nombre):
+    if not len(ids): return pd.DataFrame({col_nombre: [], 'count': []})
+
+    return _etiquetado(_db, columnar.contar(ids, 'count'), coleccion_dim, col_nombre)
+
+def _etiquetado(_db, df_counts, coleccion_dim, col_nombre, col_total='count'):
+    # los ids duplicados en la dimension (ej. idiomas) los resuelve el indice de dimensiones
+    df_merged = dimensiones.etiquetar(_db, coleccion_dim, df_counts)
+    df_merged = df_merged.sort_values(by=[col_total, '_id'], ascending=[False, True])
+    return df_merged[['nombre', col_total]].rename(columns={'nombre': col_nombre}).reset_index(drop=True)
+
+# los graficos se cuentan en python salvo en modo rollup
+def _plan_libros_por_genero(_db, modo):
+    return _plan_conteo_rollup(_db, "genero", "generos", "nombre_genero") if modo == "rollup" else None
+
+@cacheado("libros", "idiomas", RESUMEN)
+@medido
+def libros_por_lenguaje(_db, modo=None):
+    if _db is None: return pd.DataFrame({'nombre_idioma': [], 'count': []})
+    plan = _plan_libros_por_lenguaje(_db, _modo(modo))
+    if plan is not None:
+        return _ejecutar(_db, plan)
+    idioma_ids = columnar.ids(_db["libros"], {}, "idioma")
+    return _conteo_por_dimension(_db, idioma_ids, "idiomas", "nombre_idioma")
+
+def _plan_libros_por_lenguaje(_db, modo):
+    return _plan_conteo_rollup(_db, "idioma", "idiomas", "nombre_idioma") if modo == "rollup" else None
+
+@cacheado("libros", RESUMEN)
+@medido
+def libros_por_anio(_db, modo=None):
+    if _db is None: return pd.DataFrame({'year': [], 'count': []})
+    plan = _plan_libros_por_anio(_db, _modo(modo))
+    if plan is not None:
+        return _ejecutar(_db, plan)
+    years = columnar.numeros(_db["libros"], {}, "anio_publicacion", vacios=True)
+    return _conteo_por_anio(years)
+
+def _conteo_por_anio(years):
+    if not len(years): return pd.DataFrame({'year': [], 'count': []})
+
+    df_years = pd.DataFrame({'year': years})
+    df_years = df_years.dropna(subset=['year'])
+    df_years['year'] = df_years['year'].astype(int)
+
+    with etapa("value_counts"):
+        df_counts = df_years['year'].value_counts().reset_index()
+    df_counts.columns = ['year', 'count']
+    return df_counts.sort_values('year')
+
+def _plan_libros_por_anio(_db, modo):
+    if modo != "rollup":
+        return None
+    pipeline = [
+        {"$match": {"_id.anio": {"$nin": _VACIOS}}},
+        {"$group": {"_id": "$_id.anio", "count": {"$sum": "$libros"}}},
+    ]
+    return RESUMEN, "aggregate", (pipeline,), _anios_agrupados
+
+def _anios_agrupados(docs):
+    df_years = pd.DataFrame(docs, columns=['_id', 'count'])
+    if df_years.empty: return pd.DataFrame({'year': [], 'count': []})
+    # el resumen guarda el año como double; se trunca igual que el astype(int) del camino original
+    df_years['year'] = df_years['_id'].astype(int)
+    df_counts = df_years.groupby('year', as_index=False)['count'].sum()
+    return df_counts[df_counts['count'] > 0].sort_values('year')
+
+@cacheado("nominaciones", "libros", "generos", RESUMEN)
+@medido
+def premios_ganados_por_genero(_db, modo=None):
+    if _db is None: return pd.DataFrame({'nombre_genero': [], 'awards_won': []})
+    plan = _plan_premios_ganados_por_genero(_db, _modo(modo))
+    if plan is None:
+        return _premios_ganados_por_genero_pandas(_db)
+    return _ejecutar(_db, plan)
+
+def _plan_premios_ganados_por_genero(_db, modo):
+    if modo == "pandas":
+        return None
+    return _plan_por_dimension(_db, modo, {"ganador": True}, "libros_ganadores", "genero", "generos", "nombre_genero", "awards_won")
+
+def _premios_ganados_por_genero_pandas(_db):
+    df_counts = _contar_nominados(_db, {"ganador": True}, "genero", 'awards_won')
+    if df_counts.empty: return pd.DataFrame({'nombre_genero': [], 'awards_won': []})
+    return _etiquetado(_db, df_counts, "generos", 'nombre_genero', 'awards_won')
+
+# los cuatro graficos en una sola pasada: {nombre de la consulta: DataFrame}, con el mismo formato
+# que cada una por separado. Si hay mas de max_anios años distintos se agrupan en intervalos.
+@cacheado("libros", "nominaciones", "generos", "idiomas", RESUMEN)
+@medido
+def distribuciones(_db, modo=None, max_anios=MAX_ANIOS_GRAFICO):
+    if _db is None:
+        return {nombre: _GRAFICOS_VACIOS[nombre].copy() for nombre in _GRAFICOS_VACIOS}
+    plan = _plan_distribuciones(_db, _modo(modo), max_anios)
+    if plan is None:
+        return _distribuciones_pandas(_db, max_anios)
+    return _ejecutar(_db, plan)
+
+_GRAFICOS_VACIOS = {
+    "libros_por_genero": pd.DataFrame({'nombre_genero': [], 'count': []}),
+    "libros_por_lenguaje": pd.DataFrame({'nombre_idioma': [], 'count': []}),
+    "libros_por_anio": pd.DataFrame({'year': [], 'count': []}),
+    "premios_ganados_por_genero": pd.DataFrame({'nombre_genero': [], 'awards_won': []}),
+}
+
+_ANCHOS_ANIOS = (1, 2, 5, 10, 20, 25, 50, 100, 250, 500, 1000)
+
+# junta los años en intervalos "redondos" si hay demasiados puntos; el ancho queda en df.attrs["ancho"]
+def intervalos_anios(df_counts, max_anios):
+    ancho = 1
+    if max_anios and len(df_counts) > max_anios:
+        rango = df_counts['year'].max() - df_counts['year'].min() + 1
+        ancho = next((a for a in _ANCHOS_ANIOS if rango / a <= max_anios), _ANCHOS_ANIOS[-1])
+        inicio = df_counts['year'] // ancho * ancho
+        df_counts = df_counts.groupby(inicio.rename('year'), as_index=False)['count'].sum()
+    df_counts = df_counts.reset_index(drop=True)
+    df_counts.attrs["ancho"] = int(ancho)
+    return df_counts
+
+def _plan_distribuciones(_db, modo, max_anios=MAX_ANIOS_GRAFICO):
+    if modo == "pandas":
+        return None
+    if modo == "rollup":
+        coleccion = RESUMEN
+        facetas = {
+            "genero": [{"$match": {"_id.genero": {"$nin": _VACIOS}}},
+                       {"$group": {"_id": "$_id.genero", "count": {"$sum": "$libros"}}}],
+            "idioma": [{"$match": {"_id.idioma": {"$nin": _VACIOS}}},
+                       {"$group": {"_id": "$_id.idioma", "count": {"$sum": "$libros"}}}],
+            "anio": [{"$match": {"_id.anio": {"$nin": _VACIOS}}},
+                     {"$group": {"_id": "$_id.anio", "count": {"$sum": "$libros"}}}],
+            "premios": [{"$match": {"_id.genero": {"$nin": _VACIOS}, "libros_ganadores": {"$gt": 0}}},
+                        {"$group": {"_id": "$_id.genero", "awards_won": {"$sum": "$libros_ganadores"}}}],
+        }
+        etapas = [{"$facet": facetas}]
+    else:
+        # un solo recorrido de libros para genero, idioma y año; los premios se cuentan aparte
+        # desde nominaciones (como premios_ganados_por_genero) y se agregan con $unionWith:
+        # solo se leen los libros ganadores (indice ganador_libro) en vez de un $lookup por libro
+        coleccion = "libros"
+        facetas = {
+            "genero": [{"$match": {"genero": {"$nin": _VACIOS}}},
+                       {"$group": {"_id": "$genero", "count": {"$sum": 1}}}],
+            "idioma": [{"$match": {"idioma": {"$nin": _VACIOS}}},
+                       {"$group": {"_id": "$idioma", "count": {"$sum": 1}}}],
+            "anio": [{"$match": {"anio_publicacion": {"$nin": _VACIOS}}},
+                     {"$group": {"_id": {"$trunc": _a_numero("$anio_publicacion")}, "count": {"$sum": 1}}},
+                     {"$match": {"_id": {"$ne": None}}}],
+        }
+        generos = list(dimensiones.nombres_por_id(_db, "generos"))
+        premios = _pipeline_por_dimension({"ganador": True}, "genero", generos, "awards_won")
+        etapas = [{"$facet": facetas}, {"$unionWith": {"coll": "nominaciones", "pipeline": premios}}]
+
+    def armar(docs):
+        # primero el documento del $facet; en modo pipeline siguen los grupos de premios
+        facetas = dict(docs[0]) if docs else {}
+        if modo != "rollup":
+            facetas["premios"] = docs[1:]
+        def tabla(nombre, columna):
+            return pd.DataFrame(facetas.get(nombre, []), columns=['_id', columna])
+        df_genero = tabla("genero", 'count')
+        df_idioma = tabla("idioma", 'count')
+        df_premios = tabla("premios", 'awards_won')
+        return {
+            "libros_por_genero": _etiquetado(_db, df_genero[df_genero['count'] > 0], "generos", 'nombre_genero'),
+            "libros_por_lenguaje": _etiquetado(_db, df_idioma[df_idioma['count'] > 0], "idiomas", 'nombre_idioma'),
+            "libros_por_anio": intervalos_anios(_anios_agrupados(facetas.get("anio", [])), max_anios),
+            "premios_ganados_por_genero": _etiquetado(_db, df_premios, "generos", 'nombre_genero', 'awards_won'),
+        }
+    return coleccion, "aggregate", (etapas,), armar
+
+# camino pandas: genero, idioma y año salen del mismo cursor sobre libros
+def _distribuciones_pandas(_db, max_anios):
+    columnas = columnar.columnas(_db["libros"], {}, ["genero", "idioma", "anio_publicacion"])
+    with etapa("to_numeric"):
+        years = pd.to_numeric(pd.Series(columnar.verdaderos(columnas["anio_publicacion"]), dtype=object),
+                              errors="coerce").to_numpy(dtype=float)
+    return {
+        "libros_por_genero": _conteo_por_dimension(_db, columnar.verdaderos(columnas["genero"]), "generos", "nombre_genero"),
+        "libros_por_lenguaje": _conteo_por_dimension(_db, columnar.verdaderos(columnas["idioma"]), "idiomas", "nombre_idioma"),
+        "libros_por_anio": intervalos_anios(_conteo_por_anio(years), max_anios),
+        "premios_ganados_por_genero": _premios_ganados_por_genero_pandas(_db),
+    }
+
+# todas las consultas por nombre (las usan el benchmark, la verificacion de indices, etc.)
+CONSULTAS = {fn.__name__: fn for fn in (
+    consulta_1_promedio_nominados,
+    consulta_2_genero_mas_ganador,
+    consulta_3_idioma_mas_ganador,
+    consulta_4_idioma_mas_nominado,
+    consulta_5_promedio_cf_es,
+    consulta_6_contar_misterio,
+    consulta_7_contar_Distopia_es,
+    libros_por_genero,
+    libros_por_lenguaje,
+    libros_por_anio,
+    premios_ganados_por_genero,
+)}
+
+# planificadores por nombre de consulta (los usa asincrono.py)
+_PLANES = {
+    "consulta_1_promedio_nominados": _plan_consulta_1,
+    "consulta_2_genero_mas_ganador": _plan_consulta_2,
+    "consulta_3_idioma_mas_ganador": _plan_consulta_3,
+    "consulta_4_idioma_mas_nominado": _plan_consulta_4,
+    "consulta_5_promedio_cf_es": _plan_consulta_5,
+    "consulta_6_contar_misterio": _plan_consulta_6,
+    "consulta_7_contar_Distopia_es": _plan_consulta_7,
+    "libros_por_genero": _plan_libros_por_genero,
+    "libros_por_lenguaje": _plan_libros_por_lenguaje,
+    "libros_por_anio": _plan_libros_por_anio,
+    "premios_ganados_por_genero": _plan_premios_ganados_por_genero,
+    "resumen_filtro": _plan_resumen_filtro,
+    "distribuciones": _plan_distribuciones,
+}
+
+# el comando que resuelve la consulta en el modo dado, o None si se calcula en python (modo pandas,
+# o consultas sin plan registrado como explorador.pagina)
+def plan(nombre, _db, modo=None, **kwargs):
+    armar_plan = _PLANES.get(nombre)
+    return armar_plan(_db, _modo(modo), **kwargs) if armar_plan else None
@@ -0,0 +1,68 @@
+import time
+import threading
+import cache
+from instrumentacion import etapa
+
+# colecciones chicas de referencia que usan las consultas para resolver nombres <-> ids
+DIMENSIONES = ("generos", "idiomas", "premios", "formatos", "autores")
+
+_tablas = {}   # (db, coleccion) -> (version, vence, por_id, por_nombre)
+_lock = threading.Lock()
+
+# carga la coleccion una vez y la vuelve a leer solo si cambio su version (o vencio el TTL del cache)
+def _tabla(_db, coleccion):
+    clave = (_db.name, coleccion)
+    version = cache.version(_db.name, coleccion)
+    with _lock:
+        tabla = _tablas.get(clave)
+    if tabla and tabla[0] == version and tabla[1] > time.monotonic():
+        return tabla
+
+    por_id, por_nombre = {}, {}
+    for doc in _db[coleccion].find({}, {"nombre": 1, "_id": 1}):
+        # id repetido: queda el primer nombre, como el drop_duplicates de antes. Nombre repetido
+        # (ej. Sueco 6 y 18): el nombre es de todos sus ids, los libros pueden usar cualquiera
+        por_id.setdefault(doc["_id"], doc.get("nombre"))
+        if doc.get("nombre") is not None:
+            ids = por_nombre.setdefault(doc["nombre"], [])
+            if doc["_id"] not in ids:
+                ids.append(doc["_id"])
+
+    tabla = (version, time.monotonic() + max(cache.CACHE_TTL, 0), por_id, por_nombre)
+    with _lock:
+        _tablas[clave] = tabla
+    return tabla
+
+def nombres_por_id(_db, coleccion):
+    return _tabla(_db, coleccion)[2]
+
+# nombre -> lista con todos sus ids
+def ids_por_nombre(_db, coleccion):
+    return _tabla(_db, coleccion)[3]
+
+# [] si no existe el nombre
+def ids_de(_db, coleccion, nombre):
+    return list(ids_por_nombre(_db, coleccion).get(nombre, []))
+
+# todos los ids de los nombres (los que no existen se ignoran)
+def ids_de_nombres(_db, coleccion, nombres):
+    por_nombre = ids_por_nombre(_db, coleccion)
+    return [i for nombre in nombres for i in por_nombre.get(nombre, [])]
+
+def nombre_de(_db, coleccion, _id):
+    return nombres_por_id(_db, coleccion).get(_id)
+
+# agrega la columna con el nombre y descarta los ids que no estan en la dimension (como el merge inner)
+def etiquetar(_db, coleccion, df, columna_id="_id", columna_nombre="nombre"):
+    nombres = nombres_por_id(_db, coleccion)
+    with etapa("merge"):
+        df = df.assign(**{columna_nombre: df[columna_id].map(nombres)})
+        return df[df[columna_nombre].notna()]
+
+def olvidar(_db=None):
+    with _lock:
+        if _db is None:
+            _tablas.clear()
+        else:
+            for clave in [k for k in _tablas if k[0] == _db.name]:
+                del _tablas[clave]
@@ -0,0 +1,95 @@
+import os
+import numbers
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from bson.objectid import ObjectId
+from cache import cacheado
+from instrumentacion import medido
+import dimensiones
+import filtros
+
+# explorador de libros con paginacion por clave (keyset) en el servidor: cada pagina es un
+# $match (el filtro + "despues de la ultima fila vista"), $sort por una clave indexada y _id, y
+# $limit. Sin skip: el costo de una pagina no depende de la profundidad ni del tamaño de la coleccion.
+
+TAMANIO_PAGINA = int(os.getenv("TAMANIO_PAGINA", "50"))
+
+# orden -> campo de libros; el _id desempata (indices en indices.py)
+ORDENES = {"id": "_id", "titulo": "titulo", "anio": "anio_publicacion"}
+
+# lo unico que se trae de cada libro
+_PROYECCION = {"titulo": 1, "autores": 1, "genero": 1, "idioma": 1, "formato": 1, "premios": 1,
+               "anio_publicacion": 1}
+# columna -> dimension que da los nombres
+_ETIQUETAS = {"autores": "autores", "genero": "generos", "idioma": "idiomas", "formato": "formatos",
+              "premios": "premios"}
+
+# orden de BSON entre tipos: un $gt solo compara dentro del mismo tipo, los posteriores van por $type
+_TIPOS = ("null", "number", "string", "object", "array", "binData", "objectId", "bool", "date")
+_TIPOS_PY = ((bool, "bool"), (numbers.Number, "number"), (str, "string"), (dict, "object"),
+             (list, "array"), (bytes, "binData"), (ObjectId, "objectId"), (datetime, "date"))
+
+_siguientes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explorador")
+
+def _tipo(valor):
+    if valor is None:
+        return "null"
+    return next(nombre for tipo, nombre in _TIPOS_PY if isinstance(valor, tipo))
+
+# condiciones que cumplen los valores estrictamente mayores que `valor` en el orden de mongod
+def _mayores(campo, valor):
+    condiciones = [] if valor is None else [{campo: {"$gt": valor}}]
+    posteriores = list(_TIPOS[_TIPOS.index(_tipo(valor)) + 1:])
+    if posteriores:
+        condiciones.append({campo: {"$type": posteriores}})
+    return condiciones
+
+# libros que van despues del cursor (valor de la clave, _id) de la ultima fila
+def _despues(campo, valor, _id):
+    if campo == "_id":
+        return {"$or": _mayores("_id", _id)}
+    return {"$or": [*_mayores(campo, valor), {"$and": [{campo: valor}, {"$or": _mayores("_id", _id)}]}]}
+
+def _nombres(por_id, valor):
+    ids = valor if isinstance(valor, list) else [valor]
+    return ", ".join(str(por_id.get(i, i)) for i in ids if i is not None)
+
+def _armar(_db, docs, campo, tamanio):
+    siguiente = None
+    if len(docs) > tamanio:
+        docs = docs[:tamanio]
+        siguiente = (docs[-1].get(campo), docs[-1]["_id"])
+
+    df = pd.DataFrame(docs, columns=["_id", *_PROYECCION])
+    for columna, dimension in _ETIQUETAS.items():
+        por_id = dimensiones.nombres_por_id(_db, dimension)
+        df[columna] = df[columna].map(lambda v: _nombres(por_id, v))
+    df.attrs["siguiente"] = siguiente   # cursor de la pagina siguiente, None si es la ultima
+    return df
+
+# una pagina de libros con el filtro, ordenada por ORDENES[orden]; despues = cursor de la anterior
+@cacheado("libros", "nominaciones", *dimensiones.DIMENSIONES)
+@medido
+def pagina(_db, filtro=filtros.Filtro(), orden="id", despues=None, tamanio=TAMANIO_PAGINA):
+    campo = ORDENES[orden]
+    match = filtros.condicion(_db, filtro)
+    if match is None:
+        return _armar(_db, [], campo, tamanio)
+    if despues is not None:
+        match = {"$and": [match, _despues(campo, *despues)]}
+
+    # con filtro de premio el $lookup corre solo sobre los libros que se van recorriendo en orden
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": 1} if campo == "_id" else {campo: 1, "_id": 1}},
+        *filtros.etapas_premio(filtro.premio),
+        {"$limit": tamanio + 1},
+        {"$project": _PROYECCION},
+    ]
+    return _armar(_db, list(_db["libros"].aggregate(pipeline)), campo, tamanio)
+
+# pide en segundo plano la pagina que sigue a `df` (queda en cache para cuando se avance)
+def precargar_siguiente(_db, df, **kwargs):
+    if df.attrs.get("siguiente") is not None:
+        _siguientes.submit(pagina, _db, despues=df.attrs["siguiente"], **kwargs)
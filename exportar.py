@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import argparse
+import inspect
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from pymongo import MongoClient
+from conexion import MONGO_URI, MONGO_DBNAME
+import consultas
+import dimensiones
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # solo hace falta para parquet / arrow
+    pa = pq = None
+
+# exporta los resultados de consultas.py (y, si se pide, las colecciones crudas etiquetadas)
+# a csv, parquet o arrow IPC. Cada salida se escribe en su propio hilo; las colecciones
+# crudas se leen del cursor de a lotes y nunca se arma un DataFrame con todo.
+
+FORMATOS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# --> ESCRITORES POR LOTES <--
+
+class _EscritorCSV:
+    def __init__(self, ruta):
+        self.archivo = open(ruta, "w", encoding="utf-8", newline="")
+        self.encabezado = True
+
+    def escribir(self, df):
+        df.to_csv(self.archivo, header=self.encabezado, index=False)
+        self.encabezado = False
+
+    def cerrar(self):
+        self.archivo.close()
+
+class _EscritorArrow:
+    # parquet o arrow IPC; el esquema lo fija el primer lote (o el que se pase)
+    def __init__(self, ruta, formato, esquema=None):
+        if pa is None:
+            raise RuntimeError(f"El formato {formato} necesita pyarrow (pip install pyarrow)")
+        self.ruta = ruta
+        self.formato = formato
+        self.esquema = esquema
+        self.escritor = None
+
+    def escribir(self, df):
+        tabla = pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False)
+        if self.escritor is None:
+            self.esquema = tabla.schema
+            if self.formato == "parquet":
+                self.escritor = pq.ParquetWriter(self.ruta, self.esquema)
+            else:
+                self.escritor = pa.ipc.new_file(self.ruta, self.esquema)
+        self.escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+def abrir_escritor(ruta, formato, esquema=None):
+    if formato == "csv":
+        return _EscritorCSV(ruta)
+    return _EscritorArrow(ruta, formato, esquema)
+
+# --> COLECCIONES CRUDAS <--
+
+def _nombres(_db, coleccion, ids):
+    nombres = dimensiones.nombres_por_id(_db, coleccion)
+    return ["; ".join(str(nombres.get(i, i)) for i in lista) if isinstance(lista, list) else None
+            for lista in ids]
+
+def _libros(_db, df):
+    return pd.DataFrame({
+        "_id": df["_id"],
+        "titulo": df["titulo"],
+        "genero": df["genero"].map(dimensiones.nombres_por_id(_db, "generos")),
+        "idioma": df["idioma"].map(dimensiones.nombres_por_id(_db, "idiomas")),
+        "formato": df["formato"].map(dimensiones.nombres_por_id(_db, "formatos")),
+        "anio_publicacion": pd.to_numeric(df["anio_publicacion"], errors="coerce"),
+        "autores": _nombres(_db, "autores", df["autores"]),
+        "premios": _nombres(_db, "premios", df["premios"]),
+    })
+
+def _nominaciones(_db, df):
+    return pd.DataFrame({
+        "_id": df["_id"],
+        "libro": df["libro"],
+        "premio": df["premio"].map(dimensiones.nombres_por_id(_db, "premios")),
+        "anio_nominacion": pd.to_numeric(df["anio_nominacion"], errors="coerce"),
+        "ganador": df["ganador"].fillna(False).astype(bool),
+    })
+
+# nombre -> (campos que se piden al cursor, funcion que arma el lote etiquetado)
+CRUDOS = {
+    "libros": (("_id", "titulo", "genero", "idioma", "formato", "anio_publicacion", "autores", "premios"), _libros),
+    "nominaciones": (("_id", "libro", "premio", "anio_nominacion", "ganador"), _nominaciones),
+}
+
+# columnas de ids: int64 si todos son enteros, si no (ej. ObjectId) se exportan como texto
+_IDS = {"libros": ("_id",), "nominaciones": ("_id", "libro")}
+
+# en el orden de BSON los numeros van antes que los demas tipos: alcanza con mirar el mayor (por indice)
+def _tipo_id(_db, coleccion, campo):
+    mayor = next(iter(_db[coleccion].find({}, {campo: 1}).sort(campo, -1).limit(1)), {}).get(campo)
+    entero = mayor is None or (isinstance(mayor, int) and not isinstance(mayor, bool))
+    return pa.int64() if entero else pa.string()
+
+def _esquema_crudo(_db, nombre):
+    if pa is None:
+        return None
+    texto = pa.string()
+    ids = {campo: _tipo_id(_db, nombre, campo) for campo in _IDS[nombre]}
+    if nombre == "libros":
+        return pa.schema([("_id", ids["_id"]), ("titulo", texto), ("genero", texto), ("idioma", texto),
+                          ("formato", texto), ("anio_publicacion", pa.float64()), ("autores", texto),
+                          ("premios", texto)])
+    return pa.schema([("_id", ids["_id"]), ("libro", ids["libro"]), ("premio", texto),
+                      ("anio_nominacion", pa.float64()), ("ganador", pa.bool_())])
+
+def exportar_crudo(_db, nombre, ruta, formato, lote):
+    campos, armar = CRUDOS[nombre]
+    cursor = _db[nombre].find({}, dict.fromkeys(campos, 1), batch_size=lote).sort("_id", 1)
+    esquema = _esquema_crudo(_db, nombre) if formato != "csv" else None
+    como_texto = [c for c in _IDS[nombre] if esquema is not None and esquema.field(c).type == pa.string()]
+    escritor = abrir_escritor(ruta, formato, esquema)
+    filas = 0
+    try:
+        while True:
+            docs = list(islice(cursor, lote))
+            if not docs:
+                break
+            df = armar(_db, pd.DataFrame(docs, columns=list(campos)))
+            for campo in como_texto:
+                df[campo] = df[campo].map(lambda v: None if pd.isna(v) else str(v))
+            escritor.escribir(df)
+            filas += len(docs)
+    finally:
+        escritor.cerrar()
+        cursor.close()
+    return filas
+
+def exportar_consulta(_db, nombre, ruta, formato, modo=None):
+    fn = consultas.CONSULTAS[nombre]
+    original = getattr(fn, "__wrapped__", fn)
+    kwargs = {"modo": modo} if modo and "modo" in inspect.signature(original).parameters else {}
+    df = fn(_db, **kwargs)
+    escritor = abrir_escritor(ruta, formato)
+    try:
+        escritor.escribir(df.reset_index(drop=True))
+    finally:
+        escritor.cerrar()
+    return len(df)
+
+# --> CLI <--
+
+def _tarea(funcion, *args):
+    inicio = time.perf_counter()
+    filas = funcion(*args)
+    return filas, time.perf_counter() - inicio
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta los resultados de las consultas a csv/parquet/arrow")
+    parser.add_argument("consultas", nargs="*", help="consultas a exportar (por defecto todas)")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--carpeta", default="exportes", help="carpeta de salida")
+    parser.add_argument("--crudos", nargs="*", default=[], metavar="COLECCION",
+                        help=f"exporta tambien colecciones crudas etiquetadas ({', '.join(CRUDOS)})")
+    parser.add_argument("--lote", type=int, default=50_000, help="documentos por lote al exportar crudos")
+    parser.add_argument("--workers", type=int, default=4, help="exportaciones concurrentes")
+    parser.add_argument("--modo", choices=consultas.MODOS)
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    nombres = args.consultas or list(consultas.CONSULTAS)
+    desconocidas = set(nombres) - set(consultas.CONSULTAS)
+    if desconocidas:
+        parser.error(f"consultas desconocidas: {', '.join(sorted(desconocidas))}")
+    desconocidos = set(args.crudos) - set(CRUDOS)
+    if desconocidos:
+        parser.error(f"colecciones crudas desconocidas: {', '.join(sorted(desconocidos))}")
+    if args.formato != "csv" and pa is None:
+        parser.error(f"--formato {args.formato} necesita pyarrow (pip install pyarrow)")
+
+    os.makedirs(args.carpeta, exist_ok=True)
+    extension = FORMATOS[args.formato]
+    client = MongoClient(args.uri)
+    db = client[args.db]
+
+    inicio = time.perf_counter()
+    futuros = {}
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="exportar") as pool:
+        for nombre in nombres:
+            ruta = os.path.join(args.carpeta, nombre + extension)
+            futuros[ruta] = pool.submit(_tarea, exportar_consulta, db, nombre, ruta, args.formato, args.modo)
+        for nombre in args.crudos:
+            ruta = os.path.join(args.carpeta, nombre + extension)
+            futuros[ruta] = pool.submit(_tarea, exportar_crudo, db, nombre, ruta, args.formato, args.lote)
+
+    errores = 0
+    for ruta, futuro in futuros.items():
+        try:
+            filas, segundos = futuro.result()
+            print(f"  {ruta:<52}{filas:>10} filas {segundos:9.2f}s")
+        except Exception as e:
+            errores += 1
+            print(f"  {ruta:<52} ERROR: {e}", file=sys.stderr)
+    print(f"{len(futuros) - errores} archivo(s) en {args.carpeta} ({time.perf_counter() - inicio:.2f}s)")
+    client.close()
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
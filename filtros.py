@@ -0,0 +1,299 @@
+import functools
+from dataclasses import dataclass
+import pandas as pd
+import dimensiones
+import columnar
+from instrumentacion import etapa
+from rollups import RESUMEN
+
+# motor de filtros sobre libros: cualquier combinacion de generos, idiomas, formatos, autores,
+# rango de años y estado de premio. Cantidad, promedio, año minimo/maximo y los desgloses salen
+# de una sola agregacion ($facet). El pipeline se compila una vez por "forma" del filtro (que
+# campos usa, que metricas y desgloses pide) y en cada consulta solo se le ligan los ids.
+
+PREMIOS = ("nominado", "ganador", "sin_nominar")
+METRICAS = ("cantidad", "promedio_anio", "anio_min", "anio_max")
+
+# desglose -> (campo en libros, dimension que da el nombre, columna con el nombre)
+DESGLOSES = {
+    "genero": ("genero", "generos", "nombre_genero"),
+    "idioma": ("idioma", "idiomas", "nombre_idioma"),
+    "formato": ("formato", "formatos", "nombre_formato"),
+    "anio": ("anio_publicacion", None, "year"),
+}
+
+# campo del Filtro -> (campo en libros, dimension)
+CAMPOS = {
+    "generos": ("genero", "generos"),
+    "idiomas": ("idioma", "idiomas"),
+    "formatos": ("formato", "formatos"),
+    "autores": ("autores", "autores"),
+}
+# lo que el resumen por genero x idioma x anio puede contestar
+_CAMPOS_ROLLUP = {"generos", "idiomas"}
+_DESGLOSES_ROLLUP = {"genero", "idioma", "anio"}
+
+_VACIOS = [None, 0, False, ""]
+
+@dataclass(frozen=True)
+class Filtro:
+    # nombres como estan en las dimensiones; vacio = sin filtrar por ese campo
+    generos: tuple = ()
+    idiomas: tuple = ()
+    formatos: tuple = ()
+    autores: tuple = ()
+    anio_desde: float = None
+    anio_hasta: float = None
+    premio: str = None   # None (cualquiera) o uno de PREMIOS
+
+    def __post_init__(self):
+        # tuplas ordenadas: el filtro es hashable y dos filtros iguales dan la misma clave de cache
+        for campo in CAMPOS:
+            valor = getattr(self, campo)
+            object.__setattr__(self, campo, tuple(sorted({valor} if isinstance(valor, str) else set(valor))))
+        if self.premio is not None and self.premio not in PREMIOS:
+            raise ValueError(f"Estado de premio desconocido: {self.premio} (opciones: {', '.join(PREMIOS)})")
+
+    # lo que define el pipeline compilado (sin los valores)
+    def forma(self):
+        return (tuple(c for c in CAMPOS if getattr(self, c)),
+                self.anio_desde is not None, self.anio_hasta is not None, self.premio)
+
+class Resumen(dict):
+    # cantidad, promedio_anio, anio_min, anio_max y un DataFrame por desglose
+    def copy(self):
+        return Resumen({k: v.copy() if isinstance(v, pd.DataFrame) else v for k, v in self.items()})
+
+def _a_numero(campo):
+    # equivalente a pd.to_numeric(errors='coerce'); los numeros (el caso comun) no pasan por $convert
+    convertido = {"$convert": {"input": campo, "to": "double", "onError": None, "onNull": None}}
+    return {"$cond": [{"$isNumber": campo}, {"$multiply": [campo, 1.0]}, convertido]}
+
+# --> COMPILACION <--
+
+class _Param:
+    # lugar del pipeline compilado que se completa con un valor del filtro
+    __slots__ = ("nombre",)
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+def _ligar(plantilla, valores):
+    if isinstance(plantilla, _Param):
+        return valores[plantilla.nombre]
+    if isinstance(plantilla, dict):
+        return {k: _ligar(v, valores) for k, v in plantilla.items()}
+    if isinstance(plantilla, list):
+        return [_ligar(v, valores) for v in plantilla]
+    return plantilla
+
+def _match(forma, prefijo, campo_anio):
+    campos, desde, hasta, _ = forma
+    match = {prefijo + CAMPOS[c][0]: {"$in": _Param(c)} for c in campos}
+    rango = {}
+    if desde:
+        rango["$gte"] = _Param("anio_desde")
+    if hasta:
+        rango["$lte"] = _Param("anio_hasta")
+    if rango:
+        match[campo_anio] = rango
+    return match
+
+def _solo_cantidad(forma, metricas, desgloses):
+    return metricas == ("cantidad",) and not desgloses and forma[3] is None
+
+def _usa_rollup(forma, desgloses):
+    campos, _, _, premio = forma
+    return set(campos) <= _CAMPOS_ROLLUP and set(desgloses) <= _DESGLOSES_ROLLUP and premio in (None, "nominado")
+
+# etapas que dejan los libros con el estado de premio pedido ([] si es None)
+def etapas_premio(premio):
+    if not premio:
+        return []
+    # alcanza con saber si hay una; usa el indice de nominaciones.libro
+    nominaciones = ([{"$match": {"ganador": True}}] if premio == "ganador" else []) + [
+        {"$limit": 1}, {"$project": {"_id": 1}}]
+    return [
+        {"$lookup": {"from": "nominaciones", "localField": "_id", "foreignField": "libro",
+                     "pipeline": nominaciones, "as": "_nominacion"}},
+        {"$match": {"_nominacion.0": {"$exists": premio != "sin_nominar"}}},
+    ]
+
+@functools.lru_cache(maxsize=256)
+def _compilar_libros(forma, metricas, desgloses):
+    match = _match(forma, "", "anio_publicacion")
+    if _solo_cantidad(forma, metricas, desgloses):
+        return "libros", "count_documents", (match,)
+
+    premio = forma[3]
+    if premio and premio != "sin_nominar":
+        match["_id"] = {"$nin": _VACIOS}   # como los caminos pandas: nominaciones a ids "falsy" no cuentan
+    etapas = etapas_premio(premio)
+
+    anio = _a_numero("$anio_publicacion")
+    acumuladores = {"cantidad": {"$sum": 1}, "promedio_anio": {"$avg": anio},
+                    "anio_min": {"$min": anio}, "anio_max": {"$max": anio}}
+    totales = {"$group": {"_id": None} | {m: acumuladores[m] for m in metricas}}
+    if not desgloses:
+        return "libros", "aggregate", ([{"$match": match}, *etapas, totales],)
+
+    facetas = {"totales": [totales]}
+    for nombre in desgloses:
+        campo = DESGLOSES[nombre][0]
+        clave = anio if nombre == "anio" else f"${campo}"
+        facetas[nombre] = [
+            {"$group": {"_id": clave, "cantidad": {"$sum": 1}}},
+            {"$match": {"_id": {"$nin": _VACIOS}}},
+        ]
+    return "libros", "aggregate", ([{"$match": match}, *etapas, {"$facet": facetas}],)
+
+@functools.lru_cache(maxsize=256)
+def _compilar_rollup(forma, metricas, desgloses):
+    # sobre el resumen: cada grupo genero x idioma x anio trae sus contadores
+    match = _match(forma, "_id.", "_id.anio")
+    nominado = forma[3] == "nominado"
+    peso = "$libros_nominados" if nominado else "$libros"
+    suma, cantidad = ("$suma_anios_nominados", "$n_anios_nominados") if nominado else ("$suma_anios", "$n_anios")
+    anio_con_libros = {"$cond": [{"$gt": [peso, 0]}, "$_id.anio", None]}
+
+    acumuladores = {"cantidad": {"cantidad": {"$sum": peso}},
+                    "promedio_anio": {"suma_anios": {"$sum": suma}, "n_anios": {"$sum": cantidad}},
+                    "anio_min": {"anio_min": {"$min": anio_con_libros}},
+                    "anio_max": {"anio_max": {"$max": anio_con_libros}}}
+    grupo = {"_id": None}
+    for m in metricas:
+        grupo |= acumuladores[m]
+    totales = {"$group": grupo}
+    if not desgloses:
+        return RESUMEN, "aggregate", ([{"$match": match}, totales],)
+
+    facetas = {"totales": [totales]}
+    for nombre in desgloses:
+        facetas[nombre] = [
+            {"$group": {"_id": "$_id." + ("anio" if nombre == "anio" else DESGLOSES[nombre][0]),
+                        "cantidad": {"$sum": peso}}},
+            {"$match": {"_id": {"$nin": _VACIOS}, "cantidad": {"$gt": 0}}},
+        ]
+    return RESUMEN, "aggregate", ([{"$match": match}, {"$facet": facetas}],)
+
+# cuantas formas distintas se compilaron (y cuantas veces se reusaron)
+def compilaciones():
+    return {"libros": _compilar_libros.cache_info(), "rollup": _compilar_rollup.cache_info()}
+
+# --> RESULTADOS <--
+
+# ids de cada campo del filtro; None si algun campo pedido no tiene ningun nombre conocido
+def _valores(_db, filtro):
+    valores = {"anio_desde": filtro.anio_desde, "anio_hasta": filtro.anio_hasta}
+    for campo, (_, dimension) in CAMPOS.items():
+        nombres = getattr(filtro, campo)
+        if nombres:
+            ids = dimensiones.ids_de_nombres(_db, dimension, nombres)
+            if not ids:
+                return None
+            valores[campo] = ids
+    return valores
+
+# $match de libros con los campos y el rango de años del filtro (el estado de premio va aparte,
+# etapas_premio); None si ningun libro puede cumplirlo
+def condicion(_db, filtro):
+    valores = _valores(_db, filtro)
+    if valores is None:
+        return None
+    match = _ligar(_match(filtro.forma(), "", "anio_publicacion"), valores)
+    if filtro.premio and filtro.premio != "sin_nominar":
+        match["_id"] = {"$nin": _VACIOS}
+    return match
+
+def _desglose(_db, nombre, ids, cantidades):
+    _, dimension, columna = DESGLOSES[nombre]
+    df = pd.DataFrame({"_id": ids, "cantidad": cantidades}, columns=["_id", "cantidad"])
+    if dimension is None:
+        df = df.dropna(subset=["_id"]).astype({"_id": int}).sort_values("_id")
+    else:
+        df = dimensiones.etiquetar(_db, dimension, df)
+        df = df.sort_values(by=["cantidad", "_id"], ascending=[False, True])
+        df = df.assign(_id=df["nombre"])
+    return df[["_id", "cantidad"]].rename(columns={"_id": columna}).reset_index(drop=True)
+
+def _resumen(_db, totales, desgloses, por_desglose):
+    cantidad = totales.get("cantidad") or 0
+    promedio = totales.get("promedio_anio")
+    if promedio is None and totales.get("n_anios"):
+        promedio = totales["suma_anios"] / totales["n_anios"]
+    resumen = Resumen(
+        cantidad=int(cantidad),
+        promedio_anio=float("nan") if promedio is None else float(promedio),
+        anio_min=float("nan") if totales.get("anio_min") is None else float(totales["anio_min"]),
+        anio_max=float("nan") if totales.get("anio_max") is None else float(totales["anio_max"]),
+    )
+    for nombre in desgloses:
+        docs = por_desglose.get(nombre, [])
+        resumen[nombre] = _desglose(_db, nombre, [d["_id"] for d in docs], [d["cantidad"] for d in docs])
+    return resumen
+
+def _armar(_db, resultado, metodo, desgloses):
+    if metodo == "count_documents":
+        return _resumen(_db, {"cantidad": resultado or 0}, desgloses, {})
+    if not desgloses:
+        return _resumen(_db, resultado[0] if resultado else {}, desgloses, {})
+    facetas = resultado[0] if resultado else {}
+    totales = (facetas.get("totales") or [{}])[0]
+    return _resumen(_db, totales, desgloses, facetas)
+
+# el plan (coleccion, metodo, args, armar) que usan consultas.py y asincrono.py, o None si en
+# este modo se calcula en python (evaluar_pandas). `formato` pasa el Resumen a lo que devuelve la consulta.
+def plan(_db, filtro, modo, metricas=METRICAS, desgloses=(), formato=None):
+    forma, metricas, desgloses = filtro.forma(), tuple(metricas), tuple(desgloses)
+    if modo == "pandas" and not _solo_cantidad(forma, metricas, desgloses):
+        return None
+    formato = formato or (lambda resumen: resumen)
+    valores = _valores(_db, filtro)
+    if valores is None:
+        return None, None, (), lambda _: formato(_resumen(_db, {}, desgloses, {}))
+
+    if modo == "rollup" and _usa_rollup(forma, desgloses):
+        coleccion, metodo, plantilla = _compilar_rollup(forma, metricas, desgloses)
+    else:
+        coleccion, metodo, plantilla = _compilar_libros(forma, metricas, desgloses)
+    return coleccion, metodo, tuple(_ligar(list(plantilla), valores)), \
+        lambda resultado: formato(_armar(_db, resultado, metodo, desgloses))
+
+# camino pandas: $match en el servidor y el resto en python
+def evaluar_pandas(_db, filtro, metricas=METRICAS, desgloses=()):
+    forma, desgloses = filtro.forma(), tuple(desgloses)
+    valores = _valores(_db, filtro)
+    if valores is None:
+        return _resumen(_db, {}, desgloses, {})
+    match = _ligar(_match(forma, "", "anio_publicacion"), valores)
+    libros_coll = _db["libros"]
+
+    campos = [DESGLOSES[d][0] for d in desgloses if d != "anio"]
+    if filtro.premio is None and not campos:
+        # solo hace falta el año: lectura columnar
+        df = pd.DataFrame({"anio": columnar.numeros(libros_coll, match, "anio_publicacion")})
+    else:
+        docs = libros_coll.find(match, dict.fromkeys(["anio_publicacion", *campos], 1))
+        df = pd.DataFrame(list(docs), columns=["_id", "anio_publicacion", *campos])
+        if filtro.premio is not None:
+            nominaciones = {"ganador": True} if filtro.premio == "ganador" else {}
+            nominados = columnar.distintos(columnar.ids(_db["nominaciones"], nominaciones, "libro"))
+            con_premio = df["_id"].isin(nominados)
+            df = df[~con_premio if filtro.premio == "sin_nominar" else con_premio]
+        with etapa("to_numeric"):
+            df = df.assign(anio=pd.to_numeric(df["anio_publicacion"], errors="coerce"))
+
+    anios = df["anio"]
+    totales = {"cantidad": len(df), "promedio_anio": anios.mean(skipna=True) if anios.notna().any() else None,
+               "anio_min": anios.min(skipna=True) if anios.notna().any() else None,
+               "anio_max": anios.max(skipna=True) if anios.notna().any() else None}
+    totales = {m: v for m, v in totales.items() if m in metricas}
+
+    por_desglose = {}
+    for nombre in desgloses:
+        columna = "anio" if nombre == "anio" else DESGLOSES[nombre][0]
+        valores_col = df[columna]
+        with etapa("value_counts"):
+            conteo = valores_col[valores_col.notna() & valores_col.map(bool)].value_counts()
+        por_desglose[nombre] = [{"_id": i, "cantidad": int(n)} for i, n in conteo.items()]
+    return _resumen(_db, totales, desgloses, por_desglose)
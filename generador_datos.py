@@ -0,0 +1,196 @@
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from pymongo import MongoClient
+from conexion import MONGO_URI, MONGO_DBNAME
+
+# genera datos sinteticos con el esquema y las distribuciones de Libros_Grupo8.json a cualquier escala.
+# Las dimensiones (generos, idiomas, formatos, autores, premios) se copian tal cual de la semilla;
+# libros y nominaciones se sortean de a bloques, asi la memoria no depende de la escala.
+
+DIMENSIONES = ("generos", "idiomas", "formatos", "autores", "premios")
+TAM_BLOQUE = 100_000
+
+# --> DISTRIBUCIONES DE LA SEMILLA <--
+
+def _empirica(valores):
+    conteo = Counter(valores)
+    claves = list(conteo)
+    pesos = np.array([conteo[c] for c in claves], dtype=float)
+    return np.array(claves, dtype=object), pesos / pesos.sum()
+
+def _zipf(claves, s):
+    # mismo soporte que la semilla pero con sesgo zipf controlado (el mas frecuente primero)
+    pesos = 1.0 / np.arange(1, len(claves) + 1) ** s
+    return claves, pesos / pesos.sum()
+
+def distribuciones(semilla, zipf=None):
+    libros = semilla["libros"]
+    nominaciones = semilla["nominaciones"]
+    anios = {l["_id"]: l.get("anio_publicacion") for l in libros}
+    noms_por_libro = Counter(n["libro"] for n in nominaciones)
+
+    dist = {
+        "genero": _empirica(l.get("genero") for l in libros),
+        "idioma": _empirica(l.get("idioma") for l in libros),
+        "formato": _empirica(l.get("formato") for l in libros),
+        "anio": _empirica(l.get("anio_publicacion") for l in libros),
+        "autor": _empirica(a for l in libros for a in l.get("autores", [])),
+        "n_autores": _empirica(len(l.get("autores", [])) for l in libros),
+        "n_premios": _empirica(len(l.get("premios", [])) for l in libros),
+        "premio": _empirica(p for l in libros for p in l.get("premios", [])),
+        # nominaciones: cuantos libros se nominan, cuantas veces, a que premio, cuando y si gana
+        "p_nominado": len(noms_por_libro) / max(len(libros), 1),
+        "n_nominaciones": _empirica(noms_por_libro.values()),
+        "premio_nominacion": _empirica(n.get("premio") for n in nominaciones),
+        "demora": _empirica(n["anio_nominacion"] - anios[n["libro"]] for n in nominaciones
+                            if isinstance(n.get("anio_nominacion"), int) and isinstance(anios.get(n["libro"]), int)),
+        "p_ganador": sum(bool(n.get("ganador")) for n in nominaciones) / max(len(nominaciones), 1),
+    }
+    if zipf:
+        for campo in ("genero", "idioma"):
+            claves, pesos = dist[campo]
+            dist[campo] = _zipf(claves[np.argsort(-pesos, kind="stable")], zipf)
+    return dist
+
+def _sortear(rng, dist, n):
+    claves, pesos = dist
+    return claves[rng.choice(len(claves), size=n, p=pesos)]
+
+# --> GENERACION <--
+
+def generar_bloque(dist, inicio, cantidad, semilla, primer_nominacion):
+    rng = np.random.default_rng([semilla, inicio])
+    ids = np.arange(inicio, inicio + cantidad)
+    generos = _sortear(rng, dist["genero"], cantidad)
+    idiomas = _sortear(rng, dist["idioma"], cantidad)
+    formatos = _sortear(rng, dist["formato"], cantidad)
+    anios = _sortear(rng, dist["anio"], cantidad)
+    n_autores = _sortear(rng, dist["n_autores"], cantidad).astype(int)
+    n_premios = _sortear(rng, dist["n_premios"], cantidad).astype(int)
+    autores = _sortear(rng, dist["autor"], int(n_autores.sum()))
+    premios = _sortear(rng, dist["premio"], int(n_premios.sum())) if len(dist["premio"][0]) else np.array([], dtype=object)
+
+    libros = []
+    ia = ip = 0
+    for i in range(cantidad):
+        libros.append({
+            "_id": int(ids[i]),
+            "titulo": f"Libro sintetico {ids[i]}",
+            "autores": list(autores[ia:ia + n_autores[i]]),
+            "genero": generos[i],
+            "formato": formatos[i],
+            "idioma": idiomas[i],
+            "premios": list(premios[ip:ip + n_premios[i]]),
+            "anio_publicacion": anios[i],
+        })
+        ia += n_autores[i]
+        ip += n_premios[i]
+
+    nominados = np.flatnonzero(rng.random(cantidad) < dist["p_nominado"])
+    veces = _sortear(rng, dist["n_nominaciones"], len(nominados)).astype(int)
+    total = int(veces.sum())
+    libro_de = np.repeat(nominados, veces)
+    premio_nom = _sortear(rng, dist["premio_nominacion"], total)
+    demora = _sortear(rng, dist["demora"], total) if len(dist["demora"][0]) else np.zeros(total, dtype=object)
+    ganador = rng.random(total) < dist["p_ganador"]
+
+    nominaciones = []
+    for j in range(total):
+        libro = libros[libro_de[j]]
+        anio = libro["anio_publicacion"]
+        nominaciones.append({
+            "_id": primer_nominacion + j,
+            "libro": libro["_id"],
+            "premio": premio_nom[j],
+            "anio_nominacion": anio + int(demora[j]) if isinstance(anio, (int, np.integer)) else anio,
+            "ganador": bool(ganador[j]),
+        })
+    return libros, nominaciones
+
+def _a_python(doc):
+    # numpy -> tipos nativos para json/bson
+    return {k: (v.item() if isinstance(v, np.generic) else
+                [x.item() if isinstance(x, np.generic) else x for x in v] if isinstance(v, list) else v)
+            for k, v in doc.items()}
+
+def bloques(dist, total_libros, semilla):
+    primer_nominacion = 1
+    for inicio in range(1, total_libros + 1, TAM_BLOQUE):
+        cantidad = min(TAM_BLOQUE, total_libros + 1 - inicio)
+        libros, nominaciones = generar_bloque(dist, inicio, cantidad, semilla, primer_nominacion)
+        primer_nominacion += len(nominaciones)
+        yield [_a_python(d) for d in libros], [_a_python(d) for d in nominaciones]
+
+# --> SALIDAS <--
+
+def escribir_json(ruta, semilla_datos, dist, total_libros, semilla):
+    # mismo formato que Libros_Grupo8.json (lo lee importar_datos_mongo.py).
+    # libros va entero antes que nominaciones: se hacen dos pasadas con los mismos bloques
+    # (el sorteo es determinista por bloque), sin guardar nada en memoria entre pasadas.
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for nombre in DIMENSIONES:
+            f.write(f'"{nombre}": {json.dumps(semilla_datos.get(nombre, []), ensure_ascii=False)},\n')
+        for indice, nombre in ((0, "libros"), (1, "nominaciones")):
+            f.write(f'"{nombre}": [\n')
+            primero = True
+            for bloque in bloques(dist, total_libros, semilla):
+                for doc in bloque[indice]:
+                    f.write(("" if primero else ",\n") + json.dumps(doc, ensure_ascii=False))
+                    primero = False
+            f.write("\n]" + (",\n" if nombre == "libros" else "\n"))
+        f.write("}\n")
+
+def escribir_mongo(db, semilla_datos, dist, total_libros, semilla, borrar):
+    colecciones = DIMENSIONES + ("libros", "nominaciones")
+    if borrar:
+        for nombre in colecciones:
+            db[nombre].drop()
+    for nombre in DIMENSIONES:
+        if semilla_datos.get(nombre):
+            db[nombre].insert_many(semilla_datos[nombre], ordered=False)
+    for libros, nominaciones in bloques(dist, total_libros, semilla):
+        db["libros"].insert_many(libros, ordered=False)
+        if nominaciones:
+            db["nominaciones"].insert_many(nominaciones, ordered=False)
+        print(f"  {libros[-1]['_id']} / {total_libros} libros")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datos sinteticos con la forma de Libros_Grupo8.json")
+    parser.add_argument("--semilla-datos", default="Libros_Grupo8.json", help="dataset de referencia")
+    escala = parser.add_mutually_exclusive_group()
+    escala.add_argument("--escala", type=float, default=1.0, help="factor sobre la cantidad de libros de la semilla")
+    escala.add_argument("--libros", type=int, help="cantidad exacta de libros")
+    parser.add_argument("--zipf", type=float, help="reemplaza la distribucion de generos/idiomas por una zipf con este exponente")
+    parser.add_argument("--semilla", type=int, default=8, help="semilla del generador aleatorio")
+    parser.add_argument("--salida", help="archivo json de salida")
+    parser.add_argument("--mongo", action="store_true", help="escribe directo en la base (--uri/--db)")
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    parser.add_argument("--borrar", action="store_true", help="con --mongo, borra las colecciones antes")
+    args = parser.parse_args(argv)
+
+    if not args.salida and not args.mongo:
+        parser.error("indicar --salida y/o --mongo")
+
+    with open(args.semilla_datos, encoding="utf-8") as f:
+        semilla_datos = json.load(f)
+    dist = distribuciones(semilla_datos, zipf=args.zipf)
+    total = args.libros or max(1, round(len(semilla_datos["libros"]) * args.escala))
+
+    inicio = time.perf_counter()
+    if args.salida:
+        escribir_json(args.salida, semilla_datos, dist, total, args.semilla)
+        print(f"{total} libros escritos en {args.salida}")
+    if args.mongo:
+        client = MongoClient(args.uri)
+        escribir_mongo(client[args.db], semilla_datos, dist, total, args.semilla, args.borrar)
+        print(f"{total} libros cargados en {args.db}")
+    print(f"Listo en {time.perf_counter() - inicio:.1f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
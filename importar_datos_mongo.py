@@ -1,17 +1,285 @@
+import os
+import sys
 import json
-from pymongo import MongoClient
+import time
+import codecs
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from bson import json_util
+from pymongo import MongoClient, ReplaceOne, InsertOne
+from pymongo.errors import BulkWriteError
+from conexion import MONGO_URI, MONGO_DBNAME
+import indices
+import rollups
 
-# cone a MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client['LibrosTesteo']
+# importador de Libros_Grupo8.json (todas las colecciones en un objeto) o de los
+# exports DB/TpO_Libros.<coleccion>.json (un array por archivo).
+# Lee el json de a pedazos, nunca tiene el archivo entero en memoria.
 
-# guardamos el json en la var data
-with open('Libros_Grupo8.json') as file:
-    data = json.load(file)
+TAM_PEDAZO = 1 << 20           # bytes leidos por vez
+CODIGO_DUPLICADO = 11000
 
-# itera en el .json para crear las collections con sus documents
-for collection_name, documents in data.items():
-    collection = db[collection_name]
-    collection.insert_many(documents)
+# --> LECTURA INCREMENTAL <--
 
-print("Datos importados correctamente.")
+# caracteres que pueden continuar un numero json
+_SIGUE_NUMERO = set("0123456789.eE+-")
+
+class _Lector:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+        self.decoder = json.JSONDecoder(object_hook=json_util.object_hook)
+        self.buf = ""
+        self.pos = 0
+        self.bytes_leidos = 0
+        self.fin = False
+
+    def _leer_mas(self):
+        if self.fin:
+            return False
+        datos = self.archivo.read(TAM_PEDAZO)
+        self.bytes_leidos += len(datos)
+        if not datos:
+            self.fin = True
+            self.buf = self.buf[self.pos:] + self.decodificador.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self.decodificador.decode(datos)
+        self.pos = 0
+        return True
+
+    def caracter(self):
+        # proximo caracter que no sea espacio (sin consumirlo), None al final del archivo
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._leer_mas():
+                return None
+
+    def esperar(self, caracteres):
+        c = self.caracter()
+        if c is None or c not in caracteres:
+            raise ValueError(f"JSON invalido: se esperaba {caracteres!r} y vino {c!r} (byte ~{self.bytes_leidos})")
+        self.pos += 1
+        return c
+
+    def valor(self):
+        # decodifica un valor completo; si quedo cortado en el buffer lee otro pedazo y reintenta
+        self.caracter()
+        while True:
+            try:
+                valor, fin = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._leer_mas():
+                    raise
+                continue
+            # un numero suelto puede seguir en el proximo pedazo ("1" de "1.5", o "1." que corta en "1"):
+            # solo es completo si despues viene algo que no puede ser parte de un numero
+            if (isinstance(valor, (int, float)) and not isinstance(valor, bool) and not self.fin
+                    and (fin == len(self.buf) or self.buf[fin] in _SIGUE_NUMERO)):
+                self._leer_mas()
+                continue
+            self.pos = fin
+            return valor
+
+    def elementos(self):
+        # recorre un array ya abierto ('[' consumido)
+        if self.caracter() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            if self.esperar(",]") == "]":
+                return
+
+def coleccion_de_archivo(ruta):
+    # DB/TpO_Libros.libros.json -> libros
+    return Path(ruta).stem.split(".")[-1]
+
+# genera (coleccion, documento) en orden de archivo
+def leer_documentos(archivo, ruta, lector=None):
+    lector = lector or _Lector(archivo)
+    inicio = lector.esperar("{[")
+    if inicio == "[":
+        coleccion = coleccion_de_archivo(ruta)
+        for doc in lector.elementos():
+            yield coleccion, doc
+        return
+
+    if lector.caracter() == "}":
+        return
+    while True:
+        coleccion = lector.valor()
+        lector.esperar(":")
+        lector.esperar("[")
+        for doc in lector.elementos():
+            yield coleccion, doc
+        if lector.esperar(",}") == "}":
+            return
+
+# --> CHECKPOINT <--
+
+# guarda por (archivo, coleccion) cuantos documentos seguidos ya estan confirmados en la base.
+# Los lotes terminan en cualquier orden; solo se avanza sobre el prefijo continuo.
+class Checkpoint:
+    def __init__(self, ruta, reanudar):
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.confirmados = {}
+        self.pendientes = {}   # clave -> {inicio_lote: tamaño}
+        if reanudar and os.path.exists(ruta):
+            with open(ruta) as f:
+                self.confirmados = json.load(f)
+
+    def ya_cargados(self, clave):
+        return self.confirmados.get(clave, 0)
+
+    def lote_terminado(self, clave, inicio, tamano):
+        with self.lock:
+            pendientes = self.pendientes.setdefault(clave, {})
+            pendientes[inicio] = tamano
+            hecho = self.confirmados.get(clave, 0)
+            while hecho in pendientes:
+                hecho += pendientes.pop(hecho)
+            self.confirmados[clave] = hecho
+            tmp = self.ruta + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.confirmados, f)
+            os.replace(tmp, self.ruta)
+
+    def borrar(self):
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+
+# --> ESCRITURA <--
+
+class Estadisticas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.por_coleccion = {}
+        self.bytes = 0
+
+    def sumar(self, coleccion, escritos, duplicados):
+        with self.lock:
+            est = self.por_coleccion.setdefault(coleccion, {"documentos": 0, "duplicados": 0})
+            est["documentos"] += escritos
+            est["duplicados"] += duplicados
+
+def escribir_lote(db, coleccion, docs, modo):
+    coll = db[coleccion]
+    try:
+        if modo == "upsert":
+            # idempotente: volver a correr la carga reemplaza en vez de fallar por _id duplicado
+            ops = [ReplaceOne({"_id": d["_id"]}, d, upsert=True) if "_id" in d else InsertOne(d) for d in docs]
+            coll.bulk_write(ops, ordered=False)
+        else:
+            coll.insert_many(docs, ordered=False)
+        return len(docs), 0
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        otros = [err for err in errores if err.get("code") != CODIGO_DUPLICADO]
+        if otros:
+            raise
+        return len(docs) - len(errores), len(errores)
+
+def importar_archivo(db, ruta, args, escritores, cupo, checkpoint, estadisticas):
+    lotes = {}          # coleccion -> (inicio, docs)
+    vistos = {}         # coleccion -> documentos leidos
+    futuros = []
+
+    def enviar(coleccion, inicio, docs):
+        clave = f"{ruta}::{coleccion}"
+        cupo.acquire()
+        def tarea():
+            try:
+                escritos, duplicados = escribir_lote(db, coleccion, docs, args.modo)
+                estadisticas.sumar(coleccion, escritos, duplicados)
+                checkpoint.lote_terminado(clave, inicio, len(docs))
+            finally:
+                cupo.release()
+        futuros.append(escritores.submit(tarea))
+
+    with open(ruta, "rb") as archivo:
+        lector = _Lector(archivo)
+        for coleccion, doc in leer_documentos(archivo, ruta, lector):
+            n = vistos.get(coleccion, 0)
+            vistos[coleccion] = n + 1
+            if n < checkpoint.ya_cargados(f"{ruta}::{coleccion}"):
+                continue   # ya estaba confirmado en una corrida anterior
+            inicio, docs = lotes.get(coleccion) or (n, [])
+            docs.append(doc)
+            lotes[coleccion] = (inicio, docs)
+            if len(docs) >= args.lote:
+                enviar(coleccion, inicio, docs)
+                del lotes[coleccion]
+        for coleccion, (inicio, docs) in lotes.items():
+            enviar(coleccion, inicio, docs)
+        with estadisticas.lock:
+            estadisticas.bytes += lector.bytes_leidos
+
+    for futuro in futuros:
+        futuro.result()
+
+def expandir_rutas(rutas):
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos.extend(sorted(str(p) for p in Path(ruta).glob("*.json")))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa los json de libros a MongoDB")
+    parser.add_argument("rutas", nargs="*", default=["Libros_Grupo8.json"],
+                        help="Libros_Grupo8.json, archivos DB/TpO_Libros.*.json o una carpeta con ellos")
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    parser.add_argument("--lote", type=int, default=1000, help="documentos por bulk write")
+    parser.add_argument("--workers", type=int, default=4, help="escrituras concurrentes")
+    parser.add_argument("--modo", choices=("insertar", "upsert"), default="insertar",
+                        help="upsert reemplaza por _id y se puede correr varias veces")
+    parser.add_argument("--checkpoint", default=".importacion.checkpoint.json")
+    parser.add_argument("--reanudar", action="store_true", help="sigue desde el checkpoint de una corrida cortada")
+    parser.add_argument("--indices", action="store_true", help="crea los indices de indices.py al terminar la carga")
+    parser.add_argument("--rollups", action="store_true", help="reconstruye las colecciones resumen al terminar")
+    args = parser.parse_args(argv)
+
+    rutas = expandir_rutas(args.rutas)
+    client = MongoClient(args.uri)
+    db = client[args.db]
+    checkpoint = Checkpoint(args.checkpoint, args.reanudar)
+    estadisticas = Estadisticas()
+    cupo = threading.BoundedSemaphore(args.workers * 2)   # lotes en vuelo, limita la memoria
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="escritor") as escritores, \
+         ThreadPoolExecutor(max_workers=max(1, min(len(rutas), args.workers)), thread_name_prefix="lector") as lectores:
+        futuros = [lectores.submit(importar_archivo, db, ruta, args, escritores, cupo, checkpoint, estadisticas)
+                   for ruta in rutas]
+        for futuro in futuros:
+            futuro.result()
+    duracion = time.perf_counter() - inicio
+
+    if args.indices:
+        print("Creando indices...")
+        for cambio in indices.sincronizar(db):
+            print(f"  {cambio}")
+    if args.rollups:
+        print("Reconstruyendo resumenes...")
+        rollups.reconstruir(db)
+    checkpoint.borrar()
+
+    total = sum(est["documentos"] for est in estadisticas.por_coleccion.values())
+    for coleccion, est in sorted(estadisticas.por_coleccion.items()):
+        print(f"  {coleccion}: {est['documentos']} documentos ({est['duplicados']} duplicados salteados)")
+    mb = estadisticas.bytes / (1024 * 1024)
+    print(f"Datos importados correctamente: {total} documentos, {mb:.1f} MB en {duracion:.2f}s "
+          f"({total / duracion if duracion else 0:.0f} docs/s, {mb / duracion if duracion else 0:.2f} MB/s)")
+    client.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import sys
+import argparse
+import inspect
+from pymongo import MongoClient, IndexModel, ASCENDING, monitoring
+from conexion import MONGO_URI, MONGO_DBNAME
+import consultas
+import dimensiones
+
+# indices que necesitan las consultas de consultas.py, por coleccion.
+# El nombre es explicito para poder reconciliar (crear lo que falta, recrear lo que cambio).
+INDICES = {
+    "nominaciones": [
+        # consulta_2/3, premios_ganados_por_genero: $match ganador + $sort/$group libro, cubierto
+        IndexModel([("ganador", ASCENDING), ("libro", ASCENDING)], name="ganador_libro"),
+        # consulta_1/4: $sort/$group libro sobre todas las nominaciones -> DISTINCT_SCAN
+        IndexModel([("libro", ASCENDING)], name="libro"),
+    ],
+    "libros": [
+        # consulta_5 cubierta ($match genero+idioma y $avg de anio_publicacion, sin _id),
+        # consulta_6 y 7 cuentan sobre el prefijo genero / genero+idioma
+        IndexModel([("genero", ASCENDING), ("idioma", ASCENDING), ("anio_publicacion", ASCENDING)],
+                   name="genero_idioma_anio"),
+        # explorador.pagina: $sort por la clave + _id y el cursor keyset ({clave: {$gt}} o empate y _id mayor)
+        IndexModel([("titulo", ASCENDING), ("_id", ASCENDING)], name="titulo_id"),
+        IndexModel([("anio_publicacion", ASCENDING), ("_id", ASCENDING)], name="anio_id"),
+    ],
+    "generos": [IndexModel([("nombre", ASCENDING)], name="nombre")],
+    "idiomas": [IndexModel([("nombre", ASCENDING)], name="nombre")],
+}
+
+# consultas que tienen que pasar la verificacion de planes
+CONSULTAS = [fn for nombre, fn in consultas.CONSULTAS.items() if nombre.startswith("consulta_")]
+
+# --> RECONCILIACION <--
+
+def sincronizar(db, podar=False):
+    cambios = []
+    for coleccion, modelos in INDICES.items():
+        coll = db[coleccion]
+        existentes = coll.index_information()
+        faltantes = []
+        for modelo in modelos:
+            spec = modelo.document
+            actual = existentes.get(spec["name"])
+            if actual is None:
+                faltantes.append(modelo)
+            elif list(actual["key"]) != list(spec["key"].items()):
+                coll.drop_index(spec["name"])
+                faltantes.append(modelo)
+                cambios.append(f"{coleccion}.{spec['name']}: recreado")
+        if faltantes:
+            coll.create_indexes(faltantes)
+            cambios.extend(f"{coleccion}.{m.document['name']}: creado" for m in faltantes)
+        if podar:
+            declarados = {m.document["name"] for m in modelos} | {"_id_"}
+            for nombre in set(existentes) - declarados:
+                coll.drop_index(nombre)
+                cambios.append(f"{coleccion}.{nombre}: eliminado")
+    return cambios
+
+# --> VERIFICACION DE PLANES <--
+
+# campos que agrega el driver y no van en un explain
+_CAMPOS_DRIVER = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "apiVersion", "$audit"}
+_COMANDOS = {"find", "aggregate", "count", "distinct"}
+
+class _Captura(monitoring.CommandListener):
+    def __init__(self):
+        self.activa = False
+        self.comandos = []
+
+    def started(self, event):
+        if self.activa and event.command_name in _COMANDOS:
+            cmd = {k: v for k, v in event.command.items() if k not in _CAMPOS_DRIVER}
+            self.comandos.append(cmd)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def _planes_ganadores(nodo):
+    if isinstance(nodo, dict):
+        for clave, valor in nodo.items():
+            if clave == "winningPlan":
+                yield valor
+            else:
+                yield from _planes_ganadores(valor)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _planes_ganadores(valor)
+
+def _etapas(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for valor in plan.values():
+            yield from _etapas(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            yield from _etapas(valor)
+
+def _buscar(nodo, clave):
+    if isinstance(nodo, dict):
+        for k, v in nodo.items():
+            if k == clave:
+                yield v
+            else:
+                yield from _buscar(v, clave)
+    elif isinstance(nodo, list):
+        for v in nodo:
+            yield from _buscar(v, clave)
+
+# devuelve (etapas del plan, examinados, devueltos, problemas) de un explain
+def analizar_explain(explain, ratio):
+    etapas = [e for plan in _planes_ganadores(explain) for e in _etapas(plan)]
+    problemas = []
+    if "COLLSCAN" in etapas:
+        problemas.append("COLLSCAN en el plan ganador")
+    # $lookup sin indice en la coleccion foranea
+    if any(n for n in _buscar(explain, "collectionScans") if isinstance(n, int)):
+        problemas.append("COLLSCAN dentro de un $lookup")
+
+    examinados = devueltos = 0
+    for stats in _buscar(explain, "executionStats"):
+        if isinstance(stats, dict):
+            examinados += stats.get("totalDocsExamined", 0)
+            devueltos += stats.get("nReturned", 0)
+    if examinados > ratio * max(devueltos, 1):
+        problemas.append(f"examina {examinados} documentos para devolver {devueltos}")
+    return etapas, examinados, devueltos, problemas
+
+def verificar(db, captura, ratio=10, modo=None):
+    # las dimensiones se leen enteras a proposito (son chicas); las cargo antes de capturar
+    for coleccion in dimensiones.DIMENSIONES:
+        dimensiones.nombres_por_id(db, coleccion)
+
+    fallas = 0
+    for fn in CONSULTAS:
+        original = getattr(fn, "__wrapped__", fn)   # sin pasar por el cache de resultados
+        kwargs = {"modo": modo} if modo and "modo" in inspect.signature(original).parameters else {}
+        captura.comandos = []
+        captura.activa = True
+        try:
+            original(db, **kwargs)
+        finally:
+            captura.activa = False
+
+        for cmd in captura.comandos:
+            explain = db.command("explain", cmd, verbosity="executionStats")
+            etapas, examinados, devueltos, problemas = analizar_explain(explain, ratio)
+            estado = "FALLA" if problemas else "OK"
+            fallas += bool(problemas)
+            print(f"[{estado}] {fn.__name__} {next(iter(cmd))} {cmd[next(iter(cmd))]}: "
+                  f"{' > '.join(dict.fromkeys(etapas))} (examinados {examinados}, devueltos {devueltos})")
+            for problema in problemas:
+                print(f"        {problema}")
+    return fallas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indices de la base de libros")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    crear = sub.add_parser("crear", help="crea o reconcilia los indices declarados en INDICES")
+    crear.add_argument("--podar", action="store_true", help="elimina los indices que no estan declarados")
+    verif = sub.add_parser("verificar", help="corre explain() de cada consulta y falla si hay COLLSCAN")
+    verif.add_argument("--ratio", type=float, default=10,
+                       help="maximo de documentos examinados por documento devuelto")
+    verif.add_argument("--modo", choices=consultas.MODOS)
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    captura = _Captura()
+    client = MongoClient(args.uri, event_listeners=[captura])
+    db = client[args.db]
+
+    if args.comando == "crear":
+        cambios = sincronizar(db, podar=args.podar)
+        print("\n".join(cambios) if cambios else "Los indices ya estaban al dia.")
+        return 0
+
+    fallas = verificar(db, captura, ratio=args.ratio, modo=args.modo)
+    print(f"{fallas} comando(s) con problemas." if fallas else "Todas las consultas usan indices.")
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+import functools
+import threading
+import contextlib
+import contextvars
+from collections import Counter, OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bson
+from pymongo import monitoring
+
+# instrumentacion de las consultas: por cada consulta_* cuanto tarda, cuantos comandos manda,
+# cuantos documentos y bytes van y vienen, y cuanto se va en las etapas de pandas.
+#
+# Apagada (por defecto) no registra listener en los clientes y los decoradores/etapas solo
+# miran un booleano. Se prende con INSTRUMENTAR=1 (antes de crear los clientes).
+
+INSTRUMENTAR = os.getenv("INSTRUMENTAR", "0") == "1"
+INSTRUMENTAR_PUERTO = int(os.getenv("INSTRUMENTAR_PUERTO", "0"))   # >0 sirve /metrics por http
+
+MUESTRAS = 1000   # latencias guardadas por consulta para el histograma
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)   # segundos, estilo prometheus
+SIN_CONSULTA = "-"
+PENDIENTES_MAX = 10_000   # comandos en vuelo que se recuerdan (si alguno nunca termina no se acumula)
+
+# campos que agrega el driver y no van en un explain
+_CAMPOS_DRIVER = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "apiVersion", "$audit"}
+_EXPLICABLES = {"find", "aggregate", "count"}
+
+_consulta_actual = contextvars.ContextVar("consulta_actual", default=SIN_CONSULTA)
+_lock = threading.Lock()
+
+class Estadisticas:
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.segundos = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.latencias = deque(maxlen=MUESTRAS)
+        self.comandos = Counter()
+        self.red_segundos = 0.0
+        self.documentos = 0
+        self.bytes_enviados = 0
+        self.bytes_recibidos = 0
+        self.etapas = Counter()      # etapa -> segundos
+        self.ultimos = []            # comandos de la ultima corrida (para explain)
+        self.examinados = None       # documentos examinados segun el ultimo explain
+
+_estadisticas = {}   # consulta -> Estadisticas
+
+def _de(consulta):
+    est = _estadisticas.get(consulta)
+    if est is None:
+        est = _estadisticas[consulta] = Estadisticas()
+    return est
+
+def activo():
+    return INSTRUMENTAR
+
+def activar(puerto=None):
+    # tiene que llamarse antes de crear los MongoClient (el listener se pasa al crearlos)
+    global INSTRUMENTAR
+    INSTRUMENTAR = True
+    if puerto:
+        servir(puerto)
+
+def reiniciar():
+    with _lock:
+        _estadisticas.clear()
+
+# --> LISTENER <--
+
+class _Listener(monitoring.CommandListener):
+    def __init__(self):
+        # (request_id, conexion) -> consulta, solo los de alguna consulta (el resto va a SIN_CONSULTA)
+        self.pendientes = OrderedDict()
+
+    def started(self, event):
+        consulta = _consulta_actual.get()
+        enviados = len(bson.encode(event.command))
+        with _lock:
+            if consulta != SIN_CONSULTA:
+                self.pendientes[(event.request_id, event.connection_id)] = consulta
+                if len(self.pendientes) > PENDIENTES_MAX:
+                    self.pendientes.popitem(last=False)   # el mas viejo
+            est = _de(consulta)
+            est.comandos[event.command_name] += 1
+            est.bytes_enviados += enviados
+            # sin consulta no hay corrida que reinicie la lista (ej. el sondeo de cache.py cada 5s)
+            if event.command_name in _EXPLICABLES and consulta != SIN_CONSULTA:
+                est.ultimos.append({k: v for k, v in event.command.items() if k not in _CAMPOS_DRIVER})
+
+    def succeeded(self, event):
+        reply = event.reply
+        cursor = reply.get("cursor") or {}
+        lote = cursor.get("firstBatch", cursor.get("nextBatch"))
+        recibidos = len(bson.encode(reply))
+        with _lock:
+            consulta = self.pendientes.pop((event.request_id, event.connection_id), SIN_CONSULTA)
+            est = _de(consulta)
+            est.red_segundos += event.duration_micros / 1e6
+            est.documentos += len(lote) if lote is not None else 1
+            est.bytes_recibidos += recibidos
+
+    def failed(self, event):
+        with _lock:
+            consulta = self.pendientes.pop((event.request_id, event.connection_id), SIN_CONSULTA)
+            _de(consulta).red_segundos += event.duration_micros / 1e6
+
+_listener = _Listener()
+
+# para pasar en event_listeners al crear un cliente; vacio si esta apagada
+def listeners():
+    return [_listener] if INSTRUMENTAR else []
+
+# --> CONSULTAS Y ETAPAS <--
+
+@contextlib.contextmanager
+def consulta(nombre):
+    # atribuye a `nombre` los comandos y etapas de adentro; si ya se esta midiendo esa consulta no cuenta dos veces
+    if not INSTRUMENTAR or _consulta_actual.get() == nombre:
+        yield
+        return
+    token = _consulta_actual.set(nombre)
+    with _lock:
+        _de(nombre).ultimos = []
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        _consulta_actual.reset(token)
+        with _lock:
+            est = _de(nombre)
+            est.llamadas += 1
+            est.errores += error
+            est.segundos += segundos
+            est.latencias.append(segundos)
+            i = bisect.bisect_left(BUCKETS, segundos)
+            if i < len(BUCKETS):
+                est.buckets[i] += 1
+
+def medido(fn):
+    @functools.wraps(fn)
+    def envoltura(*args, **kwargs):
+        if not INSTRUMENTAR:
+            return fn(*args, **kwargs)
+        with consulta(fn.__name__):
+            return fn(*args, **kwargs)
+    return envoltura
+
+class _Etapa:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        with _lock:
+            _de(_consulta_actual.get()).etapas[self.nombre] += segundos
+
+_NADA = contextlib.nullcontext()
+
+# with etapa("value_counts"): ...   (tiempo de pandas dentro de la consulta actual)
+def etapa(nombre):
+    return _Etapa(nombre) if INSTRUMENTAR else _NADA
+
+# --> EXPLAIN A PEDIDO <--
+
+# corre explain de los comandos de la ultima corrida de la consulta y guarda los documentos examinados
+def examinar(db, nombre):
+    from indices import analizar_explain   # indices importa consultas, que importa este modulo
+    with _lock:
+        comandos = list(_de(nombre).ultimos)
+    examinados = 0
+    for cmd in comandos:
+        explain = db.command("explain", cmd, verbosity="executionStats")
+        examinados += analizar_explain(explain, ratio=float("inf"))[1]
+    with _lock:
+        _de(nombre).examinados = examinados
+    return examinados
+
+# --> SALIDAS <--
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+def resumen():
+    with _lock:
+        copia = {nombre: (est.llamadas, est.errores, est.segundos, list(est.latencias), dict(est.comandos),
+                          est.red_segundos, est.documentos, est.bytes_enviados, est.bytes_recibidos,
+                          dict(est.etapas), est.examinados)
+                 for nombre, est in _estadisticas.items()}
+    filas = {}
+    for nombre, (llamadas, errores, segundos, latencias, comandos, red, docs, enviados, recibidos, etapas,
+                 examinados) in sorted(copia.items()):
+        filas[nombre] = {
+            "llamadas": llamadas,
+            "errores": errores,
+            "p50_ms": None if not latencias else _percentil(latencias, 50) * 1000,
+            "p95_ms": None if not latencias else _percentil(latencias, 95) * 1000,
+            "total_s": segundos,
+            "red_s": red,
+            "pandas_s": sum(etapas.values()),
+            "comandos": sum(comandos.values()),
+            "documentos": docs,
+            "kb_enviados": enviados / 1024,
+            "kb_recibidos": recibidos / 1024,
+            "examinados": examinados,
+            "etapas_s": etapas,
+            "por_comando": comandos,
+        }
+    return filas
+
+def latencias(nombre):
+    with _lock:
+        return list(_de(nombre).latencias) if nombre in _estadisticas else []
+
+def como_json():
+    return json.dumps(resumen(), indent=2)
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+def prometheus():
+    with _lock:
+        datos = [(n, est.llamadas, est.segundos, list(est.buckets), dict(est.comandos), est.red_segundos,
+                  est.documentos, est.bytes_enviados, est.bytes_recibidos, dict(est.etapas), est.errores)
+                 for n, est in sorted(_estadisticas.items())]
+    lineas = [
+        "# HELP consulta_segundos Duracion de cada consulta (sin hits de cache).",
+        "# TYPE consulta_segundos histogram",
+    ]
+    for nombre, llamadas, segundos, buckets, *_ in datos:
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS, buckets):
+            acumulado += cantidad
+            lineas.append(f'consulta_segundos_bucket{{consulta="{_etiqueta(nombre)}",le="{limite}"}} {acumulado}')
+        lineas.append(f'consulta_segundos_bucket{{consulta="{_etiqueta(nombre)}",le="+Inf"}} {llamadas}')
+        lineas.append(f'consulta_segundos_sum{{consulta="{_etiqueta(nombre)}"}} {segundos}')
+        lineas.append(f'consulta_segundos_count{{consulta="{_etiqueta(nombre)}"}} {llamadas}')
+
+    contadores = (
+        ("consulta_errores_total", "Consultas que terminaron con error.", 10),
+        ("mongo_red_segundos_total", "Tiempo esperando respuestas de mongod.", 5),
+        ("mongo_documentos_devueltos_total", "Documentos devueltos por mongod.", 6),
+        ("mongo_bytes_enviados_total", "Bytes BSON de los comandos enviados.", 7),
+        ("mongo_bytes_recibidos_total", "Bytes BSON de las respuestas.", 8),
+    )
+    for metrica, ayuda, indice in contadores:
+        lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} counter"]
+        lineas += [f'{metrica}{{consulta="{_etiqueta(d[0])}"}} {d[indice]}' for d in datos]
+
+    lineas += ["# HELP mongo_comandos_total Comandos enviados por consulta y tipo.", "# TYPE mongo_comandos_total counter"]
+    lineas += [f'mongo_comandos_total{{consulta="{_etiqueta(d[0])}",comando="{_etiqueta(c)}"}} {n}'
+               for d in datos for c, n in sorted(d[4].items())]
+    lineas += ["# HELP pandas_etapa_segundos_total Tiempo en etapas de pandas por consulta.",
+               "# TYPE pandas_etapa_segundos_total counter"]
+    lineas += [f'pandas_etapa_segundos_total{{consulta="{_etiqueta(d[0])}",etapa="{_etiqueta(e)}"}} {s}'
+               for d in datos for e, s in sorted(d[9].items())]
+    return "\n".join(lineas) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            cuerpo, tipo = prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            cuerpo, tipo = como_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        datos = cuerpo.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+_servidor = None
+
+# /metrics (prometheus) y /metrics.json en un hilo aparte, una vez por proceso
+def servir(puerto):
+    global _servidor
+    with _lock:
+        if _servidor is not None:
+            return _servidor
+        _servidor = ThreadingHTTPServer(("", puerto), _Handler)
+    threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+    return _servidor
+
+if INSTRUMENTAR and INSTRUMENTAR_PUERTO:
+    servir(INSTRUMENTAR_PUERTO)
+
+# --> CLI <--
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corre las consultas instrumentadas y muestra las metricas")
+    parser.add_argument("consultas", nargs="*", help="consultas a correr (por defecto todas)")
+    parser.add_argument("--formato", choices=("tabla", "json", "prometheus"), default="tabla")
+    parser.add_argument("--modo")
+    parser.add_argument("--explain", action="store_true", help="agrega documentos examinados (corre explain)")
+    parser.add_argument("--uri")
+    parser.add_argument("--db")
+    args = parser.parse_args(argv)
+
+    activar()
+    import inspect
+    from pymongo import MongoClient
+    from conexion import MONGO_URI, MONGO_DBNAME
+    import consultas
+    client = MongoClient(args.uri or MONGO_URI, event_listeners=listeners())
+    db = client[args.db or MONGO_DBNAME]
+
+    nombres = args.consultas or list(consultas.CONSULTAS)
+    desconocidas = set(nombres) - set(consultas.CONSULTAS)
+    if desconocidas:
+        parser.error(f"consultas desconocidas: {', '.join(sorted(desconocidas))}")
+    for nombre in nombres:
+        fn = consultas.CONSULTAS[nombre]
+        kwargs = {"modo": args.modo} if args.modo and "modo" in inspect.signature(fn).parameters else {}
+        fn.__wrapped__(db, **kwargs)   # sin el cache de resultados
+        if args.explain:
+            examinar(db, nombre)
+
+    if args.formato == "json":
+        print(como_json())
+    elif args.formato == "prometheus":
+        print(prometheus(), end="")
+    else:
+        print(f"{'consulta':<34}{'ms':>9}{'red ms':>9}{'pandas ms':>11}{'cmds':>6}{'docs':>9}{'KB rec':>9}{'exam':>9}")
+        for nombre, fila in resumen().items():
+            if nombre == SIN_CONSULTA:
+                continue
+            examinados = "-" if fila["examinados"] is None else fila["examinados"]
+            print(f"{nombre:<34}{fila['total_s'] * 1000:>9.1f}{fila['red_s'] * 1000:>9.1f}"
+                  f"{fila['pandas_s'] * 1000:>11.1f}{fila['comandos']:>6}{fila['documentos']:>9}"
+                  f"{fila['kb_recibidos']:>9.1f}{examinados:>9}")
+    client.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
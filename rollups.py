@@ -0,0 +1,218 @@
+import sys
+import time
+import argparse
+from pymongo import MongoClient, UpdateOne, DeleteOne, ReplaceOne
+from pymongo.errors import OperationFailure
+from conexion import MONGO_URI, MONGO_DBNAME
+
+# colecciones resumen para que las consultas lean O(grupos) en vez de O(documentos).
+#
+#   resumen_libros : un documento por (genero, idioma, anio) con los contadores de abajo
+#   _rollup_libros : lo que aporta cada libro a su grupo; permite aplicar solo la diferencia
+#                    cuando cambia un libro o una de sus nominaciones
+#
+# Se mantienen con un change stream (python rollups.py seguir) o llamando a refrescar_libros()
+# despues de escribir. python rollups.py reconstruir los arma de cero con $merge.
+
+RESUMEN = "resumen_libros"
+APORTES = "_rollup_libros"
+
+# contadores por grupo. "libros_*" cuentan cada libro una vez (como las consultas actuales),
+# "nominaciones", "premios_ganados" y "*_x_nominacion" cuentan cada nominacion.
+METRICAS = (
+    "libros", "suma_anios", "n_anios",
+    "libros_nominados", "suma_anios_nominados", "n_anios_nominados",
+    "libros_ganadores", "nominaciones", "premios_ganados",
+    "suma_anios_x_nominacion", "n_anios_x_nominacion",
+)
+
+_VACIOS = [None, 0, False, ""]
+
+# --> APORTE DE UN LIBRO <--
+
+def _a_numero(valor):
+    # mismo criterio que $convert a double con onError null
+    if isinstance(valor, bool):
+        return float(valor)
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str) and valor == valor.strip():
+        try:
+            return float(valor)
+        except ValueError:
+            return None
+    return None
+
+def aporte(libro, nominaciones, ganadas):
+    anio = _a_numero(libro.get("anio_publicacion"))
+    if libro.get("_id") in _VACIOS:
+        nominaciones = ganadas = 0   # las consultas descartan nominaciones a libros "falsy"
+    nominado = nominaciones > 0
+    clave = {"genero": libro.get("genero"), "idioma": libro.get("idioma"), "anio": anio}
+    return clave, {
+        "libros": 1,
+        "suma_anios": anio or 0.0,
+        "n_anios": int(anio is not None),
+        "libros_nominados": int(nominado),
+        "suma_anios_nominados": (anio or 0.0) if nominado else 0.0,
+        "n_anios_nominados": int(nominado and anio is not None),
+        "libros_ganadores": int(ganadas > 0),
+        "nominaciones": nominaciones,
+        "premios_ganados": ganadas,
+        "suma_anios_x_nominacion": (anio or 0.0) * nominaciones,
+        "n_anios_x_nominacion": nominaciones if anio is not None else 0,
+    }
+
+# --> RECONSTRUCCION COMPLETA <--
+
+def _pipeline_aportes(generacion):
+    anio = {"$convert": {"input": "$anio_publicacion", "to": "double", "onError": None, "onNull": None}}
+    nominado = {"$gt": ["$n", 0]}
+    return [
+        {"$lookup": {
+            "from": "nominaciones", "localField": "_id", "foreignField": "libro", "as": "noms",
+            "pipeline": [{"$group": {"_id": None, "n": {"$sum": 1},
+                                     "g": {"$sum": {"$cond": [{"$eq": ["$ganador", True]}, 1, 0]}}}}],
+        }},
+        {"$set": {
+            "anio": anio,
+            "n": {"$cond": [{"$in": ["$_id", _VACIOS]}, 0, {"$ifNull": [{"$first": "$noms.n"}, 0]}]},
+            "g": {"$cond": [{"$in": ["$_id", _VACIOS]}, 0, {"$ifNull": [{"$first": "$noms.g"}, 0]}]},
+        }},
+        {"$project": {
+            "clave": {"genero": {"$ifNull": ["$genero", None]}, "idioma": {"$ifNull": ["$idioma", None]},
+                      "anio": "$anio"},
+            "aporte": {
+                "libros": {"$literal": 1},
+                "suma_anios": {"$ifNull": ["$anio", 0.0]},
+                "n_anios": {"$cond": [{"$eq": ["$anio", None]}, 0, 1]},
+                "libros_nominados": {"$cond": [nominado, 1, 0]},
+                "suma_anios_nominados": {"$cond": [nominado, {"$ifNull": ["$anio", 0.0]}, 0.0]},
+                "n_anios_nominados": {"$cond": [{"$and": [nominado, {"$ne": ["$anio", None]}]}, 1, 0]},
+                "libros_ganadores": {"$cond": [{"$gt": ["$g", 0]}, 1, 0]},
+                "nominaciones": "$n",
+                "premios_ganados": "$g",
+                "suma_anios_x_nominacion": {"$multiply": [{"$ifNull": ["$anio", 0.0]}, "$n"]},
+                "n_anios_x_nominacion": {"$cond": [{"$eq": ["$anio", None]}, 0, "$n"]},
+            },
+            "generacion": {"$literal": generacion},
+        }},
+        {"$merge": {"into": APORTES, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+def reconstruir(db):
+    generacion = time.time_ns()
+    db["libros"].aggregate(_pipeline_aportes(generacion))
+    db[APORTES].delete_many({"generacion": {"$ne": generacion}})
+
+    grupo = {"_id": "$clave"} | {m: {"$sum": f"$aporte.{m}"} for m in METRICAS}
+    db[APORTES].aggregate([
+        {"$group": grupo},
+        {"$set": {"generacion": generacion}},
+        {"$merge": {"into": RESUMEN, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+    db[RESUMEN].delete_many({"generacion": {"$ne": generacion}})
+    db[RESUMEN].create_index([("_id.genero", 1), ("_id.idioma", 1)], name="genero_idioma")
+
+# --> MANTENIMIENTO INCREMENTAL <--
+
+# cuenta las nominaciones de un libro (usa el indice nominaciones.libro de indices.py)
+def _estado_actual(db, libro_id):
+    libro = db["libros"].find_one({"_id": libro_id})
+    if libro is None:
+        return None
+    stats = next(db["nominaciones"].aggregate([
+        {"$match": {"libro": libro_id}},
+        {"$group": {"_id": None, "n": {"$sum": 1},
+                    "g": {"$sum": {"$cond": [{"$eq": ["$ganador", True]}, 1, 0]}}}},
+    ]), {"n": 0, "g": 0})
+    return aporte(libro, stats["n"], stats["g"])
+
+# recalcula lo que aporta cada libro y aplica solo la diferencia al resumen.
+# Llamarla despues de insertar/modificar/borrar libros o nominaciones (con los ids de libro afectados).
+def refrescar_libros(db, libro_ids):
+    ops_resumen, ops_aportes, tocados = [], [], []
+    for libro_id in set(libro_ids):
+        nuevo = _estado_actual(db, libro_id)
+        viejo = db[APORTES].find_one({"_id": libro_id})
+        if viejo is not None and nuevo is not None and viejo["clave"] == nuevo[0] and viejo["aporte"] == nuevo[1]:
+            continue
+        if viejo is not None:
+            ops_resumen.append(UpdateOne({"_id": viejo["clave"]},
+                                         {"$inc": {m: -viejo["aporte"].get(m, 0) for m in METRICAS}}))
+            tocados.append(viejo["clave"])
+        if nuevo is not None:
+            clave, valores = nuevo
+            ops_resumen.append(UpdateOne({"_id": clave}, {"$inc": valores}, upsert=True))
+            ops_aportes.append(ReplaceOne({"_id": libro_id}, {"_id": libro_id, "clave": clave, "aporte": valores},
+                                          upsert=True))
+        else:
+            ops_aportes.append(DeleteOne({"_id": libro_id}))
+
+    if ops_resumen:
+        db[RESUMEN].bulk_write(ops_resumen, ordered=True)
+        # grupos que quedaron sin libros
+        db[RESUMEN].delete_many({"_id": {"$in": tocados}, "libros": {"$lte": 0}})
+    if ops_aportes:
+        db[APORTES].bulk_write(ops_aportes, ordered=False)
+    return len(ops_aportes)
+
+def _libros_del_cambio(cambio):
+    # ids de libro afectados por un evento; None si no se pueden saber (hay que reconstruir)
+    coleccion = cambio["ns"]["coll"]
+    if coleccion == "libros":
+        return {cambio["documentKey"]["_id"]}
+
+    antes = cambio.get("fullDocumentBeforeChange")
+    despues = cambio.get("fullDocument")
+    ids = {doc.get("libro") for doc in (antes, despues) if doc}
+    if cambio["operationType"] == "delete" and antes is None:
+        return None
+    if cambio["operationType"] in ("update", "replace") and antes is None:
+        campos = cambio.get("updateDescription", {}).get("updatedFields", {})
+        if cambio["operationType"] == "replace" or "libro" in campos:
+            return None   # cambio el libro de la nominacion y no se sabe cual era
+    return ids
+
+# sigue los cambios de libros/nominaciones y mantiene el resumen al dia.
+# Para borrados de nominaciones conviene tener changeStreamPreAndPostImages en la coleccion;
+# sin la imagen previa no se sabe a que libro restarle y se reconstruye todo.
+def seguir(db):
+    filtro = [{"$match": {"ns.coll": {"$in": ["libros", "nominaciones"]},
+                          "operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    with db.watch(filtro, full_document="updateLookup", full_document_before_change="whenAvailable") as stream:
+        print("Siguiendo cambios de libros y nominaciones...")
+        for cambio in stream:
+            ids = _libros_del_cambio(cambio)
+            if ids is None:
+                print("  cambio sin imagen previa, reconstruyendo resumen")
+                reconstruir(db)
+            else:
+                refrescar_libros(db, [i for i in ids if i is not None])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Colecciones resumen de libros/nominaciones")
+    parser.add_argument("comando", choices=("reconstruir", "seguir"))
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.uri)[args.db]
+    if args.comando == "reconstruir":
+        inicio = time.perf_counter()
+        reconstruir(db)
+        print(f"{RESUMEN}: {db[RESUMEN].estimated_document_count()} grupos "
+              f"({time.perf_counter() - inicio:.2f}s)")
+        return 0
+
+    reconstruir(db)
+    try:
+        seguir(db)
+    except OperationFailure as e:
+        print(f"No se pueden usar change streams ({e}). Hace falta un replica set; "
+              f"si no, llamar a rollups.refrescar_libros() despues de cada escritura.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+import pandas as pd
+import cache
+from instrumentacion import etapa
+
+# semijoin nominaciones -> libros para los caminos pandas.
+#
+# Primero se agrupan las nominaciones por libro en el servidor (un documento por libro con
+# la cantidad de nominaciones), asi lo que viaja no crece con las nominaciones repetidas.
+# Despues se traen los campos del libro con una de tres estrategias:
+#   "in"     -> find con $in de a TAM_IN ids sin repetir (usa el indice de _id)
+#   "lookup" -> todo en el servidor con $lookup; el cliente solo recibe el resultado
+#   "hash"   -> se cruza contra una proyeccion de libros que se guarda en memoria
+# La columna "nominaciones" trae el peso de cada libro, para contar por nominacion.
+
+ESTRATEGIAS = ("in", "lookup", "hash")
+CONTAR = ("libro", "nominacion")
+
+SEMIJOIN = os.getenv("SEMIJOIN") or None                       # fuerza una estrategia
+TAM_IN = int(os.getenv("SEMIJOIN_TAM_IN", "50000"))            # ids por $in
+HASH_MAX_LIBROS = int(os.getenv("SEMIJOIN_HASH_MAX", "500000"))  # libros que se aceptan en memoria
+
+_VACIOS = [None, 0, False, ""]
+
+_proyecciones = {}   # (db, campos) -> (version, vence, DataFrame indexado por _id)
+_lock = threading.Lock()
+
+# --> PLAN <--
+
+# elige la estrategia con los tamaños estimados de las colecciones (metadata, sin recorrerlas)
+def elegir(_db, estrategia=None):
+    estrategia = estrategia or SEMIJOIN
+    if estrategia:
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estrategia de semijoin desconocida: {estrategia} (opciones: {', '.join(ESTRATEGIAS)})")
+        return estrategia
+
+    n_libros = _db["libros"].estimated_document_count()
+    n_nominaciones = _db["nominaciones"].estimated_document_count()
+    if n_libros <= HASH_MAX_LIBROS and n_nominaciones * 10 >= n_libros:
+        return "hash"      # la proyeccion entra en memoria y se reusa entre consultas
+    if n_nominaciones <= TAM_IN:
+        return "in"        # pocos libros nominados: busquedas puntuales por _id
+    return "lookup"
+
+def validar_contar(contar):
+    if contar not in CONTAR:
+        raise ValueError(f"Forma de contar desconocida: {contar} (opciones: {', '.join(CONTAR)})")
+    return contar
+
+# --> ESTRATEGIAS <--
+
+def _nominados(filtro):
+    # (libro, nominaciones) por libro nominado, sin ids "falsy" como el filtro del camino pandas
+    return [
+        {"$match": filtro},
+        {"$group": {"_id": "$libro", "nominaciones": {"$sum": 1}}},
+        {"$match": {"_id": {"$nin": _VACIOS}}},
+    ]
+
+def _con_in(_db, filtro, campos):
+    por_libro = pd.DataFrame(list(_db["nominaciones"].aggregate(_nominados(filtro))),
+                         columns=["_id", "nominaciones"])
+    ids = por_libro["_id"].tolist()
+    partes = []
+    for i in range(0, len(ids), TAM_IN):
+        docs = _db["libros"].find({"_id": {"$in": ids[i:i + TAM_IN]}}, dict.fromkeys(campos, 1))
+        partes.append(pd.DataFrame(list(docs), columns=["_id", *campos]))
+    libros = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=["_id", *campos])
+    with etapa("merge"):
+        return libros.merge(por_libro, on="_id", how="inner")
+
+def _con_lookup(_db, filtro, campos):
+    pipeline = _nominados(filtro) + [
+        {"$lookup": {"from": "libros", "localField": "_id", "foreignField": "_id", "as": "libro"}},
+        {"$unwind": "$libro"},
+        {"$project": {"_id": 1, "nominaciones": 1} | {c: f"$libro.{c}" for c in campos}},
+    ]
+    return pd.DataFrame(list(_db["nominaciones"].aggregate(pipeline)), columns=["_id", *campos, "nominaciones"])
+
+def proyeccion(_db, campos):
+    # libros[_id, campos] en memoria; se vuelve a leer si cambia libros o vence el TTL del cache
+    clave = (_db.name, tuple(campos))
+    version = cache.version(_db.name, "libros")
+    with _lock:
+        guardada = _proyecciones.get(clave)
+    if guardada and guardada[0] == version and guardada[1] > time.monotonic():
+        return guardada[2]
+
+    docs = _db["libros"].find({}, dict.fromkeys(campos, 1))
+    tabla = pd.DataFrame(list(docs), columns=["_id", *campos]).set_index("_id")
+    with _lock:
+        _proyecciones[clave] = (version, time.monotonic() + max(cache.CACHE_TTL, 0), tabla)
+    return tabla
+
+def _con_hash(_db, filtro, campos):
+    por_libro = pd.DataFrame(list(_db["nominaciones"].aggregate(_nominados(filtro))),
+                         columns=["_id", "nominaciones"])
+    tabla = proyeccion(_db, campos)
+    with etapa("merge"):
+        return tabla.join(por_libro.set_index("_id"), how="inner").reset_index()
+
+_ESTRATEGIAS = {"in": _con_in, "lookup": _con_lookup, "hash": _con_hash}
+
+# libros con al menos una nominacion que cumpla el filtro: columnas _id, campos y nominaciones
+def libros_nominados(_db, filtro, campos, estrategia=None):
+    df = _ESTRATEGIAS[elegir(_db, estrategia)](_db, filtro, list(campos))
+    return df[["_id", *campos, "nominaciones"]]
+
+# cuanto pesa cada libro segun la forma de contar
+def pesos(df, contar="libro"):
+    return df["nominaciones"] if validar_contar(contar) == "nominacion" else pd.Series(1, index=df.index)
+
+def olvidar(_db=None):
+    with _lock:
+        if _db is None:
+            _proyecciones.clear()
+        else:
+            for clave in [k for k in _proyecciones if k[0] == _db.name]:
+                del _proyecciones[clave]
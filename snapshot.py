@@ -0,0 +1,460 @@
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import consultas
+import filtros
+import semijoin
+
+# snapshot columnar para contestar las consultas sin mongod (demos, CI, replicas de lectura).
+#
+# `python snapshot.py crear` convierte la base, Libros_Grupo8.json o los exports DB/ a una
+# carpeta de archivos Arrow IPC sin comprimir; al abrirla se mapean en memoria (mmap), no se
+# vuelve a parsear json. Las claves foraneas (genero, idioma, formato, libro, premio) se
+# guardan con diccionario: cada valor es un indice int32 a las claves de su dimension, asi
+# contar es un np.bincount y etiquetar es indexar un arreglo de nombres.
+#
+# CONSULTAS tiene la misma interfaz que consultas.CONSULTAS (mismos nombres, parametros y
+# DataFrames) con snap en lugar de _db. `python snapshot.py verificar` compara contra Mongo.
+
+FORMATO = 1
+DIMENSIONES = ("generos", "idiomas", "formatos", "autores", "premios")
+
+# columna -> dimension de la que sale su diccionario
+_CLAVES_LIBROS = {"genero": "generos", "idioma": "idiomas", "formato": "formatos"}
+_LISTAS_LIBROS = {"autores": "autores", "premios": "premios"}
+_CLAVES_NOMINACIONES = {"libro": "libros", "premio": "premios"}
+
+# --> CREACION <--
+
+def _hashable(valor):
+    if isinstance(valor, list):
+        return tuple(_hashable(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in valor.items()))
+    return valor
+
+class _Diccionario:
+    # claves de una dimension en orden de aparicion -> codigo int32
+    def __init__(self):
+        self.posiciones = {}
+        self.claves = []
+        self.nombres = []
+
+    def codigo(self, valor, vacios=True):
+        # None para los valores "falsy" (los caminos pandas los descartan con el `if x.get(...)`)
+        if vacios and not valor:
+            return None
+        clave = _hashable(valor)
+        posicion = self.posiciones.get(clave)
+        if posicion is None:
+            posicion = self.posiciones[clave] = len(self.claves)
+            self.claves.append(clave)
+            self.nombres.append(None)
+        return posicion
+
+    def nombrar(self, valor, nombre):
+        # ids repetidos: queda el primer nombre, como dimensiones.py
+        posicion = self.codigo(valor, vacios=False)
+        if self.nombres[posicion] is None:
+            self.nombres[posicion] = nombre
+
+    def valores(self):
+        if all(isinstance(c, int) and not isinstance(c, bool) for c in self.claves):
+            return pa.array(self.claves, type=pa.int64())
+        return pa.array([str(c) for c in self.claves], type=pa.string())
+
+    def columna(self, codigos):
+        return pa.DictionaryArray.from_arrays(pa.array(codigos, type=pa.int32()), self.valores())
+
+def _documentos(origen, uri=None, db_nombre=None):
+    # (coleccion, documento) desde la base o desde archivos json
+    if origen is None:
+        from pymongo import MongoClient
+        client = MongoClient(uri)
+        try:
+            db = client[db_nombre]
+            for coleccion in (*DIMENSIONES, "libros", "nominaciones"):
+                for doc in db[coleccion].find({}):
+                    yield coleccion, doc
+        finally:
+            client.close()
+        return
+
+    from importar_datos_mongo import expandir_rutas, leer_documentos
+    for ruta in expandir_rutas([origen]):
+        with open(ruta, "rb") as archivo:
+            yield from leer_documentos(archivo, ruta)
+
+def _escribir(ruta, tabla):
+    with pa.OSFile(ruta, "wb") as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+def crear(carpeta, origen=None, uri=None, db_nombre=None):
+    dims = {nombre: [] for nombre in DIMENSIONES}
+    libros, nominaciones = [], []
+    for coleccion, doc in _documentos(origen, uri, db_nombre):
+        if coleccion in dims:
+            dims[coleccion].append((doc.get("_id"), doc.get("nombre")))
+        elif coleccion == "libros":
+            libros.append(doc)
+        elif coleccion == "nominaciones":
+            nominaciones.append(doc)
+
+    diccionarios = {nombre: _Diccionario() for nombre in (*DIMENSIONES, "libros")}
+    for nombre, docs in dims.items():
+        for _id, nombre_dim in docs:
+            diccionarios[nombre].nombrar(_id, nombre_dim)
+    # los libros ocupan los codigos 0..n-1 en orden de fila
+    codigos_libros = [diccionarios["libros"].codigo(doc.get("_id"), vacios=False) for doc in libros]
+
+    anios = [doc.get("anio_publicacion") for doc in libros]
+    columnas = {
+        "_id": codigos_libros,
+        "anio_publicacion": pd.to_numeric(pd.Series(anios, dtype=object), errors="coerce").to_numpy(dtype=np.float64),
+        "anio_vacio": [not v for v in anios],
+        # solo los numeros entran en un rango ($gte/$lte no compara con strings)
+        "anio_numerico": [isinstance(v, (int, float)) and not isinstance(v, bool) for v in anios],
+    }
+    campos = [("_id", pa.int32()), ("anio_publicacion", pa.float64()), ("anio_vacio", pa.bool_()),
+              ("anio_numerico", pa.bool_())]
+    arreglos = [pa.array(columnas[c], type=t) for c, t in campos]
+    nombres = [c for c, _ in campos]
+    for campo, dimension in _CLAVES_LIBROS.items():
+        arreglos.append(diccionarios[dimension].columna([diccionarios[dimension].codigo(doc.get(campo)) for doc in libros]))
+        nombres.append(campo)
+    for campo, dimension in _LISTAS_LIBROS.items():
+        listas = [[diccionarios[dimension].codigo(v, vacios=False) for v in doc.get(campo) or []]
+                  if isinstance(doc.get(campo), list) else [] for doc in libros]
+        arreglos.append(pa.array(listas, type=pa.list_(pa.int32())))
+        nombres.append(campo)
+    tabla_libros = pa.table(arreglos, names=nombres)
+
+    arreglos = [pa.array([doc.get("ganador") is True for doc in nominaciones], type=pa.bool_())]
+    nombres = ["ganador"]
+    for campo, dimension in _CLAVES_NOMINACIONES.items():
+        arreglos.append(diccionarios[dimension].columna([diccionarios[dimension].codigo(doc.get(campo)) for doc in nominaciones]))
+        nombres.append(campo)
+    tabla_nominaciones = pa.table(arreglos, names=nombres)
+
+    os.makedirs(carpeta, exist_ok=True)
+    _escribir(os.path.join(carpeta, "libros.arrow"), tabla_libros)
+    _escribir(os.path.join(carpeta, "nominaciones.arrow"), tabla_nominaciones)
+    for nombre in (*DIMENSIONES, "libros"):
+        dic = diccionarios[nombre]
+        tabla = pa.table({"_id": dic.valores(), "nombre": pa.array(dic.nombres, type=pa.string())})
+        _escribir(os.path.join(carpeta, f"claves_{nombre}.arrow"), tabla)
+
+    meta = {
+        "formato": FORMATO,
+        "origen": origen or f"{uri} {db_nombre}",
+        "creado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "documentos": {"libros": len(libros), "nominaciones": len(nominaciones)} | {n: len(d) for n, d in dims.items()},
+    }
+    with open(os.path.join(carpeta, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return meta
+
+# --> LECTURA (MMAP) <--
+
+class Snapshot:
+    def __init__(self, carpeta):
+        with open(os.path.join(carpeta, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("formato") != FORMATO:
+            raise ValueError(f"Snapshot con formato {self.meta.get('formato')} (se espera {FORMATO}): volver a crearlo")
+        self.carpeta = carpeta
+        self.name = f"snapshot:{os.path.abspath(carpeta)}"
+        self._tablas = {}
+        self._cache = {}
+
+    def tabla(self, nombre):
+        tabla = self._tablas.get(nombre)
+        if tabla is None:
+            # read_all sobre el mapa no copia: los buffers apuntan al archivo
+            fuente = pa.memory_map(os.path.join(self.carpeta, f"{nombre}.arrow"))
+            tabla = self._tablas[nombre] = pa.ipc.open_file(fuente).read_all()
+        return tabla
+
+    def _memo(self, clave, calcular):
+        valor = self._cache.get(clave)
+        if valor is None:
+            valor = self._cache[clave] = calcular()
+        return valor
+
+    # codigos int32 de una columna con diccionario, -1 donde el valor era "falsy"
+    def codigos(self, tabla, columna):
+        def calcular():
+            arr = self.tabla(tabla).column(columna).combine_chunks()
+            return arr.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return self._memo(("codigos", tabla, columna), calcular)
+
+    def columna(self, tabla, columna):
+        return self._memo(("columna", tabla, columna),
+                          lambda: self.tabla(tabla).column(columna).to_numpy())
+
+    # nombre por codigo (None si la clave no esta en la dimension) y orden de las claves (para desempatar por _id)
+    def nombres(self, dimension):
+        return self._memo(("nombres", dimension),
+                          lambda: np.array(self.tabla(f"claves_{dimension}").column("nombre").to_pylist(), dtype=object))
+
+    def orden(self, dimension):
+        return self._memo(("orden", dimension),
+                          lambda: np.argsort(np.argsort(self.tabla(f"claves_{dimension}").column("_id").to_numpy(zero_copy_only=False),
+                                                        kind="stable"), kind="stable"))
+
+    def nombres_por_id(self, dimension):
+        claves = self.tabla(f"claves_{dimension}").column("_id").to_pylist()
+        return {c: n for c, n in zip(claves, self.nombres(dimension)) if n is not None}
+
+    # codigos de todos los documentos con ese nombre (como dimensiones.ids_de), o [] si no esta
+    def codigos_de(self, dimension, nombre):
+        def calcular():
+            por_nombre = {}
+            for codigo, n in enumerate(self.nombres(dimension)):
+                if n is not None:
+                    por_nombre.setdefault(n, []).append(codigo)
+            return por_nombre
+        return list(self._memo(("por_nombre", dimension), calcular).get(nombre, ()))
+
+    # nominaciones por libro (codigo de fila), contando solo libros que existen y con id no "falsy"
+    def nominaciones_por_libro(self, ganador=False):
+        def calcular():
+            libros = self.codigos("nominaciones", "libro")
+            if ganador:
+                libros = libros[self.columna("nominaciones", "ganador")]
+            n_libros = self.tabla("libros").num_rows
+            libros = libros[(libros >= 0) & (libros < n_libros)]
+            return np.bincount(libros, minlength=n_libros)[:n_libros]
+        return self._memo(("nominaciones_por_libro", ganador), calcular)
+
+# uno por carpeta y proceso: los arreglos ya decodificados se reusan entre reruns de streamlit
+@functools.lru_cache(maxsize=None)
+def abrir(carpeta):
+    return Snapshot(carpeta)
+
+# --> CONSULTAS VECTORIZADAS <--
+
+# suma por codigo, etiquetada y ordenada como los caminos pandas (total desc, desempata el _id)
+def _por_dimension(snap, dimension, codigos, col_nombre, col_total, pesos=None, limite=None):
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    n = len(snap.nombres(dimension))
+    presentes = np.bincount(codigos, minlength=n) > 0
+    totales = np.bincount(codigos, weights=None if pesos is None else pesos[validos], minlength=n)
+    nombres = snap.nombres(dimension)
+    elegidos = np.flatnonzero(presentes & np.array([x is not None for x in nombres], dtype=bool))
+    elegidos = elegidos[np.lexsort((snap.orden(dimension)[elegidos], -totales[elegidos]))]
+    if limite:
+        elegidos = elegidos[:limite]
+    return pd.DataFrame({col_nombre: nombres[elegidos], col_total: totales[elegidos].astype(np.int64)},
+                        columns=[col_nombre, col_total])
+
+def _nominados_por(snap, campo, dimension, col_nombre, col_total, ganador=False, contar="libro", limite=None):
+    por_libro = snap.nominaciones_por_libro(ganador)
+    nominados = por_libro > 0
+    pesos = por_libro[nominados] if semijoin.validar_contar(contar) == "nominacion" else None
+    codigos = snap.codigos("libros", campo)[nominados]
+    return _por_dimension(snap, dimension, codigos, col_nombre, col_total, pesos, limite)
+
+def consulta_1_promedio_nominados(snap, modo=None, contar="libro"):
+    por_libro = snap.nominaciones_por_libro()
+    nominados = por_libro > 0
+    anios = snap.columna("libros", "anio_publicacion")[nominados]
+    pesos = (por_libro[nominados] if semijoin.validar_contar(contar) == "nominacion"
+             else np.ones(int(nominados.sum()), dtype=np.int64))[~np.isnan(anios)]
+    anios = anios[~np.isnan(anios)]
+    promedio = (anios * pesos).sum() / pesos.sum() if pesos.sum() else float('nan')
+    return pd.DataFrame({'promedio_anio': [promedio]})
+
+def consulta_2_genero_mas_ganador(snap, modo=None):
+    return _nominados_por(snap, "genero", "generos", "nombre_genero", "total_premios", ganador=True, limite=1)
+
+def consulta_3_idioma_mas_ganador(snap, modo=None):
+    return _nominados_por(snap, "idioma", "idiomas", "nombre_idioma", "total_premios", ganador=True, limite=1)
+
+def consulta_4_idioma_mas_nominado(snap, modo=None, contar="libro"):
+    return _nominados_por(snap, "idioma", "idiomas", "nombre_idioma", "total_nominaciones", contar=contar, limite=1)
+
+def consulta_5_promedio_cf_es(snap, modo=None):
+    resumen = resumen_filtro(snap, consultas.FILTRO_DISTOPIA_ES, desgloses=())
+    return pd.DataFrame({'promedio_anio': [resumen["promedio_anio"]]})
+
+def consulta_6_contar_misterio(snap, modo=None):
+    resumen = resumen_filtro(snap, consultas.FILTRO_MISTERIO, desgloses=())
+    return pd.DataFrame({'total_libros_misterio': [resumen["cantidad"]]})
+
+def consulta_7_contar_Distopia_es(snap, modo=None):
+    resumen = resumen_filtro(snap, consultas.FILTRO_DISTOPIA_ES, desgloses=())
+    return pd.DataFrame({'total_libros_Distopia_espanol': [resumen["cantidad"]]})
+
+def libros_por_genero(snap, modo=None):
+    return _por_dimension(snap, "generos", snap.codigos("libros", "genero"), "nombre_genero", "count")
+
+def libros_por_lenguaje(snap, modo=None):
+    return _por_dimension(snap, "idiomas", snap.codigos("libros", "idioma"), "nombre_idioma", "count")
+
+def libros_por_anio(snap, modo=None):
+    anios = snap.columna("libros", "anio_publicacion")[~snap.columna("libros", "anio_vacio")]
+    anios = anios[~np.isnan(anios)].astype(np.int64)
+    if not len(anios): return pd.DataFrame({'year': [], 'count': []})
+    years, counts = np.unique(anios, return_counts=True)
+    return pd.DataFrame({'year': years, 'count': counts})
+
+def premios_ganados_por_genero(snap, modo=None):
+    return _nominados_por(snap, "genero", "generos", "nombre_genero", "awards_won", ganador=True)
+
+def distribuciones(snap, modo=None, max_anios=consultas.MAX_ANIOS_GRAFICO):
+    return {
+        "libros_por_genero": libros_por_genero(snap),
+        "libros_por_lenguaje": libros_por_lenguaje(snap),
+        "libros_por_anio": consultas.intervalos_anios(libros_por_anio(snap), max_anios),
+        "premios_ganados_por_genero": premios_ganados_por_genero(snap),
+    }
+
+def _mascara(snap, filtro):
+    n = snap.tabla("libros").num_rows
+    mascara = np.ones(n, dtype=bool)
+    for campo, (columna, dimension) in filtros.CAMPOS.items():
+        nombres = getattr(filtro, campo)
+        if not nombres:
+            continue
+        buscados = [c for nombre in nombres for c in snap.codigos_de(dimension, nombre)]
+        if columna in _LISTAS_LIBROS:
+            listas = snap.tabla("libros").column(columna).combine_chunks()
+            valores = listas.flatten().to_numpy(zero_copy_only=False)
+            padres = pc.list_parent_indices(listas).to_numpy(zero_copy_only=False)
+            con_alguno = np.zeros(n, dtype=bool)
+            con_alguno[padres[np.isin(valores, buscados)]] = True
+            mascara &= con_alguno
+        else:
+            mascara &= np.isin(snap.codigos("libros", columna), buscados)
+    if filtro.anio_desde is not None or filtro.anio_hasta is not None:
+        anios = snap.columna("libros", "anio_publicacion")
+        mascara &= snap.columna("libros", "anio_numerico")
+        if filtro.anio_desde is not None:
+            mascara &= anios >= filtro.anio_desde
+        if filtro.anio_hasta is not None:
+            mascara &= anios <= filtro.anio_hasta
+    if filtro.premio is not None:
+        nominados = snap.nominaciones_por_libro(ganador=filtro.premio == "ganador") > 0
+        mascara &= ~nominados if filtro.premio == "sin_nominar" else nominados
+    return mascara
+
+def resumen_filtro(snap, filtro, modo=None, desgloses=("genero", "idioma", "anio")):
+    mascara = _mascara(snap, filtro)
+    anios = snap.columna("libros", "anio_publicacion")[mascara]
+    con_anio = anios[~np.isnan(anios)]
+    resumen = filtros.Resumen(
+        cantidad=int(mascara.sum()),
+        promedio_anio=float(con_anio.mean()) if len(con_anio) else float("nan"),
+        anio_min=float(con_anio.min()) if len(con_anio) else float("nan"),
+        anio_max=float(con_anio.max()) if len(con_anio) else float("nan"),
+    )
+    for nombre in desgloses:
+        campo, dimension, columna = filtros.DESGLOSES[nombre]
+        if dimension is None:
+            anios_validos = con_anio[con_anio != 0]
+            years, counts = np.unique(anios_validos.astype(np.int64), return_counts=True)
+            resumen[nombre] = pd.DataFrame({columna: years, "cantidad": counts})
+        else:
+            df = _por_dimension(snap, dimension, snap.codigos("libros", campo)[mascara], columna, "cantidad")
+            resumen[nombre] = df
+    return resumen
+
+CONSULTAS = {fn.__name__: fn for fn in (
+    consulta_1_promedio_nominados,
+    consulta_2_genero_mas_ganador,
+    consulta_3_idioma_mas_ganador,
+    consulta_4_idioma_mas_nominado,
+    consulta_5_promedio_cf_es,
+    consulta_6_contar_misterio,
+    consulta_7_contar_Distopia_es,
+    libros_por_genero,
+    libros_por_lenguaje,
+    libros_por_anio,
+    premios_ganados_por_genero,
+)}
+
+# todo lo que la app puede pedir (main.py con SNAPSHOT)
+FUNCIONES = CONSULTAS | {fn.__name__: fn for fn in (distribuciones, resumen_filtro)}
+
+# --> VERIFICACION CONTRA MONGO <--
+
+def _iguales(a, b, tolerancia=1e-9):
+    a, b = a.reset_index(drop=True), b.reset_index(drop=True)
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for columna in a.columns:
+        x, y = a[columna].to_numpy(), b[columna].to_numpy()
+        if pd.api.types.is_numeric_dtype(a[columna]) and pd.api.types.is_numeric_dtype(b[columna]):
+            if not np.allclose(x.astype(float), y.astype(float), rtol=tolerancia, equal_nan=True):
+                return False
+        elif not all(u == v for u, v in zip(x, y)):
+            return False
+    return True
+
+def verificar(snap, db, modo=None):
+    import inspect
+    fallas = 0
+    for nombre, fn in consultas.CONSULTAS.items():
+        variantes = [{}]
+        if "contar" in inspect.signature(fn).parameters:
+            variantes.append({"contar": "nominacion"})
+        for kwargs in variantes:
+            inicio = time.perf_counter()
+            local = CONSULTAS[nombre](snap, **kwargs)
+            ms_snapshot = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            remoto = fn.__wrapped__(db, modo=modo, **kwargs)
+            ms_mongo = (time.perf_counter() - inicio) * 1000
+            ok = _iguales(local, remoto)
+            fallas += not ok
+            etiqueta = nombre + "".join(f" {k}={v}" for k, v in kwargs.items())
+            print(f"{'OK ' if ok else 'DIF'} {etiqueta:<48} snapshot {ms_snapshot:8.2f} ms  mongo {ms_mongo:8.2f} ms")
+            if not ok:
+                print(f"    snapshot: {local.to_dict('list')}\n    mongo:    {remoto.to_dict('list')}")
+    return fallas
+
+# --> CLI <--
+
+def main(argv=None):
+    from conexion import MONGO_URI, MONGO_DBNAME
+    parser = argparse.ArgumentParser(description="Snapshot columnar (Arrow, mmap) para consultar sin MongoDB")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    crear_p = sub.add_parser("crear", help="arma el snapshot desde la base o desde json")
+    crear_p.add_argument("--desde", help="Libros_Grupo8.json, un archivo DB/TpO_Libros.*.json o la carpeta DB/ "
+                                         "(por defecto lee la base)")
+    verif = sub.add_parser("verificar", help="compara cada consulta del snapshot contra Mongo")
+    verif.add_argument("--modo", choices=consultas.MODOS)
+    for p in (crear_p, verif):
+        p.add_argument("--carpeta", default="snapshot")
+        p.add_argument("--uri", default=MONGO_URI)
+        p.add_argument("--db", default=MONGO_DBNAME)
+    args = parser.parse_args(argv)
+
+    if args.comando == "crear":
+        inicio = time.perf_counter()
+        meta = crear(args.carpeta, args.desde, args.uri, args.db)
+        print(f"snapshot en {args.carpeta} ({time.perf_counter() - inicio:.2f}s): "
+              + ", ".join(f"{n} {c}" for n, c in meta["documentos"].items()))
+        return 0
+
+    from pymongo import MongoClient
+    client = MongoClient(args.uri)
+    try:
+        fallas = verificar(abrir(args.carpeta), client[args.db], args.modo)
+    finally:
+        client.close()
+    print("snapshot igual a Mongo" if not fallas else f"{fallas} consulta(s) distintas")
+    return 1 if fallas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import pytest
+import mongomock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import cache
+import columnar
+import rollups
+
+def _cargar(nombre):
+    base = mongomock.MongoClient()[nombre]
+    with open(os.path.join(RAIZ, "Libros_Grupo8.json"), encoding="utf-8") as f:
+        for coleccion, docs in json.load(f).items():
+            base[coleccion].insert_many(docs)
+    return base
+
+# pymongoarrow no sabe leer de mongomock: cada test usa el camino sin arrow (test_columnar lo cambia)
+@pytest.fixture(autouse=True)
+def sin_pymongoarrow(monkeypatch):
+    monkeypatch.setattr(columnar, "find_arrow_all", None)
+
+# los datos de ejemplo del repo (Libros_Grupo8.json) cargados en una base en memoria
+# (mongomock no tiene find_raw_batches: columnar.py lee documento por documento)
+@pytest.fixture(scope="session")
+def db():
+    base = _cargar("libros_semilla")
+    cache.limpiar()
+    return base
+
+# los mismos datos con la coleccion resumen para el modo rollup. mongomock no corre el $lookup con
+# pipeline de rollups.reconstruir: los grupos se suman aca con rollups.aporte, libro por libro
+@pytest.fixture(scope="session")
+def db_resumen(db):
+    base = _cargar("libros_resumen")
+    grupos = {}
+    for libro in base["libros"].find():
+        noms = list(base["nominaciones"].find({"libro": libro["_id"]}))
+        clave, valores = rollups.aporte(libro, len(noms), sum(n.get("ganador") is True for n in noms))
+        grupo = grupos.setdefault(tuple(clave.items()), {"_id": clave} | dict.fromkeys(rollups.METRICAS, 0))
+        for m in rollups.METRICAS:
+            grupo[m] += valores[m]
+    base[rollups.RESUMEN].insert_many(list(grupos.values()))
+    return base
@@ -0,0 +1,63 @@
+import json
+import random
+import numpy as np
+import pytest
+import mongomock
+import mongomock.aggregate
+from conftest import RAIZ
+import aproximado
+import generador_datos
+
+# --> INTERVALO <--
+
+@pytest.mark.parametrize("N, n", [(3000, 300), (50_000, 2000), (200, 150)])
+def test_intervalo_contiene_al_estimado_y_respeta_la_muestra(N, n):
+    for k in range(n + 1):
+        inferior, superior = aproximado.intervalo(k, n, N)
+        # hay al menos los k vistos y a lo sumo N menos los que no cumplen; el estimado queda adentro
+        assert k <= inferior <= round(k * N / n) <= superior <= N - (n - k)
+
+def test_intervalo_exacto_con_toda_la_coleccion():
+    assert aproximado.intervalo(37, 500, 500) == (37, 37)
+    assert aproximado.intervalo(0, 0, 500) == (0, 500)
+
+def test_intervalo_se_achica_con_la_muestra():
+    anchos = [np.subtract(*aproximado.intervalo(n // 10, n, 10_000)[::-1]) for n in (100, 400, 1600, 6400)]
+    assert anchos == sorted(anchos, reverse=True)
+
+# muestras sin reposicion simuladas: k ~ hipergeometrica(K cumplen de N, n sacados)
+@pytest.mark.parametrize("K", [30, 300, 1500])
+def test_intervalo_cobertura_nominal(K):
+    N, n, repeticiones = 3000, 300, 4000
+    rng = np.random.default_rng(K)
+    ks = rng.hypergeometric(K, N - K, n, size=repeticiones)
+    dentro = sum(inferior <= K <= superior for inferior, superior in (aproximado.intervalo(int(k), n, N) for k in ks))
+    assert dentro / repeticiones == pytest.approx(aproximado.CONFIANZA, abs=0.03)
+
+# --> SOBRE DATOS SINTETICOS <--
+
+@pytest.fixture(scope="module")
+def sintetico():
+    with open(f"{RAIZ}/Libros_Grupo8.json", encoding="utf-8") as f:
+        semilla = json.load(f)
+    base = mongomock.MongoClient()["aproximado_sintetico"]
+    for nombre in generador_datos.DIMENSIONES:
+        base[nombre].insert_many(semilla[nombre])
+    for libros, nominaciones in generador_datos.bloques(generador_datos.distribuciones(semilla), 2000, 7):
+        base["libros"].insert_many(libros)
+        base["nominaciones"].insert_many(nominaciones)
+    return base
+
+# las que no necesitan saber si el libro gano (mongomock no tiene $lookup con pipeline), con el
+# error relativo medio que se acepta: los años son muchos grupos chicos y ahi ronda 0.5
+@pytest.mark.parametrize("nombre, error_maximo", [("consulta_6_contar_misterio", 0.5), ("libros_por_genero", 0.5),
+                                                  ("libros_por_anio", 0.6)])
+def test_cobertura_sobre_datos_sinteticos(sintetico, monkeypatch, nombre, error_maximo):
+    # $sample de mongomock usa su propio random: con semilla fija el test no depende de la suerte
+    monkeypatch.setattr(mongomock.aggregate, "_random", random.Random(nombre))
+    N = sintetico["libros"].estimated_document_count()
+    completo = aproximado._estimar(sintetico, nombre, N + 1, aproximado.CONFIANZA)
+    dentro, casos, error = aproximado.cobertura(sintetico, nombre, completo, repeticiones=200, tamanio=200)
+    # margen para la variacion de la propia cobertura con pocas repeticiones, como verificar()
+    assert dentro / casos >= aproximado.CONFIANZA - 0.05
+    assert error < error_maximo
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+import bson
+import mongomock
+import columnar
+from conexion import MONGO_URI
+
+# ids de otros tipos, numeros como texto, vacios y un double mezclados con enteros
+OID = ObjectId("0123456789abcdef01234567")
+MEZCLADOS = [{"v": 3}, {"v": 1}, {"v": None}, {}, {"v": 0}, {"v": OID}, {"v": "2001"}, {"v": ""}, {"v": 3}]
+ENTEROS = [{"v": 3}, {"v": 1}, {"v": None}, {}, {"v": 0}, {"v": 3}]
+# lotes de un solo tipo de tamaño fijo (los que se leen directo de los bytes)
+DOUBLES = [{"v": 1.5}, {"v": 0.0}, {"v": 2001.0}, {"v": float("nan")}, {"v": 3.0}]
+GRANDES = [{"v": 2 ** 40}, {"v": 0}, {"v": -5}, {"v": 2 ** 40}]
+
+def _serie(arr):
+    return pd.Series(list(arr), dtype=arr.dtype)
+
+def _mongomock(docs):
+    coll = mongomock.MongoClient()["columnar"][f"datos_{id(docs)}"]
+    coll.insert_many([dict(d) for d in docs])
+    return coll
+
+# coleccion de mongomock con find_raw_batches: los lotes son los documentos proyectados en bson,
+# como los manda mongod
+class _Crudos:
+    def __init__(self, docs):
+        self.coll = _mongomock(docs)
+        self.codec_options = bson.codec_options.DEFAULT_CODEC_OPTIONS
+
+    def find(self, *args, **kwargs):
+        return self.coll.find(*args, **kwargs)
+
+    def find_raw_batches(self, filtro, proyeccion, batch_size):
+        docs = list(self.coll.find(filtro, proyeccion))
+        return _Lotes([b"".join(bson.encode(d) for d in docs[i:i + batch_size])
+                       for i in range(0, len(docs), batch_size)])
+
+class _Lotes(list):
+    def close(self):
+        pass
+
+def _leer(coll):
+    return (columnar.ids(coll, {}, "v"), columnar.numeros(coll, {}, "v"),
+            columnar.numeros(coll, {}, "v", vacios=True))
+
+def test_python_mezclados(monkeypatch):
+    monkeypatch.setattr(columnar, "find_arrow_all", None)
+    coll = _mongomock(MEZCLADOS)
+
+    assert columnar.ids(coll, {}, "v").tolist() == [3, 1, OID, "2001", 3]
+    np.testing.assert_array_equal(columnar.numeros(coll, {}, "v"),
+                                  [3, 1, np.nan, np.nan, 0, np.nan, 2001, np.nan, 3])
+    np.testing.assert_array_equal(columnar.numeros(coll, {}, "v", vacios=True), [3, 1, np.nan, 2001, 3])
+
+# lotes crudos: los de una sola forma numerica se leen de los bytes, el resto se decodifica
+@pytest.mark.parametrize("docs", [ENTEROS, MEZCLADOS, DOUBLES, GRANDES], ids=["enteros", "mezclados", "doubles", "grandes"])
+@pytest.mark.parametrize("tam", [1, 2, 100])
+def test_crudos_igual_a_documentos(monkeypatch, docs, tam):
+    monkeypatch.setattr(columnar, "TAM_LOTE", tam)
+    for crudo, documentos in zip(_leer(_Crudos(docs)), _leer(_mongomock(docs))):
+        pd.testing.assert_series_equal(_serie(crudo), _serie(documentos))
+    columna, = columnar.columnas(_Crudos(docs), {}, ["v"], tam=tam).values()
+    esperado, = columnar.columnas(_mongomock(docs), {}, ["v"], tam=tam).values()
+    pd.testing.assert_series_equal(_serie(columna), _serie(esperado))
+
+def test_columnas_fijas():
+    lote = b"".join(bson.encode(d) for d in [{"a": 1, "b": 2.5}, {"a": 7, "b": 0.0}])
+    fijas = columnar._columnas_fijas(lote, ["a", "b"])
+    assert fijas["a"].tolist() == [1, 7] and fijas["b"].tolist() == [2.5, 0.0]
+    # otro orden de campos, otro tipo o un campo que falta: se decodifica normal
+    assert columnar._columnas_fijas(lote + bson.encode({"b": 1.0, "a": 2}), ["a", "b"]) is None
+    assert columnar._columnas_fijas(lote + bson.encode({"a": 2 ** 40, "b": 1.0}), ["a", "b"]) is None
+    assert columnar._columnas_fijas(bson.encode({"a": 1}) + bson.encode({}), ["a"]) is None
+    assert columnar._columnas_fijas(bson.encode({"a": "x"}), ["a"]) is None
+
+# find_arrow_all de mentira con las reglas de pymongoarrow y allow_invalid=False: int64 admite
+# enteros y bool (trunca los doubles), float64 enteros y doubles; otro tipo -> TypeError.
+# Devuelve la lista de campos que se le pidieron
+@pytest.fixture
+def arrow_falso(monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    admite = {pa.int64(): lambda v: isinstance(v, (int, float)),
+              pa.float64(): lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)}
+    llamadas = []
+
+    def find_arrow_all(coll, filtro, schema, projection, allow_invalid):
+        assert allow_invalid is False
+        (campo, tipo), = schema.items()
+        llamadas.append(campo)
+        valores = [d.get(campo) for d in coll.find(filtro, projection)]
+        if not all(v is None or admite[tipo](v) for v in valores):
+            raise TypeError(f"{campo}: valor que no es {tipo}")
+        if tipo == pa.int64():
+            valores = [None if v is None else int(v) for v in valores]
+        return {campo: pa.chunked_array([pa.array(valores, type=tipo)])}
+
+    monkeypatch.setattr(columnar, "find_arrow_all", find_arrow_all)
+    monkeypatch.setattr(columnar, "Schema", dict, raising=False)
+    monkeypatch.setattr(columnar, "pa", pa, raising=False)
+    monkeypatch.setattr(columnar, "pc", pytest.importorskip("pyarrow.compute"), raising=False)
+    return llamadas
+
+# con un solo tipo lee arrow; con tipos mezclados (TypeError) vuelve a leer en python
+@pytest.mark.parametrize("docs, en_python", [(ENTEROS, 0), (MEZCLADOS, 3)], ids=["enteros", "mezclados"])
+def test_arrow_falso_igual_a_python(monkeypatch, arrow_falso, docs, en_python):
+    coll = _mongomock(docs)
+    with monkeypatch.context() as m:
+        m.setattr(columnar, "find_arrow_all", None)
+        lento = _leer(coll)
+    lotes = columnar._lotes
+    leidos = []
+    monkeypatch.setattr(columnar, "_lotes", lambda *args, **kwargs: leidos.append(args[2]) or lotes(*args, **kwargs))
+    rapido = _leer(coll)
+    assert arrow_falso == ["v", "v", "v"]
+    assert len(leidos) == en_python
+    for r, l in zip(rapido, lento):
+        pd.testing.assert_series_equal(_serie(r), _serie(l))
+
+# el camino de pymongoarrow necesita un mongod de verdad (el de conexion.py)
+@pytest.fixture(scope="module")
+def coll_real():
+    pytest.importorskip("pymongoarrow")
+    cliente = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        cliente.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"sin mongod en {MONGO_URI}")
+    base = cliente["test_columnar"]
+    yield base
+    cliente.drop_database(base.name)
+    cliente.close()
+
+@pytest.mark.parametrize("docs", [ENTEROS, MEZCLADOS], ids=["enteros", "mezclados"])
+def test_pymongoarrow_igual_a_python(coll_real, monkeypatch, docs):
+    from pymongoarrow.api import find_arrow_all
+    coll = coll_real[f"datos_{len(docs)}"]
+    coll.drop()
+    coll.insert_many([dict(d) for d in docs])
+
+    def leer(rapido):
+        monkeypatch.setattr(columnar, "find_arrow_all", find_arrow_all if rapido else None)
+        return (columnar.ids(coll, {}, "v"), columnar.numeros(coll, {}, "v"),
+                columnar.numeros(coll, {}, "v", vacios=True))
+
+    for rapido, lento in zip(leer(True), leer(False)):
+        pd.testing.assert_series_equal(_serie(rapido), _serie(lento))
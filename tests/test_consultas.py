@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+import consultas
+
+# ordena las filas por todas las columnas: los empates quedan en el mismo orden en los dos modos
+def _normalizar(df):
+    return df.sort_values(by=list(df.columns), kind="stable").reset_index(drop=True)
+
+# los graficos no tienen plan en modo pipeline (se cuentan en python): su camino en la base es el rollup
+def _casos():
+    for nombre in consultas.CONSULTAS:
+        if not nombre.startswith("libros_por_"):
+            yield nombre, "pipeline"
+        yield nombre, "rollup"
+
+# cada caso tiene que ir de verdad a la base (plan no None), si no compararia pandas con pandas
+@pytest.mark.parametrize("nombre, modo", list(_casos()))
+def test_pandas_igual_a_base(db_resumen, nombre, modo):
+    assert consultas.plan(nombre, db_resumen, modo) is not None
+    fn = consultas.CONSULTAS[nombre]
+    pandas = fn(db_resumen, modo="pandas")
+    base = fn(db_resumen, modo=modo)
+    pd.testing.assert_frame_equal(_normalizar(pandas), _normalizar(base), check_dtype=False)
+
+def test_distribuciones_rollup_igual_a_pandas(db_resumen):
+    pandas = consultas.distribuciones(db_resumen, modo="pandas")
+    rollup = consultas.distribuciones(db_resumen, modo="rollup")
+    assert pandas.keys() == rollup.keys()
+    for nombre in pandas:
+        pd.testing.assert_frame_equal(pandas[nombre], rollup[nombre], check_dtype=False)
@@ -0,0 +1,32 @@
+import mongomock
+import pytest
+import cache
+import consultas
+import dimensiones
+
+def test_nombre_repetido_en_la_semilla(db):
+    # Sueco es el idioma 6 y el 18; los libros suecos usan el 18
+    assert dimensiones.ids_por_nombre(db, "idiomas")["Sueco"] == [6, 18]
+    assert dimensiones.ids_de(db, "idiomas", "Sueco") == [6, 18]
+    assert dimensiones.ids_de(db, "idiomas", "Klingon") == []
+    assert dimensiones.nombres_por_id(db, "idiomas")[18] == "Sueco"
+
+# Misterio con dos ids y libros con cada uno: las consultas por nombre cuentan los dos
+@pytest.fixture
+def repetida():
+    base = mongomock.MongoClient()["dimension_repetida"]
+    base["generos"].insert_many([{"_id": 3, "nombre": "Misterio"}, {"_id": 9, "nombre": "Ficción"},
+                                 {"_id": 30, "nombre": "Misterio"}])
+    base["libros"].insert_many([{"_id": 1, "genero": 3}, {"_id": 2, "genero": 30}, {"_id": 3, "genero": 30},
+                                {"_id": 4, "genero": 9}])
+    cache.limpiar()
+    dimensiones.olvidar(base)
+    return base
+
+def test_ids_de_nombres(repetida):
+    assert dimensiones.ids_de_nombres(repetida, "generos", ["Misterio", "Ficción", "Nada"]) == [3, 30, 9]
+
+@pytest.mark.parametrize("modo", ["pandas", "pipeline"])
+def test_consulta_por_nombre_repetido(repetida, modo):
+    df = consultas.consulta_6_contar_misterio(repetida, modo=modo)
+    assert df["total_libros_misterio"].iloc[0] == 3
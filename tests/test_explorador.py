@@ -0,0 +1,14 @@
+import explorador
+import filtros
+
+# los dos libros en sueco tienen el idioma 18, pero "Sueco" tambien es el id 6 (el primero)
+def test_pagina_nombre_repetido(db):
+    df = explorador.pagina(db, filtros.Filtro(idiomas=("Sueco",)))
+    assert df["_id"].tolist() == [28, 57]
+    assert df["idioma"].tolist() == ["Sueco", "Sueco"]
+    assert df.attrs["siguiente"] is None
+
+def test_pagina_corta(db):
+    df = explorador.pagina(db, filtros.Filtro(idiomas=("Sueco",)), tamanio=1)
+    assert df["_id"].tolist() == [28]
+    assert df.attrs["siguiente"] == (28, 28)
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+import consultas
+import filtros
+
+# "Sueco" esta dos veces en la dimension de idiomas (ids 6 y 18) y cada id tiene un libro:
+# el filtro por nombre tiene que tomar los dos
+SUECO = filtros.Filtro(idiomas=("Sueco",))
+
+def _iguales(esperado, obtenido):
+    assert esperado.keys() == obtenido.keys()
+    for clave, valor in esperado.items():
+        if isinstance(valor, pd.DataFrame):
+            pd.testing.assert_frame_equal(valor, obtenido[clave], check_dtype=False)
+        else:
+            assert valor == obtenido[clave], clave
+
+def test_nombre_repetido_pandas(db):
+    resumen = consultas.resumen_filtro(db, SUECO, modo="pandas")
+    assert resumen["cantidad"] == 2
+    assert resumen["idioma"].to_dict("list") == {"nombre_idioma": ["Sueco"], "cantidad": [2]}
+
+@pytest.mark.parametrize("modo", ["pipeline", "rollup"])
+def test_nombre_repetido_igual_a_pandas(db_resumen, modo):
+    _iguales(consultas.resumen_filtro(db_resumen, SUECO, modo="pandas"),
+             consultas.resumen_filtro(db_resumen, SUECO, modo=modo))
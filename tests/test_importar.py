@@ -0,0 +1,22 @@
+import io
+import json
+import pytest
+import importar_datos_mongo
+from importar_datos_mongo import _Lector, leer_documentos
+
+# numeros y documentos que quedan cortados en cualquier lugar con pedazos de pocos bytes
+TEXTO = '{"libros": [1.5, -2e3, 10, {"_id": 7, "anio": 2001.25}, true, null, "x"], "vacia": [], "n": [0.125]}'
+
+@pytest.mark.parametrize("tam", [1, 2, 3, 5, 7, 1 << 20])
+def test_pedazos_chicos(monkeypatch, tam):
+    monkeypatch.setattr(importar_datos_mongo, "TAM_PEDAZO", tam)
+    docs = list(leer_documentos(io.BytesIO(TEXTO.encode()), "Libros_Grupo8.json"))
+    esperado = [(c, d) for c, lista in json.loads(TEXTO).items() for d in lista]
+    assert docs == esperado
+
+@pytest.mark.parametrize("tam", [1, 3])
+def test_array_de_numeros(monkeypatch, tam):
+    monkeypatch.setattr(importar_datos_mongo, "TAM_PEDAZO", tam)
+    lector = _Lector(io.BytesIO(b"[1.5]"))
+    lector.esperar("[")
+    assert list(lector.elementos()) == [1.5]
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+import instrumentacion
+
+def _inicio(request_id, nombre="find"):
+    return SimpleNamespace(request_id=request_id, connection_id=("localhost", 27017), command_name=nombre,
+                           command={nombre: "libros"})
+
+def _fin(request_id):
+    return SimpleNamespace(request_id=request_id, connection_id=("localhost", 27017), duration_micros=1000,
+                           reply={"cursor": {"firstBatch": [{}, {}]}})
+
+def test_sin_consulta_no_queda_pendiente():
+    listener = instrumentacion._Listener()
+    listener.started(_inicio(1))
+    assert not listener.pendientes
+    listener.succeeded(_fin(1))
+
+def test_pendientes_acotados(monkeypatch):
+    monkeypatch.setattr(instrumentacion, "INSTRUMENTAR", True)
+    monkeypatch.setattr(instrumentacion, "PENDIENTES_MAX", 3)
+    instrumentacion.reiniciar()
+    listener = instrumentacion._Listener()
+    with instrumentacion.consulta("perdida"):
+        for i in range(10):   # comandos que nunca terminan
+            listener.started(_inicio(i))
+        listener.started(_inicio(99))
+    assert len(listener.pendientes) == 3
+    # el que termina despues igual se atribuye a su consulta
+    listener.succeeded(_fin(99))
+    assert instrumentacion.resumen()["perdida"]["documentos"] == 2
+    instrumentacion.reiniciar()
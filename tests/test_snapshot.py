@@ -0,0 +1,50 @@
+import inspect
+import pytest
+from conftest import RAIZ
+import consultas
+import filtros
+import snapshot
+
+pytest.importorskip("pyarrow")
+
+@pytest.fixture(scope="module")
+def snap(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp("snapshot")
+    snapshot.crear(str(carpeta), origen=f"{RAIZ}/Libros_Grupo8.json")
+    return snapshot.Snapshot(str(carpeta))
+
+def _variantes():
+    for nombre, fn in consultas.CONSULTAS.items():
+        yield nombre, {}
+        if "contar" in inspect.signature(fn).parameters:
+            yield nombre, {"contar": "nominacion"}
+
+def _iguales(local, remoto):
+    assert snapshot._iguales(local, remoto), f"snapshot: {local.to_dict('list')}\nmongo:    {remoto.to_dict('list')}"
+
+# lo mismo que `snapshot.py verificar`, contra los datos de ejemplo en mongomock
+@pytest.mark.parametrize("nombre, kwargs", list(_variantes()))
+def test_consulta_igual_a_mongo(db, snap, nombre, kwargs):
+    remoto = consultas.CONSULTAS[nombre](db, modo="pandas", **kwargs)
+    _iguales(snapshot.CONSULTAS[nombre](snap, **kwargs), remoto)
+
+def test_distribuciones_igual_a_mongo(db, snap):
+    remoto = consultas.distribuciones(db, modo="pandas")
+    local = snapshot.distribuciones(snap)
+    assert local.keys() == remoto.keys()
+    for nombre in local:
+        _iguales(local[nombre], remoto[nombre])
+
+# "Sueco" esta dos veces en la dimension de idiomas: la mascara tiene que tomar los dos codigos
+def test_filtro_nombre_repetido_igual_a_mongo(db, snap):
+    filtro = filtros.Filtro(idiomas=("Sueco",))
+    remoto = consultas.resumen_filtro(db, filtro, modo="pandas")
+    local = snapshot.resumen_filtro(snap, filtro)
+    assert local["cantidad"] == remoto["cantidad"] == 2
+    for clave in ("promedio_anio", "anio_min", "anio_max"):
+        assert local[clave] == remoto[clave]
+    for nombre in ("genero", "idioma", "anio"):
+        _iguales(local[nombre], remoto[nombre])
+
+def test_mismas_consultas():
+    assert set(snapshot.CONSULTAS) == set(consultas.CONSULTAS)
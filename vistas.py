@@ -0,0 +1,397 @@
+import os
+import inspect
+import streamlit as st
+import pandas as pd
+import cache
+import asincrono
+import instrumentacion
+import dimensiones
+import explorador
+import aproximado
+from filtros import Filtro
+from conexion import MONGO_URI
+from consultas import (
+    consulta_1_promedio_nominados,
+    consulta_2_genero_mas_ganador,
+    consulta_3_idioma_mas_ganador,
+    consulta_4_idioma_mas_nominado,
+    consulta_5_promedio_cf_es,
+    consulta_6_contar_misterio,
+    consulta_7_contar_Distopia_es,
+    resumen_filtro,
+    distribuciones,
+)
+
+# las vistas de main.py. main importa este modulo (y con el pandas, pymongo y las consultas)
+# recien despues de dibujar el encabezado; plotly se importa solo en las vistas con graficos.
+
+# las consultas de una vista corren a la vez (asincrono.py); "0" las corre una por una
+CONSULTAS_ASYNC = os.getenv("CONSULTAS_ASYNC", "1") == "1"
+# carpeta de un snapshot (snapshot.py crear): la app contesta desde ahi, sin mongod
+SNAPSHOT = os.getenv("SNAPSHOT")
+if SNAPSHOT:
+    import snapshot
+
+
+# corre las consultas de una vista; si alguna falla o se pasa del timeout se avisa y queda en None.
+# kwargs (ej. filtro) le llega a cada consulta que lo acepte
+def cargar(db, *funciones, **kwargs):
+    if CONSULTAS_ASYNC and not SNAPSHOT:
+        resultados = asincrono.correr(db, funciones, uri=MONGO_URI, **kwargs)
+    else:
+        resultados = {}
+        for fn in funciones:
+            propios = {k: v for k, v in kwargs.items() if k in inspect.signature(fn).parameters}
+            calcular = snapshot.FUNCIONES[fn.__name__] if SNAPSHOT else fn
+            try:
+                resultados[fn.__name__] = asincrono.Resultado(calcular(db, **propios), None, 0)
+            except Exception as e:
+                resultados[fn.__name__] = asincrono.Resultado(None, e, 0)
+    return _valores(funciones, resultados)
+
+def _valores(funciones, resultados):
+    valores = []
+    for fn in funciones:
+        resultado = resultados[fn.__name__]
+        if resultado.error is not None:
+            detalle = (f"tardó más de {asincrono.TIMEOUT_CONSULTA:.0f}s" if isinstance(resultado.error, TimeoutError)
+                       else resultado.error)
+            st.error(f"No se pudo calcular {fn.__name__}: {detalle}")
+        valores.append(resultado.valor)
+    return valores
+
+# con "Respuesta aproximada" activado: si la consulta exacta no termina dentro del presupuesto se
+# dibuja la estimacion (aproximado.py) y se reemplaza por el valor exacto cuando llega
+def cargar_refinando(db, fn, dibujar):
+    if not st.session_state.get("aproximado") or SNAPSHOT or fn.__name__ not in aproximado.ESTIMADORES:
+        valor, = cargar(db, fn)
+        if valor is not None: dibujar(valor)
+        return
+
+    futuro = asincrono.lanzar(db, [fn], uri=MONGO_URI)
+    lugar = st.empty()
+    try:
+        resultados = futuro.result(timeout=aproximado.PRESUPUESTO_APROXIMADO)
+    except TimeoutError:
+        with lugar.container():
+            try:
+                estimado = aproximado.estimar(db, fn.__name__)
+            except Exception as e:
+                st.caption(f"No se pudo estimar {fn.__name__}: {e}. Calculando el valor exacto…")
+            else:
+                attrs = next(iter(estimado.values())).attrs if isinstance(estimado, dict) else estimado.attrs
+                st.caption(f"≈ Estimación con {attrs['muestra']} de {attrs['total']} libros "
+                           f"(intervalos de {attrs['confianza']:.0%}). Calculando el valor exacto…")
+                dibujar(estimado)
+        resultados = futuro.result()
+        lugar.empty()
+
+    with lugar.container():
+        valor, = _valores([fn], resultados)
+        if valor is not None: dibujar(valor)
+
+# valor de una columna para un st.metric: "≈ valor (inferior–superior)" si es una estimacion
+def _valor(df, columna, unidad=""):
+    texto = f"{int(df[columna].iloc[0])}{unidad}"
+    if "inferior" in df:
+        return f"≈ {texto} ({df['inferior'].iloc[0]}–{df['superior'].iloc[0]})"
+    return texto
+
+# barras de error de una estimacion (nada si es el valor exacto)
+def _error(df, columna):
+    if "inferior" not in df:
+        return {}
+    return {"error_y": df["superior"] - df[columna], "error_y_minus": df[columna] - df["inferior"]}
+
+
+def vista_promedio_nominados(db, titulo):
+    st.subheader(titulo)
+    df_q1, = cargar(db, consulta_1_promedio_nominados)
+    if df_q1 is None: return
+    st.dataframe(df_q1, use_container_width=True)
+    avg_year = df_q1['promedio_anio'].iloc[0]
+    st.metric(label="Promedio Año Publicación", value=f"{avg_year:.2f}" if pd.notna(avg_year) else "N/A")
+
+
+def vista_genero_ganador(db, titulo):
+    st.subheader(titulo)
+    def dibujar(df_q2):
+        st.dataframe(df_q2, use_container_width=True)
+        top_genre = df_q2['nombre_genero'].iloc[0]
+        st.metric(label="Género Más Ganador", value=top_genre, delta=_valor(df_q2, 'total_premios', " premios"),
+                  delta_color="off")
+    cargar_refinando(db, consulta_2_genero_mas_ganador, dibujar)
+
+
+def vista_idioma_ganador(db, titulo):
+    st.subheader(titulo)
+    def dibujar(df_q3):
+        st.dataframe(df_q3, use_container_width=True)
+        top_lang = df_q3['nombre_idioma'].iloc[0]
+        st.metric(label="Idioma Más Ganador", value=top_lang, delta=_valor(df_q3, 'total_premios', " premios"),
+                  delta_color="off")
+    cargar_refinando(db, consulta_3_idioma_mas_ganador, dibujar)
+
+
+def vista_idioma_nominado(db, titulo):
+    st.subheader(titulo)
+    df_q4, = cargar(db, consulta_4_idioma_mas_nominado)
+    if df_q4 is None: return
+    st.dataframe(df_q4, use_container_width=True)
+    top_lang_nom = df_q4['nombre_idioma'].iloc[0]
+    top_lang_nom_count = df_q4['total_nominaciones'].iloc[0]
+    st.metric(label="Idioma Más Nominado", value=top_lang_nom, delta=f"{top_lang_nom_count} nominaciones", delta_color="off")
+
+
+def vista_promedio_distopia_es(db, titulo):
+    st.subheader(titulo)
+    df_q5, = cargar(db, consulta_5_promedio_cf_es)
+    if df_q5 is None: return
+    st.dataframe(df_q5, use_container_width=True)
+    avg_year_cf_es = df_q5['promedio_anio'].iloc[0]
+    st.metric(label="Promedio Año (Distopía, Español)", value=f"{avg_year_cf_es:.2f}" if pd.notna(avg_year_cf_es) else "N/A")
+
+def vista_conteo_misterio(db, titulo):
+    st.subheader(titulo)
+    def dibujar(df_q6):
+        st.dataframe(df_q6, use_container_width=True)
+        st.metric(label="Total Libros Misterios", value=_valor(df_q6, 'total_libros_misterio'))
+    cargar_refinando(db, consulta_6_contar_misterio, dibujar)
+
+def vista_conteo_distopia_es(db, titulo):
+    st.subheader(titulo)
+    df_q7, = cargar(db, consulta_7_contar_Distopia_es)
+    if df_q7 is None: return
+    st.dataframe(df_q7, use_container_width=True)
+    count_Distopia_es = df_q7['total_libros_Distopia_espanol'].iloc[0]
+    st.metric(label="Total Libros (Distopia, Español)", value=int(count_Distopia_es))
+
+
+def vista_visualizaciones(db, titulo):
+
+    st.subheader(titulo)
+    # los cuatro graficos salen de una sola agregacion ($facet)
+    cargar_refinando(db, distribuciones, _graficos)
+
+def _graficos(graficos):
+    import plotly.express as px
+    df_genre_dist = graficos["libros_por_genero"]
+    df_lang_dist = graficos["libros_por_lenguaje"]
+    df_year_dist = graficos["libros_por_anio"]
+    df_awards_genre = graficos["premios_ganados_por_genero"]
+
+    st.markdown("Distribución de Libros por Género")
+
+    if df_genre_dist is None:
+        pass
+    elif not df_genre_dist.empty:
+        fig_genre = px.bar(df_genre_dist , x='nombre_genero',
+                           y='count',
+                           title="Número de Libros por Género",
+                           labels={'nombre_genero':'Género', 'count':'Cantidad de Libros'},
+                           **_error(df_genre_dist, 'count'))
+        st.plotly_chart(fig_genre, use_container_width=True)
+    else:
+        st.info("No hay datos suficientes para mostrar la distribución por género.")
+
+    st.divider()
+
+    st.markdown("### Distribución de Libros por Idioma")
+
+    if df_lang_dist is None:
+        pass
+    elif not df_lang_dist.empty:
+        fig_lang = px.bar(df_lang_dist,
+                          x='nombre_idioma',
+                          y='count',
+                          title="Número de Libros por Idioma",
+                          labels={'nombre_idioma':'Idioma', 'count':'Cantidad de Libros'},
+                          **_error(df_lang_dist, 'count'))
+        st.plotly_chart(fig_lang, use_container_width=True)
+    else:
+        st.info("No hay datos suficientes para mostrar la distribución por idioma.")
+
+    st.divider()
+
+    st.markdown("### Libros Publicados por Año")
+
+    if df_year_dist is None:
+        pass
+    elif not df_year_dist.empty:
+        ancho = df_year_dist.attrs.get("ancho", 1)
+        fig_year = px.line(df_year_dist,
+                           x='year',
+                           y='count',
+                           title="Número de Libros Publicados por Año" + (f" (cada {ancho} años)" if ancho > 1 else ""),
+                           markers=True,
+                           labels={'year':'Año de Publicación', 'count':'Cantidad de Libros'},
+                           **_error(df_year_dist, 'count'))
+        st.plotly_chart(fig_year, use_container_width=True)
+    else:
+        st.info("No hay datos suficientes para mostrar la publicación por año.")
+
+    st.divider()
+
+    st.markdown("### Premios Ganados por Género")
+
+    if df_awards_genre is None:
+        pass
+    elif not df_awards_genre.empty:
+        fig_awards_genre = px.bar(df_awards_genre,
+                                  x='nombre_genero',
+                                  y='awards_won',
+                                  title="Total de Premios Ganados por Género",
+                                  labels={'nombre_genero':'Género', 'awards_won':'Premios Ganados'},
+                                  **_error(df_awards_genre, 'awards_won'))
+        st.plotly_chart(fig_awards_genre, use_container_width=True)
+    else:
+        st.info("No hay datos suficientes para mostrar los premios ganados por género.")
+
+
+PREMIOS_UI = {"Cualquiera": None, "Nominado": "nominado", "Ganador": "ganador", "Sin nominar": "sin_nominar"}
+
+# widgets del filtro; `clave` separa el estado de cada vista que los usa.
+# None (y el error en pantalla) si no se pueden leer las dimensiones, como cargar()
+def filtro_ui(db, clave):
+    try:
+        nombres = {coleccion: db.nombres_por_id(coleccion) if SNAPSHOT else dimensiones.nombres_por_id(db, coleccion)
+                   for coleccion in ("generos", "idiomas", "formatos", "autores")}
+    except Exception as e:
+        st.error(f"No se pudieron cargar las opciones del filtro: {e}")
+        return None
+
+    def opciones(coleccion):
+        return sorted({n for n in nombres[coleccion].values() if isinstance(n, str)})
+
+    col1, col2 = st.columns(2)
+    generos = col1.multiselect("Géneros", opciones("generos"), key=f"{clave}_generos")
+    idiomas = col2.multiselect("Idiomas", opciones("idiomas"), key=f"{clave}_idiomas")
+    formatos = col1.multiselect("Formatos", opciones("formatos"), key=f"{clave}_formatos")
+    autores = col2.multiselect("Autores", opciones("autores"), key=f"{clave}_autores")
+    col1, col2, col3 = st.columns(3)
+    anio_desde = col1.number_input("Año desde", value=None, step=1, key=f"{clave}_anio_desde")
+    anio_hasta = col2.number_input("Año hasta", value=None, step=1, key=f"{clave}_anio_hasta")
+    premio = col3.selectbox("Premios", list(PREMIOS_UI), key=f"{clave}_premio")
+
+    return Filtro(generos=generos, idiomas=idiomas, formatos=formatos, autores=autores,
+                  anio_desde=anio_desde, anio_hasta=anio_hasta, premio=PREMIOS_UI[premio])
+
+# filtro armado con widgets: una sola agregacion trae cantidad, años y los desgloses
+def vista_filtros(db, titulo):
+    import plotly.express as px
+    st.subheader(titulo)
+    filtro = filtro_ui(db, "filtros")
+    if filtro is None: return
+    resumen, = cargar(db, resumen_filtro, filtro=filtro)
+    if resumen is None: return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Libros", resumen["cantidad"])
+    col2.metric("Promedio Año", f"{resumen['promedio_anio']:.2f}" if pd.notna(resumen["promedio_anio"]) else "N/A")
+    col3.metric("Año mínimo", f"{resumen['anio_min']:.0f}" if pd.notna(resumen["anio_min"]) else "N/A")
+    col4.metric("Año máximo", f"{resumen['anio_max']:.0f}" if pd.notna(resumen["anio_max"]) else "N/A")
+    if not resumen["cantidad"]:
+        st.info("Ningún libro cumple el filtro.")
+        return
+
+    col1, col2 = st.columns(2)
+    col1.plotly_chart(px.bar(resumen["genero"], x='nombre_genero', y='cantidad', title="Por Género",
+                             labels={'nombre_genero': 'Género', 'cantidad': 'Cantidad de Libros'}),
+                      use_container_width=True)
+    col2.plotly_chart(px.bar(resumen["idioma"], x='nombre_idioma', y='cantidad', title="Por Idioma",
+                             labels={'nombre_idioma': 'Idioma', 'cantidad': 'Cantidad de Libros'}),
+                      use_container_width=True)
+    if not resumen["anio"].empty:
+        st.plotly_chart(px.line(resumen["anio"], x='year', y='cantidad', title="Por Año de Publicación",
+                                labels={'year': 'Año', 'cantidad': 'Cantidad de Libros'}),
+                        use_container_width=True)
+
+
+ORDENES_UI = {"Id": "id", "Título": "titulo", "Año": "anio"}
+COLUMNAS_EXPLORADOR = {"titulo": "Título", "autores": "Autores", "genero": "Género", "idioma": "Idioma",
+                       "formato": "Formato", "premios": "Premios", "anio_publicacion": "Año"}
+
+# libros uno por uno, de a una pagina (keyset en el servidor, ver explorador.py). En session_state
+# queda la pila de cursores: el inicio de cada pagina recorrida, para poder volver.
+def vista_explorador(db, titulo):
+    st.subheader(titulo)
+    if SNAPSHOT:
+        st.info("El explorador lee los libros de MongoDB: no está disponible con SNAPSHOT.")
+        return
+    filtro = filtro_ui(db, "explorador")
+    if filtro is None: return
+    orden = ORDENES_UI[st.radio("Ordenar por", list(ORDENES_UI), horizontal=True, key="explorador_orden")]
+
+    estado = st.session_state
+    if estado.get("explorador_consulta") != (filtro, orden):
+        # filtro u orden nuevos: vuelve a la primera pagina
+        estado["explorador_consulta"] = (filtro, orden)
+        estado["explorador_cursores"] = [None]
+    cursores = estado["explorador_cursores"]
+
+    df, = cargar(db, explorador.pagina, filtro=filtro, orden=orden, despues=cursores[-1])
+    if df is None: return
+    siguiente = df.attrs.get("siguiente")
+    explorador.precargar_siguiente(db, df, filtro=filtro, orden=orden)
+
+    if df.empty:
+        st.info("Ningún libro cumple el filtro.")
+    else:
+        st.dataframe(df.set_index("_id").rename(columns=COLUMNAS_EXPLORADOR), use_container_width=True)
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    col1.button("← Anterior", disabled=len(cursores) == 1, key="explorador_anterior",
+                on_click=cursores.pop)
+    col2.button("Siguiente →", disabled=siguiente is None, key="explorador_siguiente",
+                on_click=cursores.append, args=(siguiente,))
+    col3.caption(f"Página {len(cursores)} · {len(df)} libros")
+
+
+# panel de instrumentacion (INSTRUMENTAR=1): tiempos por consulta, red vs pandas, documentos y bytes
+def panel_instrumentacion(db):
+    import plotly.express as px
+    filas = {n: f for n, f in instrumentacion.resumen().items() if n != instrumentacion.SIN_CONSULTA}
+    with st.sidebar.expander("Instrumentación", expanded=False):
+        if not filas:
+            st.caption("Todavía no se calculó ninguna consulta (los hits de cache no se miden).")
+            return
+        tabla = pd.DataFrame.from_dict(filas, orient="index").drop(columns=["etapas_s", "por_comando"])
+        st.dataframe(tabla.round(2), use_container_width=True)
+
+        nombre = st.selectbox("Consulta", list(filas), key="instrumentacion_consulta")
+        fila = filas[nombre]
+        if fila["etapas_s"]:
+            st.caption("Etapas pandas (ms): " + ", ".join(f"{e} {s * 1000:.1f}" for e, s in fila["etapas_s"].items()))
+        if fila["por_comando"]:
+            st.caption("Comandos: " + ", ".join(f"{c} ×{n}" for c, n in fila["por_comando"].items()))
+        latencias = pd.DataFrame({"ms": [s * 1000 for s in instrumentacion.latencias(nombre)]})
+        fig = px.histogram(latencias, x="ms", nbins=20, title=f"Latencia de {nombre}")
+        st.plotly_chart(fig, use_container_width=True)
+
+        if st.button("Documentos examinados (explain)", key="instrumentacion_explain"):
+            try:
+                st.write(f"{instrumentacion.examinar(db, nombre)} documentos examinados en la última corrida")
+            except Exception as e:
+                st.error(f"No se pudo correr explain: {e}")
+        st.download_button("Métricas (Prometheus)", instrumentacion.prometheus(), file_name="metricas.txt")
+
+
+# vista -> consultas que usa (para precargarlas en segundo plano)
+CONSULTAS_VISTA = {
+    "vista_promedio_nominados": [consulta_1_promedio_nominados],
+    "vista_genero_ganador": [consulta_2_genero_mas_ganador],
+    "vista_idioma_ganador": [consulta_3_idioma_mas_ganador],
+    "vista_idioma_nominado": [consulta_4_idioma_mas_nominado],
+    "vista_promedio_distopia_es": [consulta_5_promedio_cf_es],
+    "vista_conteo_misterio": [consulta_6_contar_misterio],
+    "vista_conteo_distopia_es": [consulta_7_contar_Distopia_es],
+    "vista_visualizaciones": [distribuciones],
+}
+
+# corre en segundo plano las consultas de esas vistas (quedan en cache)
+def precargar(db, vistas):
+    cache.precargar(db, [f for vista in vistas for f in CONSULTAS_VISTA.get(vista, [])])
+
+# invalida el cache de consultas cuando cambian libros/nominaciones/generos/idiomas
+def vigilar(db):
+    cache.vigilar(db)